@@ -9,14 +9,14 @@ import pandas_ta as ta
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import json
 import os
-import glob
 from datetime import datetime, timedelta
 from run_backtest import run_backtest
+from backtesting.storage import list_results, load_results
+from strategy.macd_strategy import SIGNAL_NAMES
 from config import TIMEFRAMES
-from trading.live_trader import LiveTrader
-import ccxt
+from trading.ipc import TraderClient, DaemonError
+import requests
 from dotenv import load_dotenv
 from i18n import t
 
@@ -76,11 +76,6 @@ _selected_nav_label = st.radio(
 selected_view = NAV_KEYS[NAV_LABELS.index(_selected_nav_label)]
 st.markdown("---")
 
-# Inicializar el estado de la sesión para el trader en vivo si no existe
-if 'live_trader' not in st.session_state:
-    st.session_state.live_trader = None
-    st.session_state.is_trading = False
-
 if selected_view == "live_trading":
     st.title(t("live_title", lang))
     st.info(t("live_disclaimer", lang))
@@ -102,79 +97,120 @@ if selected_view == "live_trading":
             index=0
         )
 
-        # Configuración de API (oculta)
-        api_key = os.getenv('BINANCE_API_KEY', '')
-        api_secret = os.getenv('BINANCE_API_SECRET', '')
-
-        if not api_key or not api_secret:
-            st.error(t("live_no_credentials", lang))
+    # El trader corre en su propio proceso (trader_daemon.py); la app lo maneja
+    # por el canal de control local y varias sesiones ven el mismo trader
+    daemon = TraderClient()
+    try:
+        status = daemon.status()
+    except requests.RequestException:
+        status = None
+        st.error(t("live_daemon_unreachable", lang, url=daemon.url))
+    except DaemonError as e:
+        status = None
+        st.error(t("live_daemon_rejected", lang, error=str(e)))
+
+    if status is not None and not status['credentials']:
+        st.error(t("live_no_credentials", lang))
+
+    if status is not None and status['credentials']:
+        trader = status['traders'].get(symbol)
+        running = trader is not None and trader['running']
+        trading = trader is not None and trader['trading_enabled']
 
-    if api_key and api_secret:
         # Estado del bot y controles
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            if st.session_state.live_trader is None:
+            if not running:
                 if st.button(t("live_start_bot", lang)):
                     try:
-                        # Inicializar exchange
-                        exchange_config = {
-                            'apiKey': api_key,
-                            'secret': api_secret,
-                            'enableRateLimit': True
-                        }
-                        exchange_client = ccxt.binance(exchange_config)
-
-                        # Crear instancia del trader
-                        st.session_state.live_trader = LiveTrader(
-                            exchange_client=exchange_client,
-                            symbol=symbol
-                        )
-                        st.session_state.live_trader.start()
+                        # El demonio crea el trader (retomando el estado guardado del par)
+                        daemon.start(symbol)
                         st.success(t("live_bot_started", lang))
                         st.rerun()
-                    except Exception as e:
+                    except (requests.RequestException, DaemonError) as e:
                         st.error(t("live_start_error", lang, error=str(e)))
             else:
                 if st.button(t("live_stop_bot", lang)):
                     try:
-                        st.session_state.live_trader.stop()
-                        st.session_state.live_trader = None
-                        st.session_state.is_trading = False
+                        daemon.stop(symbol)
                         st.success(t("live_bot_stopped", lang))
                         st.rerun()
-                    except Exception as e:
+                    except (requests.RequestException, DaemonError) as e:
                         st.error(t("live_stop_error", lang, error=str(e)))
 
         with col2:
-            if st.session_state.live_trader is not None:
-                if not st.session_state.is_trading:
+            if running:
+                if not trading:
                     if st.button(t("live_enable_trading", lang)):
-                        st.session_state.live_trader.enable_trading()
-                        st.session_state.is_trading = True
-                        st.success(t("live_trading_enabled", lang))
-                        st.rerun()
+                        try:
+                            daemon.set_trading(symbol, True)
+                            st.success(t("live_trading_enabled", lang))
+                            st.rerun()
+                        except (requests.RequestException, DaemonError) as e:
+                            st.error(t("live_trading_error", lang, error=str(e)))
                 else:
                     if st.button(t("live_disable_trading", lang)):
-                        st.session_state.live_trader.disable_trading()
-                        st.session_state.is_trading = False
-                        st.success(t("live_trading_disabled", lang))
-                        st.rerun()
+                        try:
+                            daemon.set_trading(symbol, False)
+                            st.success(t("live_trading_disabled", lang))
+                            st.rerun()
+                        except (requests.RequestException, DaemonError) as e:
+                            st.error(t("live_trading_error", lang, error=str(e)))
 
         with col3:
             # Estado actual
-            if st.session_state.live_trader is not None:
-                st.metric(
-                    t("live_bot_status", lang),
-                    t("live_status_active", lang) if st.session_state.live_trader.is_running else t("live_status_stopped", lang)
-                )
-                st.metric(
-                    t("live_auto_trading", lang),
-                    t("live_auto_enabled", lang) if st.session_state.is_trading else t("live_auto_disabled", lang)
-                )
+            st.metric(
+                t("live_bot_status", lang),
+                t("live_status_active", lang) if running else t("live_status_stopped", lang)
+            )
+            st.metric(
+                t("live_auto_trading", lang),
+                t("live_auto_enabled", lang) if running and trading else t("live_auto_disabled", lang)
+            )
+
+        # Métricas en curso de la sesión
+        if trader is not None:
+            performance = trader['performance']
+            st.subheader(t("live_performance_header", lang))
+            pcol1, pcol2, pcol3, pcol4 = st.columns(4)
+            pcol1.metric(t("live_pnl", lang), f"${performance['pnl']:,.2f}", f"{performance['total_return']:.2f}%")
+            pcol2.metric(t("live_drawdown", lang), f"{performance['current_drawdown']:.2f}%",
+                         t("live_max_drawdown", lang, value=performance['max_drawdown']), delta_color="off")
+            pcol3.metric(t("live_sharpe", lang), f"{performance['rolling_sharpe_ratio']:.2f}")
+            pcol4.metric(t("live_win_rate", lang), f"{performance['win_rate']:.1f}%",
+                         t("live_trades_count", lang, value=performance['total_trades']), delta_color="off")
+
+            # Latencias del ciclo (p50/p95/p99 en ms) y contadores del demonio
+            st.subheader(t("live_latency_header", lang))
+            try:
+                metrics = daemon.telemetry()
+            except (requests.RequestException, DaemonError) as e:
+                metrics = {'histograms': {}, 'counters': {}}
+                st.error(t("live_telemetry_error", lang, error=str(e)))
+            rows = [
+                {
+                    t("live_latency_metric", lang): f"{name}{labels}",
+                    t("live_latency_count", lang): values['count'],
+                    "p50 (ms)": values['p50'] * 1000,
+                    "p95 (ms)": values['p95'] * 1000,
+                    "p99 (ms)": values['p99'] * 1000
+                }
+                for name, series in sorted(metrics['histograms'].items())
+                for labels, values in sorted(series.items())
+            ]
+            if rows:
+                st.dataframe(pd.DataFrame(rows).round(2), hide_index=True, use_container_width=True)
             else:
-                st.metric(t("live_bot_status", lang), t("live_status_stopped", lang))
-                st.metric(t("live_auto_trading", lang), t("live_auto_disabled", lang))
+                st.caption(t("live_latency_empty", lang))
+            counters = [
+                f"{name}{labels}: {value}"
+                for name, series in sorted(metrics['counters'].items())
+                for labels, value in sorted(series.items())
+            ]
+            if counters:
+                st.caption(" · ".join(counters))
+            st.caption(t("live_metrics_endpoint", lang, url=f"{daemon.url}/metrics"))
 
         # Información y advertencias
         st.info(t("live_info_block", lang))
@@ -306,48 +342,19 @@ if selected_view == "backtesting":
     # Cargar resultados de backtesting
     results_dir = os.path.join(os.environ.get('TEMP', '/tmp'), "trading_bot_results")
 
-    # Buscar archivos en el directorio de resultados
-    result_files = []
-    if os.path.exists(results_dir):
-        result_files.extend(glob.glob(os.path.join(results_dir, "*.json")))
+    # Buscar resultados (manifiesto + columnas) en el directorio de resultados
+    result_files = list_results(results_dir) if os.path.exists(results_dir) else []
 
     if not result_files:
         st.warning(t("bt_no_results", lang))
         st.stop()
 
-    # Ordenar archivos por fecha de modificación (más reciente primero)
-    result_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-
-    # Usar el archivo más reciente automáticamente
+    # Usar el resultado más reciente automáticamente
     selected_file = result_files[0]
 
     try:
-        with open(selected_file, 'r') as f:
-            results = json.load(f)
-
-        if not results:
-            st.error(t("bt_empty_file", lang))
-            st.stop()
-
-        # Convertir fechas y timestamps
-        def safe_parse_timestamp(timestamp_str):
-            try:
-                if isinstance(timestamp_str, (int, float)):
-                    return pd.to_datetime(timestamp_str, unit='s')
-                elif isinstance(timestamp_str, str):
-                    timestamp_str = timestamp_str.split('+')[0].strip()
-                    return pd.to_datetime(timestamp_str)
-                else:
-                    return pd.to_datetime(timestamp_str)
-            except Exception as e:
-                st.warning(t("bt_timestamp_parse_warning", lang, timestamp=timestamp_str, error=str(e)))
-                return None
-
-        # Convertir fechas de inicio y fin
-        if 'start_date' in results:
-            results['start_date'] = safe_parse_timestamp(results['start_date'])
-        if 'end_date' in results:
-            results['end_date'] = safe_parse_timestamp(results['end_date'])
+        # Las tablas se cargan en bloque directamente como DataFrames
+        results = load_results(selected_file)
 
         # 1. Mostrar información del backtest
         st.info(t(
@@ -371,27 +378,10 @@ if selected_view == "backtesting":
 
         # 3. Gráfica de evolución del capital
         st.subheader(t("bt_capital_evolution_subheader", lang))
-        if 'balance_history' in results and results['balance_history']:
-            # Convertir el historial de balance a DataFrame
-            balance_data = []
-            for timestamp_str, balance in results['balance_history'].items():
-                try:
-                    timestamp = safe_parse_timestamp(timestamp_str)
-                    if timestamp is not None:
-                        balance_data.append({
-                            'timestamp': timestamp,
-                            'balance': float(balance)
-                        })
-                except Exception as e:
-                    st.warning(t("bt_balance_timestamp_warning", lang, error=str(e)))
-                    continue
-
-            # Crear DataFrame y ordenar por timestamp
-            balance_df = pd.DataFrame(balance_data)
+        equity_df = results['equity']
+        if not equity_df.empty:
+            balance_df = equity_df[['balance']].dropna()
             if not balance_df.empty:
-                balance_df.set_index('timestamp', inplace=True)
-                balance_df.sort_index(inplace=True)
-
                 # Gráfica de evolución del capital
                 fig = make_subplots(rows=2, cols=1,
                                   shared_xaxes=True,
@@ -419,45 +409,19 @@ if selected_view == "backtesting":
                     row=1, col=1
                 )
 
-                # Procesar drawdown
-                if 'drawdown' in results:
-                    try:
-                        drawdown_data = []
-                        for timestamp_str, dd_value in results['drawdown'].items():
-                            try:
-                                timestamp = safe_parse_timestamp(timestamp_str)
-                                if timestamp is not None:
-                                    if isinstance(dd_value, dict):
-                                        dd_value = dd_value.get('drawdown', 0)
-
-                                    drawdown_data.append({
-                                        'timestamp': timestamp,
-                                        'drawdown': float(dd_value)
-                                    })
-                            except Exception as e:
-                                st.warning(t("bt_drawdown_timestamp_warning", lang, error=str(e)))
-                                continue
-
-                        # Crear DataFrame de drawdown y ordenar
-                        dd_df = pd.DataFrame(drawdown_data)
-                        if not dd_df.empty:
-                            dd_df.set_index('timestamp', inplace=True)
-                            dd_df.sort_index(inplace=True)
-
-                            # Agregar gráfica de drawdown
-                            fig.add_trace(
-                                go.Scatter(
-                                    x=dd_df.index,
-                                    y=dd_df['drawdown'],
-                                    name=t("bt_drawdown_trace_name", lang),
-                                    fill='tozeroy',
-                                    line=dict(color='red')
-                                ),
-                                row=2, col=1
-                            )
-
-                    except Exception as e:
-                        st.error(t("bt_drawdown_process_error", lang, error=str(e)))
+                # Drawdown
+                dd_df = equity_df[['drawdown']].dropna()
+                if not dd_df.empty:
+                    fig.add_trace(
+                        go.Scatter(
+                            x=dd_df.index,
+                            y=dd_df['drawdown'],
+                            name=t("bt_drawdown_trace_name", lang),
+                            fill='tozeroy',
+                            line=dict(color='red')
+                        ),
+                        row=2, col=1
+                    )
 
                 # Actualizar layout
                 fig.update_layout(
@@ -477,7 +441,7 @@ if selected_view == "backtesting":
                     yaxis2=dict(
                         tickformat='.2%',
                         range=[
-                            min(dd_df['drawdown'] if 'dd_df' in locals() and not dd_df.empty else [0]) * 1.5,
+                            min(dd_df['drawdown'] if not dd_df.empty else [0]) * 1.5,
                             0
                         ]
                     )
@@ -493,19 +457,8 @@ if selected_view == "backtesting":
         st.subheader(t("bt_technical_analysis_subheader", lang))
         if 'price_data' in results:
             try:
-                # Convertir price_data a DataFrame
-                price_data_list = []
-                for timestamp_str, data in results['price_data'].items():
-                    timestamp = safe_parse_timestamp(timestamp_str)
-                    if timestamp is not None:
-                        data['timestamp'] = timestamp
-                        price_data_list.append(data)
-
-                price_df = pd.DataFrame(price_data_list)
+                price_df = results['price_data']
                 if not price_df.empty:
-                    price_df.set_index('timestamp', inplace=True)
-                    price_df.sort_index(inplace=True)
-
                     # Crear gráfico con subplots
                     fig = make_subplots(rows=2, cols=1,
                                       shared_xaxes=True,
@@ -530,9 +483,9 @@ if selected_view == "backtesting":
                     short_entries = []
                     exits = []
 
-                    for trade in results['trades']:
-                        entry_time = pd.to_datetime(trade['entry_time'])
-                        exit_time = pd.to_datetime(trade['exit_time'])
+                    for trade in results['trades'].to_dict('records'):
+                        entry_time = trade['entry_time']
+                        exit_time = trade['exit_time']
 
                         if trade['type'] == 'long':
                             long_entries.append({
@@ -704,12 +657,16 @@ if selected_view == "backtesting":
 
         # 5. Tabla de trades
         st.subheader(t("bt_trades_subheader", lang))
-        if results.get('trades'):
-            trades_df = pd.DataFrame(results['trades'])
-            trades_df['entry_time'] = pd.to_datetime(trades_df['entry_time'])
-            trades_df['exit_time'] = pd.to_datetime(trades_df['exit_time'])
+        if not results['trades'].empty:
+            trades_df = results['trades'].copy()
             trades_df['duration'] = trades_df['exit_time'] - trades_df['entry_time']
 
+            # Las señales de entrada se guardan como códigos por temporalidad
+            for column in [c for c in trades_df.columns if c.startswith('signal_')]:
+                trades_df[column] = trades_df[column].map(SIGNAL_NAMES).where(
+                    trades_df[f"strength_{column[len('signal_'):]}"].notna(), ''
+                )
+
             # Formatear la tabla
             trades_df['pnl'] = trades_df['pnl'].round(2)
             trades_df['entry_price'] = trades_df['entry_price'].round(2)
@@ -742,6 +699,9 @@ if selected_view == "backtesting":
             st.write(t("bt_final_capital_line", lang, value=results['final_capital']))
             st.write(t("bt_total_return_line", lang, value=results['total_return']))
             st.write(t("bt_max_drawdown_line", lang, value=results['max_drawdown']))
+            if 'sharpe_ratio' in results:
+                st.write(t("bt_sharpe_line", lang, value=results['sharpe_ratio']))
+                st.write(t("bt_sortino_line", lang, value=results['sortino_ratio']))
 
     except Exception as e:
         st.error(t("bt_load_error", lang, error=str(e)))
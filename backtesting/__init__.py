@@ -4,13 +4,22 @@ Módulo de backtesting para estrategias de trading
 """
 
 from .engine import BacktestEngine
+from .portfolio import PortfolioBacktestEngine
+from .trade_log import TradeLog
 from .metrics import (
     calculate_statistics,
+    calculate_equity_metrics,
     calculate_max_drawdown,
     calculate_profit_factor,
     calculate_sharpe_ratio,
-    calculate_sortino_ratio
+    calculate_sortino_ratio,
+    calculate_equity_sharpe_ratio,
+    calculate_equity_sortino_ratio,
+    drawdown_series,
+    periods_per_year
 )
+from .incremental import RunningStats, DrawdownTracker, RollingWindow, PerformanceTracker
+from .montecarlo import run_monte_carlo, simulate_trade_sequences
 from .visualization import (
     create_performance_chart,
     create_drawdown_chart,
@@ -21,11 +30,24 @@ from .visualization import (
 
 __all__ = [
     'BacktestEngine',
+    'PortfolioBacktestEngine',
+    'TradeLog',
     'calculate_statistics',
+    'calculate_equity_metrics',
     'calculate_max_drawdown',
     'calculate_profit_factor',
     'calculate_sharpe_ratio',
     'calculate_sortino_ratio',
+    'calculate_equity_sharpe_ratio',
+    'calculate_equity_sortino_ratio',
+    'drawdown_series',
+    'periods_per_year',
+    'RunningStats',
+    'DrawdownTracker',
+    'RollingWindow',
+    'PerformanceTracker',
+    'run_monte_carlo',
+    'simulate_trade_sequences',
     'create_performance_chart',
     'create_drawdown_chart',
     'create_trade_distribution_chart',
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Cachés en disco para resultados y señales de backtesting
+
+Las entradas se identifican por un hash estable de los parámetros, del código
+de la estrategia y de la huella de los datos, así que cualquier cambio en
+alguno de ellos invalida la entrada sin intervención manual.
+"""
+
+import os
+import json
+import glob
+import shutil
+import hashlib
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.environ.get("BACKTEST_CACHE_DIR", os.path.join(tempfile.gettempdir(), "trading_bot_cache"))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+def make_cache_key(*parts):
+    """
+    Genera una clave estable (sha256) a partir de valores serializables
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def frame_fingerprint(df):
+    """
+    Huella de un DataFrame de velas: cambia si cambia cualquier timestamp o valor
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if df is None or df.empty:
+        return digest.hexdigest()
+    digest.update(df.index.as_unit('ns').asi8.tobytes())
+    digest.update(np.ascontiguousarray(df.to_numpy(dtype=np.float64)).tobytes())
+    digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+def _source_files(module):
+    """Archivos .py de un módulo o, si es un paquete, de todo el paquete (ordenados)"""
+    if not hasattr(module, '__path__'):
+        return [(os.path.basename(module.__file__), module.__file__)]
+    files = []
+    for directory in module.__path__:
+        for root, dirs, names in os.walk(directory):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            for name in sorted(names):
+                if name.endswith('.py'):
+                    path = os.path.join(root, name)
+                    files.append((os.path.relpath(path, os.path.dirname(directory)), path))
+    return files
+
+def source_fingerprint(*modules):
+    """
+    Huella del código fuente de los módulos o paquetes dados (versión de la estrategia)
+
+    De un paquete se incluyen todos sus archivos .py, así que también cuentan los
+    módulos que se importan de forma indirecta.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for module in modules:
+        for name, path in _source_files(module):
+            digest.update(name.replace(os.sep, '/').encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    Caché de archivos con tamaño máximo y desalojo del menos usado recientemente
+
+    Cada entrada es un grupo de archivos '<clave>.<extensión>' dentro del directorio.
+    Los archivos a medio escribir van al subdirectorio 'tmp' (fuera de los patrones
+    de files() y evict()) y se mueven a su sitio con os.replace al terminar.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory: Directorio de la caché
+            max_bytes: Tamaño máximo total en disco
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, extension):
+        """Ruta del archivo de una entrada"""
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def write(self, key, extension, writer):
+        """
+        Escribe de forma atómica el archivo de una entrada
+
+        Args:
+            writer: Función que recibe la ruta temporal y escribe en ella el archivo
+        """
+        tmp_dir = os.path.join(self.directory, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, f"{key}.{os.getpid()}.{threading.get_ident()}.{extension}")
+        try:
+            writer(tmp_path)
+            os.replace(tmp_path, self.path(key, extension))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def files(self, key):
+        """Archivos de una entrada"""
+        return glob.glob(os.path.join(self.directory, f"{key}.*"))
+
+    def contains(self, key, extension):
+        """Indica si la entrada existe y marca su uso para el desalojo"""
+        path = self.path(key, extension)
+        if not os.path.exists(path):
+            return False
+        for file_path in self.files(key):
+            os.utime(file_path)
+        return True
+
+    def evict(self):
+        """Elimina las entradas menos usadas hasta respetar el tamaño máximo"""
+        entries = {}
+        for file_path in glob.glob(os.path.join(self.directory, "*.*")):
+            key = os.path.basename(file_path).split('.', 1)[0]
+            stat = os.stat(file_path)
+            size, last_used = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(last_used, stat.st_mtime))
+
+        total = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for file_path in self.files(key):
+                os.remove(file_path)
+            total -= size
+
+class ResultCache(DiskCache):
+    """
+    Caché de resultados completos en formato columnar (manifiesto .json + datos .npz)
+    """
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "results"), max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(directory, max_bytes)
+
+    def get(self, key, dest_base):
+        """
+        Copia la entrada a dest_base si existe
+
+        Returns:
+            str: Ruta del manifiesto copiado o None si no hay entrada
+        """
+        if not self.contains(key, 'json'):
+            return None
+        shutil.copyfile(self.path(key, 'npz'), f"{dest_base}.npz")
+        shutil.copyfile(self.path(key, 'json'), f"{dest_base}.json")
+        return f"{dest_base}.json"
+
+    def put(self, key, manifest_path):
+        """Guarda en la caché los archivos de un resultado ya escrito"""
+        base = manifest_path[:-len('.json')]
+        self.write(key, 'npz', lambda tmp_path: shutil.copyfile(f"{base}.npz", tmp_path))
+        # El manifiesto se copia al final: su presencia marca la entrada como completa
+        self.write(key, 'json', lambda tmp_path: shutil.copyfile(manifest_path, tmp_path))
+        self.evict()
+
+class SignalCache(DiskCache):
+    """
+    Caché de series de señales (código + fuerza por vela) de una temporalidad
+    """
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "signals"), max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(directory, max_bytes)
+
+    def get(self, key):
+        """
+        Returns:
+            pd.DataFrame: Serie con columnas 'signal' y 'strength', o None si no hay entrada
+        """
+        if not self.contains(key, 'npz'):
+            return None
+        with np.load(self.path(key, 'npz'), allow_pickle=False) as data:
+            index = pd.DatetimeIndex(data['index'].view('datetime64[ns]'), name='timestamp')
+            return pd.DataFrame({'signal': data['signal'], 'strength': data['strength']}, index=index)
+
+    def put(self, key, series):
+        """Guarda una serie de señales"""
+        self.write(key, 'npz', lambda tmp_path: np.savez(
+            tmp_path,
+            index=series.index.to_numpy(dtype='datetime64[ns]').view(np.int64),
+            signal=series['signal'].to_numpy(),
+            strength=series['strength'].to_numpy()
+        ))
+        self.evict()
@@ -4,41 +4,224 @@ Motor de backtesting para estrategias de trading
 """
 
 import os
+import glob
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from strategy.macd_strategy import check_macd_signal
-from utils.api_data import get_price_data
-from config import TIMEFRAMES, SIGNAL_WEIGHTS, SIGNAL_THRESHOLD
-from .metrics import calculate_statistics
-from risk_management.position_manager import PositionManager
+import strategy.macd_strategy
+from strategy.macd_strategy import calculate_signal_series, MACDSignalState, SIGNAL_NAMES, SIGNAL_LOOKBACK
+from utils.candle_store import get_cached_price_data, get_candle_store
+from utils.api_data import warmup_start
+from config import TIMEFRAMES, SIGNAL_WEIGHTS, SIGNAL_THRESHOLD, TIMEFRAME_MINUTES
+from .metrics import calculate_equity_metrics, calculate_profit_factor, periods_per_year
+from .cache import SignalCache, frame_fingerprint, make_cache_key, source_fingerprint
+from .trade_log import TradeLog
+from .incremental import PerformanceTracker
+from .storage import save_results, with_initial_balance, save_engine_state, load_engine_state, PRICE_COLUMNS
+from risk_management.position_manager import PositionManager, DEFAULT_RISK_CONFIG
 import pandas_ta as ta
 
+# Versión del código de señales: si cambia la estrategia se invalidan las señales en caché
+STRATEGY_SOURCE_VERSION = source_fingerprint(strategy.macd_strategy)
+
+# Niveles de registro por vela: solo estadísticas, + capital y drawdown, + precio y MACD
+RECORDING_LEVELS = ('summary', 'equity', 'full')
+
+# check_macd_signal solo se evaluaba con al menos 35 velas
+MIN_SIGNAL_BARS = 35
+
+def candle_fingerprint(symbol, start_date, end_date, timeframes, intrabar_timeframe=None):
+    """
+    Huella de las velas que cargaría BacktestEngine, tomada del almacén local
+
+    Cubre el mismo rango que el motor (con las velas de calentamiento de cada
+    temporalidad y las de la temporalidad intrabar) sin construir DataFrames ni
+    calcular indicadores, así que sirve para consultar la caché de resultados
+    antes de crear el motor.
+
+    Returns:
+        str: Clave estable de las velas de todas las temporalidades
+    """
+    store = get_candle_store()
+    parts = [
+        (tf, store.fingerprint(symbol, tf, warmup_start(start_date, tf, SIGNAL_LOOKBACK), end_date))
+        for tf in sorted(timeframes)
+    ]
+    if intrabar_timeframe is not None:
+        bar = timedelta(minutes=TIMEFRAME_MINUTES[timeframes[0]])
+        parts.append(('intrabar', intrabar_timeframe, store.fingerprint(symbol, intrabar_timeframe, start_date, end_date + bar)))
+    return make_cache_key(*parts)
+
+class _SignalStream:
+    """
+    Señales de una temporalidad leídas por bloques y alineadas a las velas de la principal
+
+    Mantiene el estado de los indicadores entre bloques y solo conserva las velas
+    que todavía pueden corresponder a velas futuras de la temporalidad principal.
+    """
+
+    def __init__(self, chunks, timeframe, state=None):
+        """
+        Args:
+            chunks: Iterador de bloques de velas de la temporalidad
+            timeframe: Temporalidad
+            state: Estado guardado con to_dict() desde el que continuar (por defecto None)
+        """
+        self.chunks = iter(chunks)
+        self.timeframe = timeframe
+        self.state = MACDSignalState(timeframe)
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.codes = np.empty(0, dtype=np.int8)
+        self.strengths = np.empty(0, dtype=np.float64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.exhausted = False
+        if state is not None:
+            self.state = MACDSignalState.from_dict(state['state'])
+            self.timestamps = np.array(state['timestamps'], dtype=np.int64)
+            self.codes = np.array(state['codes'], dtype=np.int8)
+            self.strengths = np.array(state['strengths'], dtype=np.float64)
+            self.counts = np.array(state['counts'], dtype=np.int64)
+
+    @staticmethod
+    def last_timestamp(state):
+        """Timestamp (ms) de la última vela procesada según un estado guardado (None si ninguna)"""
+        return state['timestamps'][-1] if state is not None and state['timestamps'] else None
+
+    def to_dict(self):
+        """Estado serializable: indicadores y velas pendientes de alinear"""
+        return {
+            'state': self.state.to_dict(),
+            'timestamps': self.timestamps.tolist(),
+            'codes': self.codes.tolist(),
+            'strengths': self.strengths.tolist(),
+            'counts': self.counts.tolist()
+        }
+
+    def _extend(self):
+        """Procesa el siguiente bloque; retorna False si no quedan velas"""
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            return False
+        first = self.state.bars
+        codes, strengths, *_ = self.state.update_many(
+            chunk['high'].to_numpy(), chunk['low'].to_numpy(), chunk['close'].to_numpy()
+        )
+        self.timestamps = np.concatenate([self.timestamps, chunk.index.as_unit('ms').asi8])
+        self.codes = np.concatenate([self.codes, codes])
+        self.strengths = np.concatenate([self.strengths, strengths])
+        self.counts = np.concatenate([self.counts, np.arange(first + 1, self.state.bars + 1)])
+        return True
+
+    def align(self, timestamps):
+        """
+        Señal vigente en cada timestamp (ms, ascendentes): la de la última vela con apertura <= timestamp
+
+        Returns:
+            tuple: (disponible, códigos, fuerzas) como arrays
+        """
+        while not self.exhausted and (len(self.timestamps) == 0 or self.timestamps[-1] <= timestamps[-1]):
+            self._extend()
+
+        if len(self.timestamps) == 0:
+            n = len(timestamps)
+            return np.zeros(n, dtype=bool), np.zeros(n, dtype=np.int8), np.zeros(n)
+
+        positions = np.searchsorted(self.timestamps, timestamps, side='right') - 1
+        safe = np.maximum(positions, 0)
+        available = (positions >= 0) & (self.counts[safe] >= MIN_SIGNAL_BARS)
+        codes, strengths = self.codes[safe], self.strengths[safe]
+
+        keep = safe[-1]
+        self.timestamps = self.timestamps[keep:]
+        self.codes = self.codes[keep:]
+        self.strengths = self.strengths[keep:]
+        self.counts = self.counts[keep:]
+        return available, codes, strengths
+
+class _IntrabarResolver:
+    """
+    Velas de una temporalidad inferior para resolver las salidas dentro de una vela
+
+    Las filas vienen del almacén local (mapeadas en memoria) y solo se buscan, por
+    índice, las velas de las barras principales cuyo rango cruza algún nivel.
+    """
+
+    def __init__(self, records, bar_ms):
+        """
+        Args:
+            records: Filas de velas de la temporalidad inferior (CANDLE_DTYPE)
+            bar_ms: Duración de una vela de la temporalidad principal en milisegundos
+        """
+        self.records = records
+        self.timestamps = records['timestamp']
+        self.bar_ms = bar_ms
+
+    def candles(self, start_ms):
+        """Velas inferiores contenidas en la vela principal que abre en start_ms"""
+        lo, hi = np.searchsorted(self.timestamps, [start_ms, start_ms + self.bar_ms])
+        return self.records[lo:hi]
+
 class BacktestEngine:
     """
     Motor de backtesting para simular estrategias de trading en datos históricos
     """
     
-    def __init__(self, symbol, start_date, end_date, initial_capital=1000.0, timeframes=None, risk_config=None):
+    def __init__(self, symbol, start_date, end_date, initial_capital=1000.0, timeframes=None, risk_config=None,
+                 use_signal_cache=True, streaming=False, chunk_size=100_000, output_dir=None, recording='full',
+                 intrabar_timeframe=None, resume=False):
         """
         Inicializa el motor de backtesting
         
         Args:
             symbol: Par de trading (ej. 'BTC/USDT')
-            start_date: Fecha de inicio (datetime)
+            start_date: Fecha de inicio (datetime); cada temporalidad se carga además con
+                SIGNAL_LOOKBACK velas previas para calentar los indicadores, que no se simulan
             end_date: Fecha de fin (datetime)
             initial_capital: Capital inicial para la simulación (por defecto 1000.0)
             timeframes: Lista de temporalidades a analizar (por defecto ['4h'])
             risk_config: Configuración de gestión de riesgo (por defecto None)
+            use_signal_cache: Reutilizar series de señales ya calculadas para las mismas velas (por defecto True)
+            streaming: Procesar las velas por bloques desde el almacén local con memoria acotada (por defecto False)
+            chunk_size: Velas por bloque en modo streaming
+            output_dir: Directorio donde el modo streaming escribe los datos por vela
+            recording: Datos por vela a registrar: 'summary' (solo estadísticas), 'equity'
+                (capital y drawdown) o 'full' (además precio y MACD) (por defecto 'full')
+            intrabar_timeframe: Temporalidad inferior (ej. '1m') con la que resolver los stop loss,
+                take profit y trailing stops que toca el máximo o el mínimo de la vela (por defecto
+                None: las salidas se comprueban solo contra el cierre)
+            resume: En modo streaming, retomar el estado guardado en output_dir por la ejecución
+                anterior y procesar solo las velas nuevas (por defecto False)
         """
+        if recording not in RECORDING_LEVELS:
+            raise ValueError(f"Nivel de registro no válido: {recording} (opciones: {', '.join(RECORDING_LEVELS)})")
+        main_tf = (timeframes or ['4h'])[0]
+        if intrabar_timeframe is not None and TIMEFRAME_MINUTES.get(intrabar_timeframe, 0) >= TIMEFRAME_MINUTES[main_tf]:
+            raise ValueError(f"La temporalidad intrabar ({intrabar_timeframe}) debe ser inferior a {main_tf}")
+        
         self.symbol = symbol
-        self.start_date = start_date - timedelta(days=2)  # 2 días extra para cálculo de MACD
+        self.start_date = start_date
         self.end_date = end_date
         self.initial_capital = initial_capital
         self.timeframes = timeframes or ['4h']
         
         # Inicializar gestor de posiciones
         self.position_manager = PositionManager(risk_config)
+        self.signal_cache = SignalCache() if use_signal_cache else None
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.output_dir = output_dir
+        self.recording = recording
+        self.intrabar_timeframe = intrabar_timeframe
+        self.intrabar = None
+        self.resume = resume
+        
+        if streaming:
+            # Las velas se leen por bloques al ejecutar
+            if output_dir is None:
+                raise ValueError("El modo streaming necesita output_dir")
+            self.data = {}
+            return
         
         # Cargar datos históricos
         self.data = self._load_historical_data()
@@ -51,24 +234,25 @@ class BacktestEngine:
         Carga todos los datos históricos necesarios de una sola vez
         """
         data = {}
-        print("\n🔄 Descargando datos históricos...")
+        print("\n🔄 Cargando datos históricos (caché local + velas nuevas)...")
         
         for tf in self.timeframes:
-            print(f"📊 Descargando {tf} para {self.symbol}")
-            df = get_price_data(
+            print(f"📊 Cargando {tf} para {self.symbol}")
+            df = get_cached_price_data(
                 symbol=self.symbol,
-                start_date=self.start_date,
+                start_date=warmup_start(self.start_date, tf, SIGNAL_LOOKBACK),
                 end_date=self.end_date,
                 timeframe=tf
             )
             
             if df is not None and not df.empty:
                 if len(df) >= 35:  # Verificar datos suficientes para MACD
-                    # Calcular MACD usando pandas_ta
-                    macd = df.ta.macd(close='close', fast=12, slow=26, signal=9)
-                    df['MACD_12_26_9'] = macd['MACD_12_26_9']
-                    df['MACDs_12_26_9'] = macd['MACDs_12_26_9']
-                    df['MACDh_12_26_9'] = macd['MACDh_12_26_9']
+                    if self.recording == 'full':
+                        # Calcular MACD usando pandas_ta (solo se usa para registrar precio y MACD)
+                        macd = df.ta.macd(close='close', fast=12, slow=26, signal=9)
+                        df['MACD_12_26_9'] = macd['MACD_12_26_9']
+                        df['MACDs_12_26_9'] = macd['MACDs_12_26_9']
+                        df['MACDh_12_26_9'] = macd['MACDh_12_26_9']
                     data[tf] = df
                     print(f"✅ {len(df)} períodos cargados para {tf}")
                 else:
@@ -78,160 +262,477 @@ class BacktestEngine:
         
         return data
 
+    def data_fingerprint(self):
+        """
+        Huella de las velas cargadas: cambia si cambia cualquier vela de cualquier temporalidad
+        """
+        ohlcv = ['open', 'high', 'low', 'close', 'volume']
+        return make_cache_key(*[(tf, frame_fingerprint(self.data[tf][ohlcv])) for tf in sorted(self.data)])
+
+    def _signal_series(self):
+        """
+        Calcula (o recupera de caché) la serie de señales de cada temporalidad
+
+        Las señales solo dependen de las velas y del código de la estrategia, no de la
+        configuración de riesgo, así que se guardan en disco con esa clave y los cambios
+        de stop loss, take profit o tamaño de posición reutilizan el cálculo.
+        """
+        series = {}
+        for tf, df in self.data.items():
+            key = None
+            if self.signal_cache is not None:
+                key = make_cache_key(
+                    'signals', tf, frame_fingerprint(df[['open', 'high', 'low', 'close', 'volume']]),
+                    STRATEGY_SOURCE_VERSION
+                )
+                cached = self.signal_cache.get(key)
+                if cached is not None:
+                    print(f"⚡ Señales de {tf} recuperadas de caché")
+                    series[tf] = cached
+                    continue
+
+            series[tf] = calculate_signal_series(df, tf)
+            if key is not None:
+                self.signal_cache.put(key, series[tf])
+        return series
+
+    def _reset_state(self):
+        """Reinicia el estado de la simulación (posición, capital, máximo y operaciones)"""
+        self.position_manager.current_position = None
+        self.current_capital = self.initial_capital
+        self.max_capital = self.initial_capital
+        self.trades = TradeLog(self.timeframes)
+        self.bars_processed = 0
+
+    def _load_intrabar(self):
+        """Prepara las velas inferiores del almacén local para resolver salidas dentro de la vela"""
+        self.intrabar = None
+        if self.intrabar_timeframe is None:
+            return
+        bar_ms = TIMEFRAME_MINUTES[self.timeframes[0]] * 60_000
+        records = get_candle_store().get_records(
+            self.symbol, self.intrabar_timeframe, self.start_date,
+            self.end_date + timedelta(milliseconds=bar_ms)
+        )
+        if len(records) == 0:
+            print(f"⚠️ Sin velas {self.intrabar_timeframe}: las salidas se resuelven con máximo y mínimo de la vela")
+        self.intrabar = _IntrabarResolver(records, bar_ms)
+
+    def _next_exit(self, timestamps, closes, start, opens=None, highs=None, lows=None, timestamps_ms=None):
+        """
+        Busca la siguiente salida de la posición abierta a partir de la vela start
+
+        Sin highs/lows las salidas se comprueban contra el cierre. Con ellos, la
+        primera vela cuyo rango cruza algún nivel se resuelve con las velas de la
+        temporalidad inferior (orden real de los eventos y precio del nivel); si esas
+        velas no llegan a cruzarlo se sigue buscando desde la vela siguiente.
+
+        Returns:
+            tuple: (índice de la vela de salida, razón, precio, timestamp) o (None, None, None, None)
+        """
+        manager = self.position_manager
+        if highs is None:
+            offset, reason, _ = manager.find_first_exit(closes[start:])
+            if offset is None:
+                return None, None, None, None
+            return start + offset, reason, closes[start + offset], timestamps[start + offset]
+        
+        position = manager.current_position
+        n = len(closes)
+        while start < n:
+            saved = {key: position[key] for key in ('highest_price', 'lowest_price', 'trailing_stop')}
+            offset, reason, price = manager.find_first_exit(
+                closes[start:], highs[start:], lows[start:], opens[start:]
+            )
+            if offset is None:
+                return None, None, None, None
+            index = start + offset
+            candles = self.intrabar.candles(timestamps_ms[index]) if self.intrabar is not None else []
+            if len(candles) == 0:
+                return index, reason, price, timestamps[index]
+            
+            # Estado de la posición al abrir la vela y recorrido de sus velas inferiores
+            position.update(saved)
+            manager.find_first_exit(closes[start:index], highs[start:index], lows[start:index])
+            sub_offset, reason, price = manager.find_first_exit(
+                candles['close'], candles['high'], candles['low'], candles['open']
+            )
+            if sub_offset is not None:
+                return index, reason, price, pd.Timestamp(int(candles['timestamp'][sub_offset]), unit='ms')
+            start = index + 1
+        return None, None, None, None
+
+    def _simulate(self, timestamps, closes, tf_signals, opens=None, highs=None, lows=None):
+        """
+        Simula un bloque de velas de la temporalidad principal sobre el estado actual
+
+        Args:
+            timestamps: DatetimeIndex de las velas
+            closes: Precios de cierre (array)
+            tf_signals: Lista de (temporalidad, disponible, códigos, fuerzas) alineados a las velas
+            opens, highs, lows: Resto de precios de las velas (solo en modo intrabar)
+
+        Returns:
+            tuple: Arrays de capital, drawdown y máscara de velas con cierre de posición
+        """
+        n = len(closes)
+        balances = np.empty(n, dtype=np.float64)
+        drawdowns = np.zeros(n, dtype=np.float64)
+        exits = np.zeros(n, dtype=bool)
+        timestamps_ms = timestamps.as_unit('ms').asi8 if highs is not None else None
+        
+        i = 0
+        while i < n:
+            # Con una posición abierta el capital no cambia hasta la salida:
+            # se busca la vela de salida de una vez y se salta hasta ella
+            if self.position_manager.get_current_position():
+                exit_index, exit_reason, exit_price, exit_time = self._next_exit(
+                    timestamps, closes, i, opens, highs, lows, timestamps_ms
+                )
+                stop = n if exit_index is None else exit_index
+                balances[i:stop] = self.current_capital
+                if self.current_capital < self.max_capital:
+                    drawdowns[i:stop] = (self.max_capital - self.current_capital) / self.max_capital * 100
+                if exit_index is None:
+                    break
+                
+                i = stop
+                trade = self.position_manager.close_position(
+                    exit_price=exit_price,
+                    exit_time=exit_time,
+                    exit_reason=exit_reason
+                )
+                
+                self.trades.append(trade)
+                self.current_capital += trade['pnl']
+                
+                if self.current_capital > self.max_capital:
+                    self.max_capital = self.current_capital
+                
+                print(f"\n📊 Cerrada posición {trade['type']} por {exit_reason} a {exit_price:.2f} (P&L: {trade['pnl']:.2f})")
+                exits[i] = True
+                i += 1
+                continue
+            
+            timestamp = timestamps[i]
+            current_price = closes[i]
+            
+            # Procesar señales de entrada
+            entry = next(
+                (SIGNAL_NAMES[codes[i]] for _, available, codes, _ in tf_signals if available[i] and codes[i] != 0),
+                None
+            )
+            if entry is not None:
+                signals = [
+                    {
+                        'timestamp': timestamp,
+                        'timeframe': tf,
+                        'signal': SIGNAL_NAMES[codes[i]],
+                        'strength': strengths[i]
+                    }
+                    for tf, available, codes, strengths in tf_signals if available[i]
+                ]
+                position_type = 'long' if entry in ['buy', 'valley_buy'] else 'short'
+                position = self.position_manager.open_position(
+                    position_type=position_type,
+                    entry_price=current_price,
+                    entry_time=timestamp,
+                    capital=self.current_capital,
+                    signals=signals
+                )
+                # Añadir stop loss y take profit a la posición
+                if position_type == 'long':
+                    position['stop_loss_price'] = current_price * (1 - self.position_manager.stop_loss_pct)
+                    position['take_profit_price'] = current_price * (1 + self.position_manager.take_profit_pct)
+                    print(f"\n📈 Abierta posición long a {current_price:.2f}")
+                else:
+                    position['stop_loss_price'] = current_price * (1 + self.position_manager.stop_loss_pct)
+                    position['take_profit_price'] = current_price * (1 - self.position_manager.take_profit_pct)
+                    print(f"\n📉 Abierta posición short a {current_price:.2f}")
+                print(f"🛑 Stop Loss: {position['stop_loss_price']:.2f}")
+                print(f"✅ Take Profit: {position['take_profit_price']:.2f}")
+        
+            # Registrar balance y drawdown actuales
+            balances[i] = self.current_capital
+            if self.current_capital < self.max_capital:
+                drawdowns[i] = (self.max_capital - self.current_capital) / self.max_capital * 100
+            i += 1
+        
+        self.bars_processed += n
+        return balances, drawdowns, exits
+
+    def _summary(self, max_drawdown):
+        """Estadísticas finales a partir del estado de la simulación"""
+        pnl = self.trades.pnl
+        winning_trades = int((pnl > 0).sum())
+        losing_trades = int((pnl < 0).sum())
+        total_trades = len(pnl)
+        
+        return {
+            'symbol': self.symbol,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'timeframes': self.timeframes,
+            'initial_capital': self.initial_capital,
+            'final_capital': self.current_capital,
+            'total_return': ((self.current_capital - self.initial_capital) / self.initial_capital) * 100,
+            'total_trades': total_trades,
+            'winning_trades': winning_trades,
+            'losing_trades': losing_trades,
+            'win_rate': (winning_trades / total_trades * 100) if total_trades > 0 else 0,
+            'max_drawdown': max_drawdown,
+            'profit_factor': calculate_profit_factor(pnl),
+            'trades': self.trades
+        }
+
     def run(self):
         """
         Ejecuta el backtesting y retorna los resultados
         """
-        print("\n🔄 Ejecutando backtesting...")
-        
-        trades = []
-        price_data = {}
-        drawdown_data = {}
-        balance_history = {}
-        current_capital = self.initial_capital
-        max_capital = current_capital
+        if self.streaming:
+            return self._run_streaming()
         
-        # Registrar balance inicial
-        balance_history[self.start_date.isoformat()] = current_capital
+        print("\n🔄 Ejecutando backtesting...")
+        self._reset_state()
         
         # Obtener timestamps únicos del primer timeframe
         main_tf = self.timeframes[0]
         if main_tf not in self.data:
             raise ValueError(f"No hay datos disponibles para {main_tf}")
         
-        timestamps = self.data[main_tf].index
+        # Las velas de calentamiento solo sirven para las señales: se simula desde start_date
+        first = self.data[main_tf].index.searchsorted(pd.Timestamp(self.start_date))
+        main_df = self.data[main_tf].iloc[first:]
+        timestamps = main_df.index
+        closes = main_df['close'].to_numpy(dtype=np.float64)
         
-        # Iterar sobre cada timestamp
-        for timestamp in timestamps:
-            current_price = self.data[main_tf].loc[timestamp, 'close']
-            
-            # Si hay una posición abierta, verificar señales de salida
-            if self.position_manager.get_current_position():
-                should_exit, exit_reason, _ = self.position_manager.check_exit_signals(current_price)
-                
-                if should_exit:
-                    trade = self.position_manager.close_position(
-                        exit_price=current_price,
-                        exit_time=timestamp,
-                        exit_reason=exit_reason
-                    )
-                    
-                    trades.append(trade)
-                    current_capital += trade['pnl']
-                    
-                    if current_capital > max_capital:
-                        max_capital = current_capital
-                    
-                    print(f"\n📊 Cerrada posición {trade['type']} por {exit_reason} a {current_price:.2f} (P&L: {trade['pnl']:.2f})")
-                    continue
+        # Señales de cada temporalidad alineadas a las velas de la principal: en cada
+        # vela vale la última vela de la temporalidad con apertura <= timestamp
+        tf_signals = []
+        for tf, series in self._signal_series().items():
+            positions = series.index.searchsorted(timestamps, side='right') - 1
+            available = positions >= MIN_SIGNAL_BARS - 1
+            codes = series['signal'].to_numpy()[np.maximum(positions, 0)]
+            strengths = series['strength'].to_numpy()[np.maximum(positions, 0)]
+            tf_signals.append((tf, available, codes, strengths))
+        tf_signals.sort(key=lambda item: self.timeframes.index(item[0]))
+        
+        self._load_intrabar()
+        bars = {}
+        if self.intrabar is not None:
+            bars = {f'{column}s': main_df[column].to_numpy(dtype=np.float64) for column in ('open', 'high', 'low')}
+        balances, drawdowns, exits = self._simulate(timestamps, closes, tf_signals, **bars)
+        
+        # Las velas con cierre de posición no registran balance, drawdown ni precio
+        recorded = ~exits
+        results = self._summary(drawdowns[recorded].max() if recorded.any() else 0)
+        
+        # Ratios anualizados sobre la curva de capital por vela
+        equity_metrics = calculate_equity_metrics(
+            np.concatenate([[self.initial_capital], balances[recorded]]), periods_per_year(main_tf)
+        )
+        results['sharpe_ratio'] = equity_metrics['sharpe_ratio']
+        results['sortino_ratio'] = equity_metrics['sortino_ratio']
+        
+        if self.recording in ('equity', 'full'):
+            equity = pd.DataFrame(
+                {'balance': balances[recorded], 'drawdown': drawdowns[recorded]},
+                index=timestamps[recorded]
+            )
+            results['equity'] = with_initial_balance(equity, self.start_date, self.initial_capital)
+        
+        if self.recording == 'full':
+            # Guardar datos de precio y MACD
+            with_price = recorded & (np.arange(first, first + len(timestamps)) >= MIN_SIGNAL_BARS - 1)
+            results['price_data'] = main_df.loc[with_price, list(PRICE_COLUMNS)].astype(np.float64)
+        
+        return results
+
+    def _run_streaming(self):
+        """
+        Ejecuta el backtesting por bloques con memoria acotada
 
-            # Generar señales para cada timeframe
-            signals = []
-            for tf in self.timeframes:
-                if tf in self.data:
-                    df_slice = self.data[tf][self.data[tf].index <= timestamp].copy()
-                    if len(df_slice) >= 35:
-                        signal, strength = check_macd_signal(df_slice, tf)
-                        if signal:
-                            signals.append({
-                                'timestamp': timestamp,
-                                'timeframe': tf,
-                                'signal': signal,
-                                'strength': strength
-                            })
-                        
-                        # Guardar datos de precio y MACD
-                        if tf == main_tf:
-                            last_row = df_slice.iloc[-1]
-                            price_data[timestamp] = {
-                                'open': last_row['open'],
-                                'high': last_row['high'],
-                                'low': last_row['low'],
-                                'close': last_row['close'],
-                                'MACD_12_26_9': last_row['MACD_12_26_9'],
-                                'MACDs_12_26_9': last_row['MACDs_12_26_9'],
-                                'MACDh_12_26_9': last_row['MACDh_12_26_9']
-                            }
+        Las velas se leen del almacén local bloque a bloque; el estado de los
+        indicadores y de la posición continúa entre bloques y los datos por vela
+        (capital, drawdown, precio y MACD) se escriben en output_dir como
+        'part_NNNNNN.npz'. El resumen y las operaciones se guardan en
+        'summary.json'/'summary.npz' (formato de storage) y se leen todos juntos
+        con storage.load_stream. Al terminar se guarda el estado completo
+        ('state.json'/'state.npz') para poder extender el backtest con resume=True.
+        """
+        print("\n🔄 Ejecutando backtesting por bloques...")
+        os.makedirs(self.output_dir, exist_ok=True)
+        main_tf = self.timeframes[0]
+        
+        saved = load_engine_state(self.output_dir) if self.resume else None
+        if saved is None:
+            self._reset_state()
+            self._clear_output(0)
+            self.cursor_ms = None
+            self.max_drawdown = 0.0
+            self.part = 0
+            self.main_state = MACDSignalState(main_tf)
+            self.performance = PerformanceTracker(self.initial_capital, periods_per_year(main_tf))
+            stream_states = [None] * (len(self.timeframes) - 1)
+        else:
+            stream_states = self._restore_state(*saved)
+            self._clear_output(self.part)
+            print(f"⏩ Retomando desde {pd.Timestamp(self.cursor_ms, unit='ms')} ({self.bars_processed} velas ya procesadas)")
+        
+        store = get_candle_store()
+        
+        def chunks(tf, last_ms):
+            # Desde el inicio del calentamiento, o solo las velas posteriores a la última procesada
+            if last_ms is None:
+                start = warmup_start(self.start_date, tf, SIGNAL_LOOKBACK)
+            else:
+                start = pd.Timestamp(last_ms + 1, unit='ms')
+            return store.iter_price_chunks(self.symbol, tf, start, self.end_date, self.chunk_size)
+        
+        self.signal_streams = [
+            _SignalStream(chunks(tf, _SignalStream.last_timestamp(state)), tf, state)
+            for tf, state in zip(self.timeframes[1:], stream_states)
+        ]
+        self._load_intrabar()
+        
+        bars_before = self.bars_processed
+        start_ms = pd.Timestamp(self.start_date).value // 1_000_000
+        for chunk in chunks(main_tf, self.cursor_ms):
+            timestamps_ms = chunk.index.as_unit('ms').asi8
+            first_bar = self.main_state.bars
+            indicators = self.main_state.update_many(
+                chunk['high'].to_numpy(), chunk['low'].to_numpy(), chunk['close'].to_numpy(dtype=np.float64)
+            )
+            bar_numbers = np.arange(first_bar, self.main_state.bars)
+            signals = [(main_tf, bar_numbers >= MIN_SIGNAL_BARS - 1, *indicators[:2])]
+            signals += [(stream.timeframe, *stream.align(timestamps_ms)) for stream in self.signal_streams]
+            self.cursor_ms = int(timestamps_ms[-1])
             
-            # Procesar señales de entrada
-            if not self.position_manager.get_current_position():
-                for signal in signals:
-                    if signal['signal'] in ['buy', 'valley_buy']:
-                        position = self.position_manager.open_position(
-                            position_type='long',
-                            entry_price=current_price,
-                            entry_time=timestamp,
-                            capital=current_capital,
-                            signals=signals
-                        )
-                        # Añadir stop loss y take profit a la posición
-                        position['stop_loss_price'] = current_price * (1 - self.position_manager.stop_loss_pct)
-                        position['take_profit_price'] = current_price * (1 + self.position_manager.take_profit_pct)
-                        print(f"\n📈 Abierta posición long a {current_price:.2f}")
-                        print(f"🛑 Stop Loss: {position['stop_loss_price']:.2f}")
-                        print(f"✅ Take Profit: {position['take_profit_price']:.2f}")
-                        break
-                    elif signal['signal'] in ['sell', 'top_sell']:
-                        position = self.position_manager.open_position(
-                            position_type='short',
-                            entry_price=current_price,
-                            entry_time=timestamp,
-                            capital=current_capital,
-                            signals=signals
-                        )
-                        # Añadir stop loss y take profit a la posición
-                        position['stop_loss_price'] = current_price * (1 + self.position_manager.stop_loss_pct)
-                        position['take_profit_price'] = current_price * (1 - self.position_manager.take_profit_pct)
-                        print(f"\n📉 Abierta posición short a {current_price:.2f}")
-                        print(f"🛑 Stop Loss: {position['stop_loss_price']:.2f}")
-                        print(f"✅ Take Profit: {position['take_profit_price']:.2f}")
-                        break
+            # Las velas de calentamiento actualizan los indicadores pero no se simulan
+            live = slice(np.searchsorted(timestamps_ms, start_ms), None)
+            chunk = chunk.iloc[live]
+            if chunk.empty:
+                continue
+            timestamps = chunk.index
+            closes = chunk['close'].to_numpy(dtype=np.float64)
+            bar_numbers = bar_numbers[live]
+            macd, macd_signal, macd_hist = (values[live] for values in indicators[2:])
+            tf_signals = [(tf, *(values[live] for values in arrays)) for tf, *arrays in signals]
             
-            # Registrar balance actual
-            balance_history[timestamp.isoformat()] = current_capital
+            bars = {}
+            if self.intrabar is not None:
+                bars = {f'{column}s': chunk[column].to_numpy(dtype=np.float64) for column in ('open', 'high', 'low')}
+            balances, drawdowns, exits = self._simulate(timestamps, closes, tf_signals, **bars)
+            recorded = ~exits
+            if recorded.any():
+                self.max_drawdown = max(self.max_drawdown, drawdowns[recorded].max())
+            self.performance.update_equity_many(balances[recorded])
             
-            # Calcular drawdown
-            if current_capital < max_capital:
-                drawdown = (max_capital - current_capital) / max_capital * 100
-            else:
-                drawdown = 0
-            drawdown_data[timestamp] = {'drawdown': drawdown}
+            if self.recording == 'summary':
+                continue
+            columns = {
+                'timestamp': timestamps.as_unit('ns').asi8,
+                'balance': balances,
+                'drawdown': drawdowns,
+                'recorded': recorded
+            }
+            if self.recording == 'full':
+                columns.update({
+                    'with_price': recorded & (bar_numbers >= MIN_SIGNAL_BARS - 1),
+                    'open': chunk['open'].to_numpy(dtype=np.float64),
+                    'high': chunk['high'].to_numpy(dtype=np.float64),
+                    'low': chunk['low'].to_numpy(dtype=np.float64),
+                    'close': closes,
+                    'MACD_12_26_9': macd,
+                    'MACDs_12_26_9': macd_signal,
+                    'MACDh_12_26_9': macd_hist
+                })
+            np.savez(os.path.join(self.output_dir, f"part_{self.part:06d}.npz"), **columns)
+            self.part += 1
         
-        # Calcular estadísticas finales
-        winning_trades = len([t for t in trades if t['pnl'] > 0])
-        losing_trades = len([t for t in trades if t['pnl'] < 0])
-        total_trades = len(trades)
+        if self.bars_processed == 0:
+            raise ValueError(f"No hay datos disponibles para {main_tf}")
         
-        results = {
+        results = self._summary(self.max_drawdown)
+        results['sharpe_ratio'] = self.performance.sharpe_ratio
+        results['sortino_ratio'] = self.performance.sortino_ratio
+        save_results(results, os.path.join(self.output_dir, 'summary'))
+        self.save_state()
+        results['output_dir'] = self.output_dir
+        print(f"✅ {self.bars_processed - bars_before} velas procesadas ({self.bars_processed} en total)")
+        return results
+
+    def _state_config(self):
+        """Parámetros que deben coincidir para retomar un estado guardado"""
+        return {
             'symbol': self.symbol,
             'start_date': self.start_date.isoformat(),
-            'end_date': self.end_date.isoformat(),
             'timeframes': self.timeframes,
             'initial_capital': self.initial_capital,
-            'final_capital': current_capital,
-            'total_return': ((current_capital - self.initial_capital) / self.initial_capital) * 100,
-            'total_trades': total_trades,
-            'winning_trades': winning_trades,
-            'losing_trades': losing_trades,
-            'win_rate': (winning_trades / total_trades * 100) if total_trades > 0 else 0,
-            'max_drawdown': max(d['drawdown'] for d in drawdown_data.values()) if drawdown_data else 0,
-            'profit_factor': self._calculate_profit_factor(trades),
-            'trades': trades,
-            'price_data': price_data,
-            'drawdown': drawdown_data,
-            'balance_history': balance_history
+            'risk_config': {key: getattr(self.position_manager, key) for key in DEFAULT_RISK_CONFIG},
+            'recording': self.recording,
+            'intrabar_timeframe': self.intrabar_timeframe,
+            'strategy_version': STRATEGY_SOURCE_VERSION
         }
-        
-        return results
-    
-    def _calculate_profit_factor(self, trades):
+
+    def save_state(self):
         """
-        Calcula el factor de beneficio de las operaciones
+        Guarda en output_dir el estado completo del backtest en streaming
+
+        Incluye posición, capital, máximo, operaciones, estado de los indicadores
+        de cada temporalidad, métricas en curso y cursor (última vela procesada).
+        """
+        state = {
+            'config': self._state_config(),
+            'cursor_ms': self.cursor_ms,
+            'bars_processed': self.bars_processed,
+            'current_capital': self.current_capital,
+            'max_capital': self.max_capital,
+            'max_drawdown': self.max_drawdown,
+            'part': self.part,
+            'position': self.position_manager.position_to_dict(),
+            'main_state': self.main_state.to_dict(),
+            'streams': [stream.to_dict() for stream in self.signal_streams],
+            'performance': self.performance.to_dict()
+        }
+        arrays = {f'trades__{name}': array for name, array in self.trades.to_arrays().items()}
+        save_engine_state(self.output_dir, state, arrays)
+
+    def _restore_state(self, state, arrays):
         """
-        total_gain = sum(t['pnl'] for t in trades if t['pnl'] > 0)
-        total_loss = abs(sum(t['pnl'] for t in trades if t['pnl'] < 0))
-        return total_gain / total_loss if total_loss > 0 else float('inf')
+        Restaura el estado guardado con save_state
 
+        Returns:
+            list: Estados guardados de las temporalidades secundarias
+        """
+        if state['config'] != self._state_config():
+            raise ValueError(f"El estado guardado en {self.output_dir} corresponde a otra configuración de backtest")
+        
+        self.position_manager.restore_position(state['position'])
+        self.current_capital = state['current_capital']
+        self.max_capital = state['max_capital']
+        self.max_drawdown = state['max_drawdown']
+        self.bars_processed = state['bars_processed']
+        self.cursor_ms = state['cursor_ms']
+        self.part = state['part']
+        self.trades = TradeLog.from_arrays(
+            self.timeframes,
+            {name[len('trades__'):]: array for name, array in arrays.items() if name.startswith('trades__')}
+        )
+        self.main_state = MACDSignalState.from_dict(state['main_state'])
+        self.performance = PerformanceTracker.from_dict(state['performance'])
+        return state['streams']
+
+    def _clear_output(self, first_part):
+        """Borra de output_dir los bloques a partir de first_part (y el estado si se empieza de cero)"""
+        for path in glob.glob(os.path.join(self.output_dir, 'part_*.npz')):
+            if int(os.path.basename(path)[len('part_'):-len('.npz')]) >= first_part:
+                os.remove(path)
+        if first_part == 0:
+            for name in ('state.json', 'state.npz'):
+                if os.path.exists(os.path.join(self.output_dir, name)):
+                    os.remove(os.path.join(self.output_dir, name))
+    
     def _print_results(self):
         """
         Imprime los resultados del backtest
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas de rendimiento incrementales
+
+Acumuladores con actualización O(1) por vela u operación para sesiones largas
+(trading en vivo, backtests por bloques): no guardan el histórico y dan en
+todo momento los mismos valores que calculate_equity_metrics sobre la curva
+completa.
+"""
+
+import math
+import numpy as np
+
+class RunningStats:
+    """
+    Media y varianza en una pasada (algoritmo de Welford)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, value):
+        """Añade un valor"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def update_many(self, values):
+        """Añade un bloque de valores combinando sus estadísticos (Chan et al.)"""
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        block_mean = values.mean()
+        block_m2 = ((values - block_mean) ** 2).sum()
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += block_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def variance(self):
+        """Varianza poblacional (como np.std por defecto)"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+class DrawdownTracker:
+    """
+    Máximo acumulado y drawdown actual y máximo de una curva de capital
+    """
+
+    def __init__(self):
+        self.peak = None
+        self.current = 0.0
+        self.max_drawdown = 0.0
+
+    def update(self, equity):
+        """Añade un valor de capital; retorna el drawdown actual (0-1)"""
+        if self.peak is None or equity > self.peak:
+            self.peak = equity
+        self.current = (self.peak - equity) / self.peak
+        if self.current > self.max_drawdown:
+            self.max_drawdown = self.current
+        return self.current
+
+    def update_many(self, values):
+        """Añade un bloque de valores de capital"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        peaks = np.maximum.accumulate(values)
+        if self.peak is not None:
+            peaks = np.maximum(peaks, self.peak)
+        drawdowns = (peaks - values) / peaks
+        self.peak = peaks[-1]
+        self.current = drawdowns[-1]
+        self.max_drawdown = max(self.max_drawdown, drawdowns.max())
+
+class RollingWindow:
+    """
+    Ventana deslizante de tamaño fijo sobre un buffer circular con sumas en curso
+    """
+
+    def __init__(self, size):
+        """
+        Args:
+            size: Número de valores de la ventana
+        """
+        self.size = size
+        self.buffer = np.zeros(size, dtype=np.float64)
+        self.position = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, value):
+        """Añade un valor y descarta el más antiguo si la ventana está llena"""
+        if self.count == self.size:
+            old = self.buffer[self.position]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.buffer[self.position] = value
+        self.total += value
+        self.total_sq += value * value
+        self.position = (self.position + 1) % self.size
+
+    def update_many(self, values):
+        """Añade un bloque de valores (solo los últimos 'size' afectan a la ventana)"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) >= self.size:
+            # La ventana queda formada solo por el bloque: se recalculan las sumas
+            self.buffer[:] = values[-self.size:]
+            self.position = 0
+            self.count = self.size
+            self.total = self.buffer.sum()
+            self.total_sq = (self.buffer ** 2).sum()
+            return
+        for value in values.tolist():
+            self.update(value)
+
+    def values(self):
+        """Valores de la ventana del más antiguo al más reciente"""
+        if self.count < self.size:
+            return self.buffer[:self.count].copy()
+        return np.roll(self.buffer, -self.position)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        if not self.count:
+            return 0.0
+        return math.sqrt(max(self.total_sq / self.count - self.mean ** 2, 0.0))
+
+class PerformanceTracker:
+    """
+    Métricas en curso de una sesión: capital, drawdown, Sharpe/Sortino y estadísticas de operaciones
+
+    Las definiciones coinciden con calculate_equity_metrics (retornos por vela,
+    desviación poblacional y anualización con periods_per_year).
+    """
+
+    def __init__(self, initial_capital, periods_per_year=365, risk_free_rate=0.02, window=None):
+        """
+        Args:
+            initial_capital: Capital inicial
+            periods_per_year: Actualizaciones de capital por año (para anualizar)
+            risk_free_rate: Tasa libre de riesgo anual (por defecto 2%)
+            window: Número de velas del Sharpe móvil (por defecto None, sin ventana)
+        """
+        self.initial_capital = initial_capital
+        self.periods_per_year = periods_per_year
+        self.period_risk_free = (1 + risk_free_rate) ** (1 / periods_per_year) - 1
+        self.equity = initial_capital
+        self.returns = RunningStats()
+        self.downside_sq = 0.0  # Suma de los excesos negativos al cuadrado
+        self.drawdown = DrawdownTracker()
+        self.drawdown.update(initial_capital)
+        self.rolling = RollingWindow(window) if window else None
+
+        self.total_trades = 0
+        self.winning_trades = 0
+        self.losing_trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+
+    def update_equity(self, equity):
+        """Registra el capital de una nueva vela"""
+        period_return = equity / self.equity - 1
+        self.returns.update(period_return)
+        excess = period_return - self.period_risk_free
+        if excess < 0:
+            self.downside_sq += excess * excess
+        if self.rolling is not None:
+            self.rolling.update(period_return)
+        self.drawdown.update(equity)
+        self.equity = equity
+
+    def update_equity_many(self, values):
+        """Registra el capital de un bloque de velas"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        period_returns = values / np.concatenate([[self.equity], values[:-1]]) - 1
+        self.returns.update_many(period_returns)
+        self.downside_sq += (np.minimum(period_returns - self.period_risk_free, 0) ** 2).sum()
+        if self.rolling is not None:
+            self.rolling.update_many(period_returns)
+        self.drawdown.update_many(values)
+        self.equity = values[-1]
+
+    def record_trade(self, pnl):
+        """Registra el P&L de una operación cerrada"""
+        self.total_trades += 1
+        if pnl > 0:
+            self.winning_trades += 1
+            self.gross_profit += pnl
+        elif pnl < 0:
+            self.losing_trades += 1
+            self.gross_loss -= pnl
+
+    def _ratio(self, excess_mean, deviation):
+        """Ratio anualizado con la misma convención que calculate_equity_metrics"""
+        if deviation > 0:
+            return excess_mean / deviation * math.sqrt(self.periods_per_year)
+        return math.inf if excess_mean > 0 else 0.0
+
+    @property
+    def sharpe_ratio(self):
+        if self.returns.std == 0:
+            return 0.0
+        return self._ratio(self.returns.mean - self.period_risk_free, self.returns.std)
+
+    @property
+    def sortino_ratio(self):
+        if not self.returns.count:
+            return 0.0
+        return self._ratio(self.returns.mean - self.period_risk_free, math.sqrt(self.downside_sq / self.returns.count))
+
+    @property
+    def rolling_sharpe_ratio(self):
+        if self.rolling is None or self.rolling.std == 0:
+            return 0.0
+        return self._ratio(self.rolling.mean - self.period_risk_free, self.rolling.std)
+
+    def to_dict(self):
+        """Estado serializable en JSON (para retomar la sesión)"""
+        state = {
+            key: value for key, value in vars(self).items()
+            if key not in ('returns', 'drawdown', 'rolling')
+        }
+        state['returns'] = dict(vars(self.returns))
+        state['drawdown'] = dict(vars(self.drawdown))
+        state['rolling'] = None
+        if self.rolling is not None:
+            state['rolling'] = dict(vars(self.rolling), buffer=self.rolling.buffer.tolist())
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        """Reconstruye un tracker a partir de to_dict()"""
+        tracker = cls(state['initial_capital'], state['periods_per_year'])
+        vars(tracker).update({
+            key: value for key, value in state.items()
+            if key not in ('returns', 'drawdown', 'rolling')
+        })
+        vars(tracker.returns).update(state['returns'])
+        vars(tracker.drawdown).update(state['drawdown'])
+        if state['rolling'] is not None:
+            tracker.rolling = RollingWindow(state['rolling']['size'])
+            vars(tracker.rolling).update(state['rolling'])
+            tracker.rolling.buffer = np.array(state['rolling']['buffer'], dtype=np.float64)
+        return tracker
+
+    def snapshot(self):
+        """
+        Métricas actuales
+
+        Returns:
+            dict: Capital, P&L, retorno (%), drawdowns (%), ratios y estadísticas de operaciones
+        """
+        if self.gross_loss > 0:
+            profit_factor = self.gross_profit / self.gross_loss
+        else:
+            profit_factor = math.inf if self.gross_profit > 0 else 0.0
+        return {
+            'equity': self.equity,
+            'pnl': self.equity - self.initial_capital,
+            'total_return': (self.equity / self.initial_capital - 1) * 100,
+            'current_drawdown': self.drawdown.current * 100,
+            'max_drawdown': self.drawdown.max_drawdown * 100,
+            'sharpe_ratio': self.sharpe_ratio,
+            'sortino_ratio': self.sortino_ratio,
+            'rolling_sharpe_ratio': self.rolling_sharpe_ratio,
+            'total_trades': self.total_trades,
+            'winning_trades': self.winning_trades,
+            'losing_trades': self.losing_trades,
+            'win_rate': self.winning_trades / self.total_trades * 100 if self.total_trades else 0.0,
+            'profit_factor': profit_factor
+        }
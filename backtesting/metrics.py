@@ -1,23 +1,118 @@
 # -*- coding: utf-8 -*-
 """
 Funciones para calcular métricas de rendimiento en backtesting
+
+Las métricas de capital trabajan sobre curvas de capital por vela y aceptan
+tanto un array 1-D (una ejecución) como una matriz 2-D (ejecuciones x velas),
+de modo que barridos de parámetros o trayectorias Monte Carlo se evalúan juntos
+con operaciones de numpy.
 """
 
 import numpy as np
+from config import TIMEFRAME_MINUTES
+
+def periods_per_year(timeframe):
+    """
+    Número de velas de una temporalidad en un año (para anualizar)
+    """
+    return 365 * 24 * 60 / TIMEFRAME_MINUTES[timeframe]
+
+def _extract_pnl(trades):
+    """P&L de las operaciones como array (lista de dicts, TradeLog o array)"""
+    if hasattr(trades, 'pnl'):
+        return np.asarray(trades.pnl, dtype=np.float64)
+    if isinstance(trades, np.ndarray):
+        return trades.astype(np.float64, copy=False)
+    return np.fromiter((t.get('pnl', 0) for t in trades), dtype=np.float64, count=len(trades))
+
+def _squeeze(values, one_dimensional):
+    """Devuelve un escalar si la entrada era 1-D"""
+    return values[0].item() if one_dimensional else values
+
+def drawdown_series(equity):
+    """
+    Drawdown de cada vela respecto al máximo acumulado
+
+    Args:
+        equity: Curva de capital (1-D) o matriz de curvas (ejecuciones x velas)
+
+    Returns:
+        np.ndarray: Drawdown como fracción (0-1), con la misma forma que equity
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    peaks = np.maximum.accumulate(equity, axis=-1)
+    return (peaks - equity) / peaks
+
+def calculate_equity_metrics(equity, periods_per_year=365, risk_free_rate=0.02):
+    """
+    Calcula todas las métricas de capital de una o varias curvas en una pasada
+
+    Args:
+        equity: Curva de capital por vela (1-D) o matriz (ejecuciones x velas)
+        periods_per_year: Velas por año para anualizar (ver periods_per_year(timeframe))
+        risk_free_rate: Tasa libre de riesgo anual (por defecto 2%)
+
+    Returns:
+        dict: total_return (%), cagr (%), max_drawdown (%), volatility (% anualizada),
+            sharpe_ratio, sortino_ratio y calmar_ratio; escalares para una curva o
+            arrays con un valor por ejecución para una matriz
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    one_dimensional = equity.ndim == 1
+    equity = np.atleast_2d(equity)
+    n_periods = equity.shape[1] - 1
+
+    total_return = equity[:, -1] / equity[:, 0] - 1
+    max_drawdown = drawdown_series(equity).max(axis=1)
+
+    if n_periods > 0:
+        returns = equity[:, 1:] / equity[:, :-1] - 1
+        excess = returns - ((1 + risk_free_rate) ** (1 / periods_per_year) - 1)
+        mean_excess = excess.mean(axis=1)
+        std = returns.std(axis=1)
+        downside = np.sqrt((np.minimum(excess, 0) ** 2).mean(axis=1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cagr = np.where(
+                equity[:, -1] > 0,
+                (equity[:, -1] / equity[:, 0]) ** (periods_per_year / n_periods) - 1,
+                -1.0
+            )
+            sharpe = np.where(std > 0, mean_excess / std * np.sqrt(periods_per_year), 0.0)
+            sortino = np.where(
+                downside > 0,
+                mean_excess / downside * np.sqrt(periods_per_year),
+                np.where(mean_excess > 0, np.inf, 0.0)
+            )
+            calmar = np.where(max_drawdown > 0, cagr / max_drawdown, np.where(cagr > 0, np.inf, 0.0))
+        volatility = std * np.sqrt(periods_per_year)
+    else:
+        cagr = volatility = sharpe = sortino = calmar = np.zeros(len(equity))
+
+    metrics = {
+        'total_return': total_return * 100,
+        'cagr': cagr * 100,
+        'max_drawdown': max_drawdown * 100,
+        'volatility': volatility * 100,
+        'sharpe_ratio': sharpe,
+        'sortino_ratio': sortino,
+        'calmar_ratio': calmar
+    }
+    return {name: _squeeze(values, one_dimensional) for name, values in metrics.items()}
 
 def calculate_statistics(trades, initial_capital, final_capital):
     """
     Calcula estadísticas de rendimiento para los resultados del backtesting
-    
+
     Args:
-        trades: Lista de operaciones realizadas
+        trades: Operaciones realizadas (lista de dicts, TradeLog o array de P&L)
         initial_capital: Capital inicial
         final_capital: Capital final
-        
+
     Returns:
         dict: Diccionario con estadísticas de rendimiento
     """
-    if not trades:
+    pnl = _extract_pnl(trades)
+    if len(pnl) == 0:
         return {
             'initial_capital': initial_capital,
             'final_capital': final_capital,
@@ -29,25 +124,15 @@ def calculate_statistics(trades, initial_capital, final_capital):
             'max_drawdown': 0.0,
             'profit_factor': 0.0
         }
-    
+
     # Calcular métricas básicas
-    total_trades = len(trades)
-    winning_trades = len([t for t in trades if t.get('pnl', 0) > 0])
-    losing_trades = len([t for t in trades if t.get('pnl', 0) < 0])
-    
-    total_pnl = sum(t.get('pnl', 0) for t in trades)
-    win_rate = winning_trades / total_trades if total_trades > 0 else 0
-    
-    # Calcular drawdown
-    capital_history = [initial_capital]
-    for trade in trades:
-        capital_history.append(capital_history[-1] + trade.get('pnl', 0))
-    
-    max_drawdown = calculate_max_drawdown(capital_history)
-    
-    # Calcular factor de beneficio
-    profit_factor = calculate_profit_factor(trades)
-    
+    total_trades = len(pnl)
+    winning_trades = int((pnl > 0).sum())
+    losing_trades = int((pnl < 0).sum())
+
+    # Calcular drawdown sobre el capital tras cada operación
+    capital_history = initial_capital + np.concatenate([[0.0], np.cumsum(pnl)])
+
     return {
         'initial_capital': initial_capital,
         'final_capital': final_capital,
@@ -55,118 +140,117 @@ def calculate_statistics(trades, initial_capital, final_capital):
         'total_trades': total_trades,
         'winning_trades': winning_trades,
         'losing_trades': losing_trades,
-        'win_rate': win_rate * 100,
-        'max_drawdown': max_drawdown * 100,
-        'profit_factor': profit_factor
+        'win_rate': winning_trades / total_trades * 100,
+        'max_drawdown': calculate_max_drawdown(capital_history) * 100,
+        'profit_factor': calculate_profit_factor(pnl)
     }
 
 def calculate_max_drawdown(capital_history):
     """
     Calcula el máximo drawdown de una serie de capital
-    
+
     Args:
-        capital_history: Lista de valores de capital a lo largo del tiempo
-        
+        capital_history: Valores de capital a lo largo del tiempo (1-D) o matriz (ejecuciones x velas)
+
     Returns:
-        float: Máximo drawdown como porcentaje (0-1)
+        float: Máximo drawdown como porcentaje (0-1); un array por ejecución si la entrada es 2-D
     """
-    max_drawdown = 0
-    peak = capital_history[0]
-    
-    for value in capital_history:
-        if value > peak:
-            peak = value
-        drawdown = (peak - value) / peak
-        max_drawdown = max(max_drawdown, drawdown)
-    
-    return max_drawdown
+    return drawdown_series(capital_history).max(axis=-1)
 
 def calculate_profit_factor(trades):
     """
     Calcula el factor de beneficio (ratio entre ganancias y pérdidas)
-    
+
     Args:
-        trades: Lista de operaciones realizadas
-        
+        trades: Operaciones realizadas (lista de dicts, TradeLog, array de P&L o matriz ejecuciones x operaciones)
+
     Returns:
-        float: Factor de beneficio
+        float: Factor de beneficio (un array por ejecución si la entrada es 2-D)
     """
-    total_profit = sum(t.get('pnl', 0) for t in trades if t.get('pnl', 0) > 0)
-    total_loss = abs(sum(t.get('pnl', 0) for t in trades if t.get('pnl', 0) < 0))
-    
-    if total_loss == 0:
-        return float('inf') if total_profit > 0 else 0.0
-    
-    return total_profit / total_loss
+    pnl = _extract_pnl(trades)
+    total_profit = np.where(pnl > 0, pnl, 0.0).sum(axis=-1)
+    total_loss = -np.where(pnl < 0, pnl, 0.0).sum(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit_factor = np.where(
+            total_loss > 0, total_profit / total_loss, np.where(total_profit > 0, np.inf, 0.0)
+        )
+    return profit_factor.item() if profit_factor.ndim == 0 else profit_factor
 
 def calculate_sharpe_ratio(trades, risk_free_rate=0.02):
     """
     Calcula el ratio de Sharpe para las operaciones
     
     Args:
-        trades: Lista de operaciones realizadas
+        trades: Operaciones realizadas (lista de dicts, TradeLog o array de P&L)
         risk_free_rate: Tasa libre de riesgo anual (por defecto 2%)
         
     Returns:
-        float: Ratio de Sharpe
+        float: Ratio de Sharpe (para el de la curva de capital ver calculate_equity_sharpe_ratio)
     """
-    if not trades:
+    returns = _extract_pnl(trades)
+    if returns.size == 0:
         return 0.0
     
-    # Extraer retornos diarios
-    returns = [t.get('pnl', 0) for t in trades]
-    
-    # Calcular retorno medio y desviación estándar
-    mean_return = np.mean(returns)
-    std_return = np.std(returns)
-    
+    std_return = returns.std()
     if std_return == 0:
         return 0.0
     
-    # Convertir tasa libre de riesgo a diaria
+    # Tasa libre de riesgo diaria y anualización
     daily_rf = (1 + risk_free_rate) ** (1/365) - 1
-    
-    # Calcular ratio de Sharpe
-    sharpe = (mean_return - daily_rf) / std_return
-    
-    # Anualizar
-    return sharpe * np.sqrt(365)
+    return float((returns.mean() - daily_rf) / std_return * np.sqrt(365))
 
 def calculate_sortino_ratio(trades, risk_free_rate=0.02):
     """
     Calcula el ratio de Sortino para las operaciones
     
     Args:
-        trades: Lista de operaciones realizadas
+        trades: Operaciones realizadas (lista de dicts, TradeLog o array de P&L)
         risk_free_rate: Tasa libre de riesgo anual (por defecto 2%)
         
     Returns:
-        float: Ratio de Sortino
+        float: Ratio de Sortino (para el de la curva de capital ver calculate_equity_sortino_ratio)
     """
-    if not trades:
+    returns = _extract_pnl(trades)
+    if returns.size == 0:
         return 0.0
     
-    # Extraer retornos diarios
-    returns = [t.get('pnl', 0) for t in trades]
-    
-    # Calcular retorno medio
-    mean_return = np.mean(returns)
-    
-    # Calcular desviación estándar de retornos negativos
-    negative_returns = [r for r in returns if r < 0]
-    if not negative_returns:
+    negative_returns = returns[returns < 0]
+    if negative_returns.size == 0:
         return float('inf')
     
-    downside_std = np.std(negative_returns)
-    
+    downside_std = negative_returns.std()
     if downside_std == 0:
         return 0.0
     
-    # Convertir tasa libre de riesgo a diaria
+    # Tasa libre de riesgo diaria y anualización
     daily_rf = (1 + risk_free_rate) ** (1/365) - 1
-    
-    # Calcular ratio de Sortino
-    sortino = (mean_return - daily_rf) / downside_std
-    
-    # Anualizar
-    return sortino * np.sqrt(365) 
\ No newline at end of file
+    return float((returns.mean() - daily_rf) / downside_std * np.sqrt(365))
+
+def calculate_equity_sharpe_ratio(equity, risk_free_rate=0.02, periods_per_year=365):
+    """
+    Calcula el ratio de Sharpe anualizado de una curva de capital por vela
+
+    Args:
+        equity: Curva de capital (1-D) o matriz (ejecuciones x velas)
+        risk_free_rate: Tasa libre de riesgo anual (por defecto 2%)
+        periods_per_year: Velas por año de la curva (por defecto 365, velas diarias)
+
+    Returns:
+        float: Ratio de Sharpe (un array por ejecución si la entrada es 2-D)
+    """
+    return calculate_equity_metrics(equity, periods_per_year, risk_free_rate)['sharpe_ratio']
+
+def calculate_equity_sortino_ratio(equity, risk_free_rate=0.02, periods_per_year=365):
+    """
+    Calcula el ratio de Sortino anualizado de una curva de capital por vela
+
+    Args:
+        equity: Curva de capital (1-D) o matriz (ejecuciones x velas)
+        risk_free_rate: Tasa libre de riesgo anual (por defecto 2%)
+        periods_per_year: Velas por año de la curva (por defecto 365, velas diarias)
+
+    Returns:
+        float: Ratio de Sortino (un array por ejecución si la entrada es 2-D)
+    """
+    return calculate_equity_metrics(equity, periods_per_year, risk_free_rate)['sortino_ratio']
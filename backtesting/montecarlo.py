@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Análisis de robustez Monte Carlo sobre secuencias de operaciones
+"""
+
+import numpy as np
+from .trade_log import TradeLog
+from .metrics import calculate_max_drawdown
+
+def _extract_pnl(trades):
+    """
+    Obtiene el array de P&L a partir de una lista de operaciones, un TradeLog o un array
+    """
+    if isinstance(trades, np.ndarray):
+        return trades.astype(np.float64, copy=False).ravel()
+    if isinstance(trades, TradeLog):
+        return trades.pnl.copy()
+    if trades and isinstance(trades[0], dict):
+        return np.fromiter((t.get('pnl', 0) for t in trades), dtype=np.float64, count=len(trades))
+    return np.asarray(trades, dtype=np.float64).ravel()
+
+def simulate_trade_sequences(pnl, n_simulations=10000, method='bootstrap', seed=None):
+    """
+    Genera secuencias alternativas de operaciones como una matriz (simulaciones x operaciones)
+
+    Args:
+        pnl: Array con el P&L de cada operación
+        n_simulations: Número de secuencias a generar
+        method: 'bootstrap' (muestreo con reemplazo) o 'shuffle' (permutación)
+        seed: Semilla para reproducibilidad (por defecto None)
+
+    Returns:
+        np.ndarray: Matriz de P&L con forma (n_simulations, len(pnl))
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+
+    if method == 'bootstrap':
+        indices = rng.integers(0, len(pnl), size=(n_simulations, len(pnl)))
+        return pnl[indices]
+    if method == 'shuffle':
+        return rng.permuted(np.broadcast_to(pnl, (n_simulations, len(pnl))), axis=1)
+
+    raise ValueError(f"Método de simulación no soportado: {method}")
+
+def run_monte_carlo(trades, initial_capital, n_simulations=10000, method='bootstrap',
+                    ruin_threshold=0.5, seed=None, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Ejecuta un análisis Monte Carlo sobre el orden de las operaciones
+
+    Todas las trayectorias se calculan a la vez con operaciones acumuladas de numpy,
+    sin bucles de Python por simulación. Con 'shuffle' el capital final es idéntico
+    en todas las trayectorias; solo cambian el drawdown y el riesgo de ruina.
+
+    Args:
+        trades: Lista de operaciones (dicts con 'pnl'), TradeLog o array de P&L
+        initial_capital: Capital inicial
+        n_simulations: Número de trayectorias a simular (por defecto 10000)
+        method: 'bootstrap' o 'shuffle' (por defecto 'bootstrap')
+        ruin_threshold: Pérdida máxima tolerada sobre el capital inicial (0-1) antes de
+            considerar la trayectoria arruinada (por defecto 0.5)
+        seed: Semilla para reproducibilidad (por defecto None)
+        percentiles: Percentiles a reportar para cada distribución
+
+    Returns:
+        dict: Distribuciones y resumen de capital final, máximo drawdown y riesgo de ruina
+    """
+    pnl = _extract_pnl(trades)
+
+    if len(pnl) == 0:
+        return {
+            'method': method,
+            'n_simulations': 0,
+            'n_trades': 0,
+            'final_equity': np.array([]),
+            'max_drawdown': np.array([]),
+            'risk_of_ruin': 0.0,
+            'final_equity_percentiles': {},
+            'max_drawdown_percentiles': {}
+        }
+
+    sequences = simulate_trade_sequences(pnl, n_simulations, method, seed)
+
+    # Curvas de capital: columna inicial + P&L acumulado de cada trayectoria
+    equity = np.empty((n_simulations, len(pnl) + 1), dtype=np.float64)
+    equity[:, 0] = initial_capital
+    np.cumsum(sequences, axis=1, out=equity[:, 1:])
+    equity[:, 1:] += initial_capital
+
+    # Drawdown respecto al máximo acumulado de cada trayectoria
+    max_drawdown = calculate_max_drawdown(equity) * 100
+
+    final_equity = equity[:, -1]
+    ruin_level = initial_capital * (1 - ruin_threshold)
+    ruined = equity.min(axis=1) <= ruin_level
+
+    return {
+        'method': method,
+        'n_simulations': n_simulations,
+        'n_trades': len(pnl),
+        'final_equity': final_equity,
+        'max_drawdown': max_drawdown,
+        'risk_of_ruin': ruined.mean() * 100,
+        'final_equity_percentiles': dict(zip(percentiles, np.percentile(final_equity, percentiles))),
+        'max_drawdown_percentiles': dict(zip(percentiles, np.percentile(max_drawdown, percentiles)))
+    }
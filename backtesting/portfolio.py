@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Backtesting de cartera: varios pares compartiendo un mismo capital
+"""
+
+import pandas as pd
+import numpy as np
+from strategy.macd_strategy import calculate_signal_series, SIGNAL_LOOKBACK
+from utils.candle_store import get_cached_price_data
+from utils.api_data import warmup_start
+from risk_management.position_book import PositionBook
+from .metrics import calculate_profit_factor
+
+class PortfolioBacktestEngine:
+    """
+    Simula la estrategia sobre varios símbolos a la vez con un único capital.
+
+    Todos los símbolos avanzan sobre un índice temporal común en un solo bucle;
+    precios y señales se guardan como matrices alineadas (barras x símbolos).
+    """
+
+    def __init__(self, symbols, start_date, end_date, initial_capital=1000.0, timeframes=None,
+                 risk_config=None, max_positions=None, max_positions_per_symbol=1):
+        """
+        Inicializa el motor de backtesting de cartera
+
+        Args:
+            symbols: Lista de pares de trading (ej. ['BTC/USDT', 'ETH/USDT'])
+            start_date: Fecha de inicio (datetime); las velas previas de calentamiento
+                (SIGNAL_LOOKBACK por temporalidad) solo se usan para las señales
+            end_date: Fecha de fin (datetime)
+            initial_capital: Capital inicial compartido (por defecto 1000.0)
+            timeframes: Lista de temporalidades; la primera marca el ritmo (por defecto ['4h'])
+            risk_config: Configuración de gestión de riesgo, común a todos los símbolos
+            max_positions: Máximo de posiciones abiertas a la vez (por defecto
+                max_positions_per_symbol por símbolo)
+            max_positions_per_symbol: Posiciones simultáneas por símbolo; más de una
+                permite piramidar con nuevas señales de entrada (por defecto 1)
+        """
+        self.symbols = list(symbols)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.initial_capital = initial_capital
+        self.timeframes = timeframes or ['4h']
+        self.risk_config = risk_config
+        self.max_positions_per_symbol = max_positions_per_symbol
+        self.max_positions = max_positions or len(self.symbols) * max_positions_per_symbol
+
+        self.data = self._load_historical_data()
+        if not self.data:
+            raise ValueError(f"No se pudieron obtener datos históricos para {', '.join(self.symbols)}")
+
+        self._build_arrays()
+
+    def _load_historical_data(self):
+        """
+        Descarga los datos de cada símbolo y temporalidad
+        """
+        data = {}
+        print("\n🔄 Descargando datos históricos de la cartera...")
+
+        for symbol in self.symbols:
+            for tf in self.timeframes:
+                df = get_cached_price_data(
+                    symbol=symbol,
+                    start_date=warmup_start(self.start_date, tf, SIGNAL_LOOKBACK),
+                    end_date=self.end_date,
+                    timeframe=tf
+                )
+                if df is not None and len(df) >= 35:
+                    data.setdefault(symbol, {})[tf] = df
+                    print(f"✅ {len(df)} períodos cargados para {symbol} {tf}")
+                else:
+                    print(f"⚠️ Insuficientes datos para {symbol} {tf}")
+
+        # Solo participan los símbolos con datos en la temporalidad principal
+        main_tf = self.timeframes[0]
+        return {symbol: frames for symbol, frames in data.items() if main_tf in frames}
+
+    def _build_arrays(self):
+        """
+        Alinea precios y señales de todos los símbolos sobre el índice temporal común
+        """
+        main_tf = self.timeframes[0]
+        self.symbols = [symbol for symbol in self.symbols if symbol in self.data]
+
+        index = self.data[self.symbols[0]][main_tf].index
+        for symbol in self.symbols[1:]:
+            index = index.union(self.data[symbol][main_tf].index)
+        # Las barras de calentamiento no se simulan
+        self.index = index = index[index >= pd.Timestamp(self.start_date)]
+
+        n_bars, n_symbols = len(index), len(self.symbols)
+        self.close = np.full((n_bars, n_symbols), np.nan)
+        self.entry_signal = np.zeros((n_bars, n_symbols), dtype=np.int8)
+
+        for j, symbol in enumerate(self.symbols):
+            frames = self.data[symbol]
+            self.close[:, j] = frames[main_tf]['close'].reindex(index).to_numpy(dtype=np.float64)
+
+            # Señal de entrada: la primera señal no neutra siguiendo el orden de temporalidades
+            for tf in self.timeframes:
+                if tf not in frames:
+                    continue
+                codes = calculate_signal_series(frames[tf], tf)['signal']
+                if tf == main_tf:
+                    codes = codes.reindex(index)
+                else:
+                    codes = codes.reindex(index, method='ffill')
+                codes = codes.fillna(0).to_numpy(dtype=np.int8)
+                pending = self.entry_signal[:, j] == 0
+                self.entry_signal[pending, j] = codes[pending]
+
+        # Las barras sin vela propia no operan
+        self.has_bar = ~np.isnan(self.close)
+        self.entry_signal[~self.has_bar] = 0
+
+    def run(self):
+        """
+        Ejecuta el backtesting de cartera y retorna los resultados
+        """
+        print("\n🔄 Ejecutando backtesting de cartera...")
+
+        n_bars, n_symbols = self.close.shape
+        mark_price = pd.DataFrame(self.close).ffill().to_numpy()
+
+        # Todas las posiciones abiertas en un libro columnar (misma configuración de riesgo)
+        book = PositionBook(self.symbols, self.risk_config)
+
+        equity = np.empty(n_bars)
+        symbol_pnl = np.zeros((n_bars, n_symbols))
+        realized = np.zeros(n_symbols)
+
+        trades = []
+        current_capital = self.initial_capital
+
+        for i in range(n_bars):
+            timestamp = self.index[i]
+            prices = self.close[i]
+
+            # Salidas: una evaluación vectorizada de todas las posiciones abiertas
+            exited = np.zeros(n_symbols, dtype=bool)
+            slots, reasons = book.check_exits(prices)
+            if len(slots):
+                for trade, slot in zip(book.close(slots, prices[book.symbol[slots]], timestamp, reasons), slots):
+                    j = book.symbol[slot]
+                    trades.append(trade)
+                    current_capital += trade['pnl']
+                    realized[j] += trade['pnl']
+                    exited[j] = True
+
+            # Entradas: el capital libre se reparte entre las nuevas posiciones
+            # (un símbolo que acaba de cerrar no reabre en la misma barra)
+            open_count = book.count_by_symbol()
+            candidates = np.flatnonzero(
+                (open_count < self.max_positions_per_symbol) & ~exited & (self.entry_signal[i] != 0)
+            )
+            for j in candidates:
+                if open_count.sum() >= self.max_positions:
+                    break
+
+                available = current_capital - book.committed_capital()
+                allocation = min(current_capital * book.max_position_size, available)
+                if allocation <= 0:
+                    break
+
+                position_type = 'long' if self.entry_signal[i, j] > 0 else 'short'
+                book.open(j, position_type, prices[j], timestamp, size=allocation / prices[j])
+                open_count[j] += 1
+
+            # Capital a mercado: realizado + P&L latente de todas las posiciones
+            unrealized = book.unrealized_by_symbol(mark_price[i])
+            equity[i] = current_capital + unrealized.sum()
+            symbol_pnl[i] = realized + unrealized
+
+        peaks = np.maximum.accumulate(np.concatenate(([self.initial_capital], equity)))[1:]
+        drawdown = (peaks - equity) / peaks * 100
+
+        winning_trades = len([t for t in trades if t['pnl'] > 0])
+        losing_trades = len([t for t in trades if t['pnl'] < 0])
+        total_trades = len(trades)
+        final_capital = equity[-1] if n_bars else self.initial_capital
+
+        return {
+            'symbols': self.symbols,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'timeframes': self.timeframes,
+            'initial_capital': self.initial_capital,
+            'final_capital': final_capital,
+            'total_return': ((final_capital - self.initial_capital) / self.initial_capital) * 100,
+            'total_trades': total_trades,
+            'winning_trades': winning_trades,
+            'losing_trades': losing_trades,
+            'win_rate': (winning_trades / total_trades * 100) if total_trades > 0 else 0,
+            'max_drawdown': drawdown.max() if n_bars else 0,
+            'profit_factor': calculate_profit_factor(trades),
+            'trades': trades,
+            'equity': pd.DataFrame({'equity': equity, 'drawdown': drawdown}, index=self.index),
+            'symbol_pnl': pd.DataFrame(symbol_pnl, index=self.index, columns=self.symbols),
+            'per_symbol': self._symbol_breakdown(trades, symbol_pnl)
+        }
+
+    def _symbol_breakdown(self, trades, symbol_pnl):
+        """
+        Resume las operaciones y el P&L de cada símbolo
+        """
+        breakdown = {}
+        for j, symbol in enumerate(self.symbols):
+            symbol_trades = [t for t in trades if t['symbol'] == symbol]
+            wins = len([t for t in symbol_trades if t['pnl'] > 0])
+            breakdown[symbol] = {
+                'total_trades': len(symbol_trades),
+                'winning_trades': wins,
+                'win_rate': (wins / len(symbol_trades) * 100) if symbol_trades else 0,
+                'realized_pnl': sum(t['pnl'] for t in symbol_trades),
+                'final_pnl': symbol_pnl[-1, j] if len(symbol_pnl) else 0.0,
+                'profit_factor': calculate_profit_factor(symbol_trades)
+            }
+        return breakdown
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Formato columnar para guardar y cargar resultados de backtesting
+
+Cada resultado se guarda en dos archivos con el mismo nombre base:
+- <nombre>.json: manifiesto pequeño con parámetros y métricas escalares
+- <nombre>.npz: columnas numpy de capital, drawdown, precio/MACD y operaciones
+"""
+
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+from .trade_log import TradeLog
+
+FORMAT_VERSION = 1
+
+# Tablas guardadas en el .npz (cada columna se guarda como '<tabla>__<columna>')
+TABLES = ('equity', 'price_data', 'trades')
+
+# Columnas de precio y MACD de los bloques del modo streaming
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'MACD_12_26_9', 'MACDs_12_26_9', 'MACDh_12_26_9')
+
+# Columnas de operaciones que contienen fechas
+TRADE_TIME_COLUMNS = ('entry_time', 'exit_time')
+
+def _signals_to_text(signals):
+    """Resume una lista de señales como texto compacto ('4h:buy(0.53), ...')"""
+    if not isinstance(signals, (list, tuple)):
+        return '' if signals is None or (isinstance(signals, float) and np.isnan(signals)) else str(signals)
+    return ', '.join(f"{s.get('timeframe', '')}:{s.get('signal', '')}({s.get('strength', 0):.2f})" for s in signals)
+
+def _to_scalar(value):
+    """Convierte escalares numpy/pandas a tipos nativos serializables"""
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _to_scalar(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_scalar(v) for v in value]
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def with_initial_balance(equity, start_date, initial_capital):
+    """
+    Añade el balance inicial en start_date a una tabla de capital y drawdown
+
+    Si la primera vela coincide con start_date prevalece la vela.
+    """
+    initial = pd.DataFrame(
+        {'balance': [float(initial_capital)], 'drawdown': [0.0]},
+        index=pd.DatetimeIndex([pd.Timestamp(start_date)])
+    )
+    equity = pd.concat([initial, equity])
+    equity = equity[~equity.index.duplicated(keep='last')]
+    equity.index.name = 'timestamp'
+    return equity
+
+def _equity_frame(results):
+    """Tabla de capital y drawdown (vacía si no se registró)"""
+    equity = results.get('equity')
+    if isinstance(equity, pd.DataFrame):
+        return equity
+    return pd.DataFrame(
+        {'balance': np.empty(0), 'drawdown': np.empty(0)},
+        index=pd.DatetimeIndex([], name='timestamp')
+    )
+
+def _price_frame(results):
+    """Tabla de precio y MACD (vacía si no se registró)"""
+    price_data = results.get('price_data')
+    if isinstance(price_data, pd.DataFrame):
+        return price_data
+    return pd.DataFrame(index=pd.DatetimeIndex([], name='timestamp'))
+
+def _trades_frame(results):
+    """Construye la tabla de operaciones (una fila por operación)"""
+    trades = results.get('trades')
+    if isinstance(trades, pd.DataFrame):
+        return trades
+    if isinstance(trades, TradeLog):
+        return trades.to_frame()
+    if not trades:
+        return pd.DataFrame()
+
+    frame = pd.DataFrame(trades)
+    for column in ('entry_signals', 'exit_signals'):
+        if column in frame:
+            frame[column] = frame[column].map(_signals_to_text)
+    for column in TRADE_TIME_COLUMNS:
+        if column in frame:
+            frame[column] = pd.to_datetime(frame[column])
+    return frame
+
+def results_to_frames(results):
+    """
+    Convierte los resultados del motor a su forma columnar
+
+    Args:
+        results: Diccionario devuelto por BacktestEngine.run (las tablas que no se registraron quedan vacías)
+
+    Returns:
+        dict: Métricas escalares más las tablas 'equity', 'price_data' y 'trades' como DataFrames
+    """
+    frames = {key: value for key, value in results.items() if key not in TABLES}
+    frames['equity'] = _equity_frame(results)
+    frames['price_data'] = _price_frame(results)
+    frames['trades'] = _trades_frame(results)
+    return frames
+
+def _column_to_array(series):
+    """Convierte una columna a un array numpy sin objetos Python (sin pickle)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy(dtype='datetime64[ns]').view(np.int64), 'datetime'
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(), 'numeric'
+    return series.fillna('').astype(str).to_numpy(dtype=str), 'text'
+
+def save_results(results, base_path):
+    """
+    Guarda los resultados en formato columnar (manifiesto JSON + columnas .npz)
+
+    Args:
+        results: Resultados del motor o ya convertidos con results_to_frames
+        base_path: Ruta sin extensión de los archivos a escribir
+
+    Returns:
+        str: Ruta del manifiesto JSON
+    """
+    frames = results_to_frames(results)
+
+    arrays = {}
+    schema = {}
+    for table in TABLES:
+        frame = frames[table]
+        schema[table] = {'index': isinstance(frame.index, pd.DatetimeIndex), 'columns': {}}
+        if schema[table]['index']:
+            arrays[f"{table}__index"] = frame.index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        for column in frame.columns:
+            array, kind = _column_to_array(frame[column])
+            arrays[f"{table}__{column}"] = array
+            schema[table]['columns'][column] = kind
+
+    # Escritura atómica como en save_engine_state: el manifiesto se escribe el
+    # último, así que un manifiesto visible siempre tiene sus columnas completas
+    data_path = f"{base_path}.npz"
+    tmp_data_path = f"{base_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_data_path, **arrays)
+    os.replace(tmp_data_path, data_path)
+
+    manifest = {key: _to_scalar(value) for key, value in frames.items() if key not in TABLES}
+    manifest['format_version'] = FORMAT_VERSION
+    manifest['schema'] = schema
+
+    manifest_path = f"{base_path}.json"
+    tmp_manifest_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_manifest_path, manifest_path)
+
+    return manifest_path
+
+def load_results(manifest_path):
+    """
+    Carga unos resultados guardados con save_results
+
+    Args:
+        manifest_path: Ruta del manifiesto JSON
+
+    Returns:
+        dict: Métricas escalares más las tablas 'equity', 'price_data' y 'trades' como DataFrames
+    """
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    data_path = f"{manifest_path[:-len('.json')]}.npz"
+    results = {key: value for key, value in manifest.items() if key != 'schema'}
+    for key in ('start_date', 'end_date'):
+        if key in results:
+            results[key] = pd.Timestamp(results[key])
+
+    with np.load(data_path, allow_pickle=False) as data:
+        for table, table_schema in manifest['schema'].items():
+            columns = {}
+            for column, kind in table_schema['columns'].items():
+                array = data[f"{table}__{column}"]
+                columns[column] = array.view('datetime64[ns]') if kind == 'datetime' else array
+
+            index = None
+            if table_schema['index']:
+                index = pd.DatetimeIndex(data[f"{table}__index"].view('datetime64[ns]'), name='timestamp')
+            results[table] = pd.DataFrame(columns, index=index)
+
+    return results
+
+def list_results(results_dir):
+    """
+    Lista los manifiestos de resultados de un directorio, del más reciente al más antiguo
+
+    Args:
+        results_dir: Directorio de resultados
+
+    Returns:
+        list: Rutas de manifiestos con su archivo de datos presente
+    """
+    manifests = [
+        path for path in glob.glob(os.path.join(results_dir, "backtest_*.json"))
+        if os.path.exists(path[:-len('.json')] + '.npz')
+    ]
+    manifests.sort(key=os.path.getmtime, reverse=True)
+    return manifests
+
+def load_stream(output_dir):
+    """
+    Carga los resultados escritos por BacktestEngine en modo streaming
+
+    Args:
+        output_dir: Directorio con 'summary.json' y los bloques 'part_NNNNNN.npz'
+
+    Returns:
+        dict: Igual que load_results, con 'equity' y 'price_data' reconstruidos a partir de los bloques
+    """
+    results = load_results(os.path.join(output_dir, 'summary.json'))
+
+    equity_parts, price_parts = [], []
+    for part_path in sorted(glob.glob(os.path.join(output_dir, 'part_*.npz'))):
+        with np.load(part_path, allow_pickle=False) as data:
+            index = pd.DatetimeIndex(data['timestamp'].view('datetime64[ns]'), name='timestamp')
+            recorded = data['recorded']
+            equity_parts.append(pd.DataFrame(
+                {'balance': data['balance'][recorded], 'drawdown': data['drawdown'][recorded]},
+                index=index[recorded]
+            ))
+            # Los bloques grabados con nivel 'equity' no tienen precio ni MACD
+            if 'with_price' in data:
+                with_price = data['with_price']
+                price_parts.append(pd.DataFrame(
+                    {column: data[column][with_price] for column in PRICE_COLUMNS},
+                    index=index[with_price]
+                ))
+
+    if equity_parts:
+        results['equity'] = with_initial_balance(
+            pd.concat(equity_parts), results['start_date'], results['initial_capital']
+        )
+    if price_parts:
+        results['price_data'] = pd.concat(price_parts)
+    return results
+
+def save_engine_state(output_dir, state, arrays):
+    """
+    Guarda el estado de un backtest en streaming ('state.json' + 'state.npz')
+
+    Ambos archivos se escriben de forma atómica; el .json se escribe el último,
+    así que un estado legible siempre tiene sus columnas completas.
+
+    Args:
+        output_dir: Directorio de salida del backtest
+        state: Diccionario con el estado escalar (posición, capital, indicadores, cursor...)
+        arrays: Columnas numpy del estado (operaciones)
+    """
+    data_path = os.path.join(output_dir, 'state.npz')
+    tmp_data_path = os.path.join(output_dir, f"state.{os.getpid()}.tmp.npz")
+    np.savez(tmp_data_path, **arrays)
+    os.replace(tmp_data_path, data_path)
+
+    state_path = os.path.join(output_dir, 'state.json')
+    with open(f"{state_path}.{os.getpid()}.tmp", 'w') as f:
+        json.dump(_to_scalar(state), f)
+    os.replace(f"{state_path}.{os.getpid()}.tmp", state_path)
+
+def load_engine_state(output_dir):
+    """
+    Carga el estado guardado con save_engine_state
+
+    Returns:
+        tuple: (estado, columnas) o None si el directorio no tiene estado
+    """
+    state_path = os.path.join(output_dir, 'state.json')
+    data_path = os.path.join(output_dir, 'state.npz')
+    if not (os.path.exists(state_path) and os.path.exists(data_path)):
+        return None
+    with open(state_path, 'r') as f:
+        state = json.load(f)
+    with np.load(data_path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    return state, arrays
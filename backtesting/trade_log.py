@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Registro columnar de operaciones
+
+Guarda las operaciones cerradas como arrays numpy paralelos (una posición por
+operación) en lugar de un dict por operación. Las señales de entrada se guardan
+como columnas de códigos enteros por temporalidad (SIGNAL_CODES), así que miles
+de operaciones ocupan unos pocos arrays y se agregan o serializan sin recorrer
+objetos Python.
+"""
+
+import numpy as np
+import pandas as pd
+from strategy.macd_strategy import SIGNAL_CODES, SIGNAL_NAMES
+from risk_management.position_manager import EXIT_REASONS, EXIT_REASON_NAMES
+
+# Códigos de tipo de posición (mismo signo que las señales)
+POSITION_TYPES = {'long': 1, 'short': -1}
+POSITION_NAMES = {code: name for name, code in POSITION_TYPES.items()}
+
+
+# Columnas numéricas por operación
+FLOAT_COLUMNS = ('entry_price', 'exit_price', 'size', 'pnl', 'stop_loss_price', 'take_profit_price')
+TIME_COLUMNS = ('entry_time', 'exit_time')
+
+def _decode(codes, names):
+    """Traduce un array de códigos a sus nombres"""
+    return np.array([names[code] for code in codes.tolist()], dtype=str)
+
+class TradeLog:
+    """
+    Operaciones cerradas como arrays paralelos con crecimiento amortizado
+    """
+
+    def __init__(self, timeframes, capacity=64):
+        """
+        Args:
+            timeframes: Temporalidades cuyas señales de entrada se registran (una columna por temporalidad)
+            capacity: Capacidad inicial (se duplica al llenarse)
+        """
+        self.timeframes = list(timeframes)
+        self._size = 0
+        self._columns = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """Reserva (o amplía) los arrays conservando las operaciones existentes"""
+        n_tf = len(self.timeframes)
+        shapes = {
+            'type': ((capacity,), np.int8),
+            'exit_reason': ((capacity,), np.int8),
+            'entry_time': ((capacity,), np.int64),
+            'exit_time': ((capacity,), np.int64),
+            'signal': ((capacity, n_tf), np.int8),
+            'strength': ((capacity, n_tf), np.float64)
+        }
+        shapes.update({column: ((capacity,), np.float64) for column in FLOAT_COLUMNS})
+
+        columns = {}
+        for name, (shape, dtype) in shapes.items():
+            array = np.zeros(shape, dtype=dtype)
+            if name == 'strength':
+                array[:] = np.nan  # NaN = temporalidad sin señal disponible en la entrada
+            if name in self._columns:
+                array[:self._size] = self._columns[name][:self._size]
+            columns[name] = array
+        self._columns = columns
+        self._capacity = capacity
+
+    def append(self, trade):
+        """
+        Añade una operación cerrada
+
+        Args:
+            trade: Dict devuelto por PositionManager.close_position
+        """
+        if self._size == self._capacity:
+            self._allocate(self._capacity * 2)
+        i = self._size
+        c = self._columns
+
+        c['type'][i] = POSITION_TYPES[trade['type']]
+        c['exit_reason'][i] = EXIT_REASONS[trade['exit_reason']]
+        for column in TIME_COLUMNS:
+            c[column][i] = pd.Timestamp(trade[column]).value
+        for column in FLOAT_COLUMNS:
+            value = trade.get(column)
+            c[column][i] = np.nan if value is None else value
+
+        for signal in trade.get('entry_signals') or []:
+            if signal['timeframe'] in self.timeframes:
+                j = self.timeframes.index(signal['timeframe'])
+                c['signal'][i, j] = SIGNAL_CODES[signal['signal']]
+                c['strength'][i, j] = signal['strength']
+
+        self._size += 1
+
+    def __len__(self):
+        return self._size
+
+    def column(self, name):
+        """Vista de una columna sobre las operaciones registradas"""
+        return self._columns[name][:self._size]
+
+    @property
+    def pnl(self):
+        """P&L de cada operación"""
+        return self.column('pnl')
+
+    def __getitem__(self, i):
+        """Operación i (o lista de operaciones de un slice) en el formato dict de PositionManager.close_position"""
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        c = self._columns
+        entry_time = pd.Timestamp(c['entry_time'][i])
+        return {
+            'type': POSITION_NAMES[int(c['type'][i])],
+            'entry_time': entry_time,
+            'exit_time': pd.Timestamp(c['exit_time'][i]),
+            'entry_price': c['entry_price'][i],
+            'exit_price': c['exit_price'][i],
+            'size': c['size'][i],
+            'pnl': c['pnl'][i],
+            'exit_reason': EXIT_REASON_NAMES[int(c['exit_reason'][i])],
+            'entry_signals': [
+                {
+                    'timestamp': entry_time,
+                    'timeframe': tf,
+                    'signal': SIGNAL_NAMES[int(c['signal'][i, j])],
+                    'strength': c['strength'][i, j]
+                }
+                for j, tf in enumerate(self.timeframes) if not np.isnan(c['strength'][i, j])
+            ],
+            'exit_signals': [],
+            'stop_loss_price': c['stop_loss_price'][i],
+            'take_profit_price': c['take_profit_price'][i]
+        }
+
+    def to_arrays(self):
+        """Columnas recortadas a las operaciones registradas (para snapshots)"""
+        return {name: self.column(name) for name in self._columns}
+
+    @classmethod
+    def from_arrays(cls, timeframes, arrays):
+        """Reconstruye un registro a partir de to_arrays()"""
+        size = len(arrays['pnl'])
+        log = cls(timeframes, capacity=max(64, size))
+        for name, array in arrays.items():
+            log._columns[name][:size] = array
+        log._size = size
+        return log
+
+    def __iter__(self):
+        return (self[i] for i in range(self._size))
+
+    def to_dicts(self):
+        """Lista de operaciones como dicts (para la interfaz)"""
+        return list(self)
+
+    def to_frame(self):
+        """
+        Tabla de operaciones (una fila por operación)
+
+        Tipo y motivo de salida se traducen a texto; las señales quedan como
+        columnas 'signal_<tf>' (código) y 'strength_<tf>' (NaN si no había señal).
+        """
+        if self._size == 0:
+            return pd.DataFrame()
+        frame = pd.DataFrame({
+            'type': _decode(self.column('type'), POSITION_NAMES),
+            'entry_time': self.column('entry_time').view('datetime64[ns]'),
+            'exit_time': self.column('exit_time').view('datetime64[ns]'),
+            **{column: self.column(column) for column in ('entry_price', 'exit_price', 'size', 'pnl')},
+            'exit_reason': _decode(self.column('exit_reason'), EXIT_REASON_NAMES),
+            'stop_loss_price': self.column('stop_loss_price'),
+            'take_profit_price': self.column('take_profit_price')
+        })
+        for j, tf in enumerate(self.timeframes):
+            frame[f'signal_{tf}'] = self.column('signal')[:, j]
+            frame[f'strength_{tf}'] = self.column('strength')[:, j]
+        return frame.copy()
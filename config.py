@@ -26,5 +26,13 @@ SIGNAL_WEIGHTS = {
     'top_sell': 1.5     # Señales más fuertes en picos
 }
 
+# Duración en minutos de cada temporalidad de ccxt (sin dependencias, para
+# que métricas, planificador y almacén de velas no necesiten importar ccxt)
+TIMEFRAME_MINUTES = {
+    '1m': 1, '3m': 3, '5m': 5, '15m': 15, '30m': 30,
+    '1h': 60, '2h': 120, '4h': 240, '6h': 360, '8h': 480,
+    '12h': 720, '1d': 1440, '3d': 4320, '1w': 10080
+}
+
 SYMBOL = 'BTC/USDT'
 SIGNAL_THRESHOLD = 2.0  # umbral mínimo para dar señal
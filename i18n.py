@@ -34,6 +34,8 @@ TRANSLATIONS = {
         "live_stop_bot": "🔴 Detener Bot",
         "live_bot_stopped": "✅ Bot detenido exitosamente",
         "live_stop_error": "❌ Error al detener el bot: {error}",
+        "live_trading_error": "❌ Error al cambiar la ejecución de operaciones: {error}",
+        "live_telemetry_error": "❌ No se pudieron leer las métricas del demonio: {error}",
         "live_enable_trading": "✅ Activar Trading",
         "live_trading_enabled": "✅ Trading activado",
         "live_disable_trading": "⛔ Desactivar Trading",
@@ -44,6 +46,20 @@ TRANSLATIONS = {
         "live_auto_trading": "Trading Automático",
         "live_auto_enabled": "✅ Activado",
         "live_auto_disabled": "⛔ Desactivado",
+        "live_performance_header": "📈 Rendimiento de la sesión",
+        "live_pnl": "P&L",
+        "live_drawdown": "Drawdown",
+        "live_max_drawdown": "máx. {value:.2f}%",
+        "live_sharpe": "Sharpe (24h)",
+        "live_win_rate": "Win Rate",
+        "live_trades_count": "{value} operaciones",
+        "live_latency_header": "⏱️ Latencias del ciclo",
+        "live_latency_metric": "Métrica",
+        "live_latency_count": "Medidas",
+        "live_latency_empty": "Aún no hay medidas",
+        "live_metrics_endpoint": "Métricas en formato Prometheus: {url}",
+        "live_daemon_unreachable": "❌ El demonio de trading no responde en {url}. Arráncalo con `python trader_daemon.py`.",
+        "live_daemon_rejected": "❌ El demonio de trading ha rechazado la petición: {error}. Revisa TRADER_DAEMON_TOKEN.",
         "live_info_block": (
             "ℹ️ **Información del Trading en Vivo**\n"
             "- El bot analiza el mercado cada minuto\n"
@@ -92,8 +108,6 @@ TRANSLATIONS = {
         "bt_completed": "✅ Backtesting completado exitosamente!",
         "bt_configure_hint": "👈 Configura los parámetros en el panel lateral y presiona 'Ejecutar Backtesting' para comenzar.",
         "bt_no_results": "No hay resultados de backtesting disponibles.",
-        "bt_empty_file": "El archivo de resultados está vacío.",
-        "bt_timestamp_parse_warning": "Error al parsear timestamp {timestamp}: {error}",
         "bt_details_block": (
             "**Detalles del Backtest:**\n"
             "- Par: {symbol}\n"
@@ -105,10 +119,7 @@ TRANSLATIONS = {
         "bt_metric_profit_factor": "Factor de Beneficio",
         "bt_metric_max_drawdown": "Máximo Drawdown",
         "bt_capital_evolution_subheader": "📈 Evolución del Capital",
-        "bt_balance_timestamp_warning": "Error al procesar timestamp del balance: {error}",
         "bt_initial_capital_annotation": "Capital Inicial",
-        "bt_drawdown_timestamp_warning": "Error al procesar timestamp del drawdown: {error}",
-        "bt_drawdown_process_error": "Error al procesar drawdown: {error}",
         "bt_capital_chart_title": "Evolución del Capital y Drawdown",
         "bt_date_axis": "Fecha",
         "bt_capital_axis": "Capital ($)",
@@ -136,6 +147,8 @@ TRANSLATIONS = {
         "bt_final_capital_line": "- Capital final: ${value:,.2f}",
         "bt_total_return_line": "- Retorno total: {value:.2f}%",
         "bt_max_drawdown_line": "- Máximo drawdown: {value:.2f}%",
+        "bt_sharpe_line": "- Ratio de Sharpe (anualizado): {value:.2f}",
+        "bt_sortino_line": "- Ratio de Sortino (anualizado): {value:.2f}",
         "bt_load_error": "Error al cargar los resultados: {error}",
     },
     "en": {
@@ -166,6 +179,8 @@ TRANSLATIONS = {
         "live_stop_bot": "🔴 Stop Bot",
         "live_bot_stopped": "✅ Bot stopped successfully",
         "live_stop_error": "❌ Error stopping the bot: {error}",
+        "live_trading_error": "❌ Error changing order execution: {error}",
+        "live_telemetry_error": "❌ Could not read the daemon metrics: {error}",
         "live_enable_trading": "✅ Enable Trading",
         "live_trading_enabled": "✅ Trading enabled",
         "live_disable_trading": "⛔ Disable Trading",
@@ -176,6 +191,20 @@ TRANSLATIONS = {
         "live_auto_trading": "Automatic Trading",
         "live_auto_enabled": "✅ Enabled",
         "live_auto_disabled": "⛔ Disabled",
+        "live_performance_header": "📈 Session performance",
+        "live_pnl": "P&L",
+        "live_drawdown": "Drawdown",
+        "live_max_drawdown": "max {value:.2f}%",
+        "live_sharpe": "Sharpe (24h)",
+        "live_win_rate": "Win Rate",
+        "live_trades_count": "{value} trades",
+        "live_latency_header": "⏱️ Cycle latencies",
+        "live_latency_metric": "Metric",
+        "live_latency_count": "Samples",
+        "live_latency_empty": "No samples yet",
+        "live_metrics_endpoint": "Prometheus metrics: {url}",
+        "live_daemon_unreachable": "❌ The trading daemon is not responding at {url}. Start it with `python trader_daemon.py`.",
+        "live_daemon_rejected": "❌ The trading daemon rejected the request: {error}. Check TRADER_DAEMON_TOKEN.",
         "live_info_block": (
             "ℹ️ **Live Trading Information**\n"
             "- The bot analyzes the market every minute\n"
@@ -224,8 +253,6 @@ TRANSLATIONS = {
         "bt_completed": "✅ Backtest completed successfully!",
         "bt_configure_hint": "👈 Configure the parameters in the sidebar and press 'Run Backtest' to begin.",
         "bt_no_results": "No backtest results available.",
-        "bt_empty_file": "The results file is empty.",
-        "bt_timestamp_parse_warning": "Error parsing timestamp {timestamp}: {error}",
         "bt_details_block": (
             "**Backtest Details:**\n"
             "- Pair: {symbol}\n"
@@ -237,10 +264,7 @@ TRANSLATIONS = {
         "bt_metric_profit_factor": "Profit Factor",
         "bt_metric_max_drawdown": "Max Drawdown",
         "bt_capital_evolution_subheader": "📈 Capital Evolution",
-        "bt_balance_timestamp_warning": "Error processing balance timestamp: {error}",
         "bt_initial_capital_annotation": "Initial Capital",
-        "bt_drawdown_timestamp_warning": "Error processing drawdown timestamp: {error}",
-        "bt_drawdown_process_error": "Error processing drawdown: {error}",
         "bt_capital_chart_title": "Capital Evolution and Drawdown",
         "bt_date_axis": "Date",
         "bt_capital_axis": "Capital ($)",
@@ -268,6 +292,8 @@ TRANSLATIONS = {
         "bt_final_capital_line": "- Final capital: ${value:,.2f}",
         "bt_total_return_line": "- Total return: {value:.2f}%",
         "bt_max_drawdown_line": "- Max drawdown: {value:.2f}%",
+        "bt_sharpe_line": "- Sharpe ratio (annualized): {value:.2f}",
+        "bt_sortino_line": "- Sortino ratio (annualized): {value:.2f}",
         "bt_load_error": "Error loading results: {error}",
     },
 }
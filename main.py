@@ -34,6 +34,9 @@ def evaluate_multi_timeframe(symbol):
     peso_sell = 0
     resumen = []
 
+    # Señales, decisión y order book del ciclo se notifican en un solo mensaje
+    digest = notifier.digest(symbol)
+
     # Carpeta para guardar gráficas
     output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "charts")
     os.makedirs(output_dir, exist_ok=True)
@@ -58,15 +61,14 @@ def evaluate_multi_timeframe(symbol):
 
                 resumen.append(f"{tf}: {signal} (fuerza: {strength:.2f}, peso final: {peso_tf * peso_signal:.2f})")
                 
-                # Enviar notificación de señal individual
-                if signal != 'hold':
-                    notifier.send_trade_signal(
-                        timeframe=tf,
-                        signal=signal,
-                        strength=strength,
-                        price=df['close'].iloc[-1],
-                        additional_info=f"Peso de la señal: {peso_tf * peso_signal:.2f}"
-                    )
+                # Añadir la señal al resumen del ciclo
+                digest.add_signal(
+                    timeframe=tf,
+                    signal=signal,
+                    strength=strength,
+                    price=df['close'].iloc[-1],
+                    additional_info=f"Peso de la señal: {peso_tf * peso_signal:.2f}"
+                )
                 
                 # Guardar imagen del gráfico
                 output_file = os.path.join(output_dir, f"macd_{tf}.png")
@@ -75,7 +77,7 @@ def evaluate_multi_timeframe(symbol):
             except Exception as e:
                 error_msg = f"{tf}: ERROR - {e}"
                 resumen.append(error_msg)
-                notifier.send_error(str(e), f"Error en timeframe {tf}")
+                digest.add_error(str(e), f"Error en timeframe {tf}")
 
         # Mostrar resultados
         print("\n=== Señales por temporalidad ===")
@@ -97,13 +99,14 @@ def evaluate_multi_timeframe(symbol):
         # Obtener información del orderbook para el resumen
         book = get_orderbook_summary(symbol)
         
-        # Enviar resumen final
-        notifier.send_summary(
+        # Enviar el resumen del ciclo
+        digest.set_summary(
             peso_buy=peso_buy,
             peso_sell=peso_sell,
             decision=decision,
             orderbook=book
         )
+        notifier.send_digest(digest)
         
         return decision
 
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Libro de posiciones con varias posiciones abiertas a la vez
+
+Cada posición ocupa una fila de un conjunto de columnas numpy (lado, tamaño,
+precio de entrada, extremos, trailing stop, stop loss y take profit), de modo
+que las condiciones de salida de todas las posiciones abiertas se evalúan con
+una sola llamada vectorizada contra un vector de precios. Admite varias
+posiciones por símbolo (piramidación) y reutiliza las filas liberadas.
+"""
+
+import numpy as np
+import pandas as pd
+from risk_management.position_manager import DEFAULT_RISK_CONFIG, EXIT_REASONS, EXIT_REASON_NAMES
+
+# Columnas de cada posición (side: +1 long, -1 short, 0 fila libre)
+COLUMNS = {
+    'side': np.int8,
+    'symbol': np.int32,
+    'entry_time': np.int64,
+    'size': np.float64,
+    'entry_price': np.float64,
+    'highest_price': np.float64,
+    'lowest_price': np.float64,
+    'trailing_stop': np.float64,
+    'stop_loss_price': np.float64,
+    'take_profit_price': np.float64
+}
+
+class PositionBook:
+    """
+    Posiciones abiertas como arrays paralelos, con las mismas reglas de salida que PositionManager
+    """
+
+    def __init__(self, symbols, config=None, capacity=64):
+        """
+        Args:
+            symbols: Lista de símbolos; las posiciones y los vectores de precios usan su índice
+            config: Configuración de gestión de riesgo (mismas claves que PositionManager)
+            capacity: Filas reservadas inicialmente (se duplican al llenarse)
+        """
+        config = config or {}
+        self.symbols = list(symbols)
+        self.stop_loss_pct = config.get('stop_loss_pct', DEFAULT_RISK_CONFIG['stop_loss_pct'])
+        self.take_profit_pct = config.get('take_profit_pct', DEFAULT_RISK_CONFIG['take_profit_pct'])
+        self.trailing_stop_pct = config.get('trailing_stop_pct', DEFAULT_RISK_CONFIG['trailing_stop_pct'])
+        self.max_position_size = config.get('max_position_size', DEFAULT_RISK_CONFIG['max_position_size'])
+
+        self.capacity = 0
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        """Amplía las columnas conservando las posiciones existentes"""
+        for name, dtype in COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            column[:self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def calculate_position_size(self, capital, entry_price):
+        """Tamaño de una nueva posición (igual que PositionManager)"""
+        return (capital * self.max_position_size) / entry_price
+
+    def open(self, symbol, position_type, entry_price, entry_time, size):
+        """
+        Abre una posición
+
+        Args:
+            symbol: Índice del símbolo en self.symbols
+            position_type: 'long' o 'short'
+            entry_price: Precio de entrada
+            entry_time: Timestamp de entrada
+            size: Tamaño de la posición
+
+        Returns:
+            int: Fila asignada a la posición
+        """
+        free = np.flatnonzero(self.side == 0)
+        if len(free) == 0:
+            slot = self.capacity
+            self._grow(self.capacity * 2)
+        else:
+            slot = free[0]
+
+        side = 1 if position_type == 'long' else -1
+        self.side[slot] = side
+        self.symbol[slot] = symbol
+        self.entry_time[slot] = pd.Timestamp(entry_time).value
+        self.size[slot] = size
+        self.entry_price[slot] = entry_price
+        self.highest_price[slot] = entry_price
+        self.lowest_price[slot] = entry_price
+        self.trailing_stop[slot] = entry_price * (1 - side * self.trailing_stop_pct)
+        self.stop_loss_price[slot] = entry_price * (1 - side * self.stop_loss_pct)
+        self.take_profit_price[slot] = entry_price * (1 + side * self.take_profit_pct)
+        return slot
+
+    def open_slots(self, symbol=None):
+        """Filas con posición abierta (opcionalmente solo de un símbolo)"""
+        mask = self.side != 0
+        if symbol is not None:
+            mask &= self.symbol == symbol
+        return np.flatnonzero(mask)
+
+    def count_by_symbol(self):
+        """Número de posiciones abiertas de cada símbolo"""
+        open_mask = self.side != 0
+        return np.bincount(self.symbol[open_mask], minlength=len(self.symbols))
+
+    def check_exits(self, prices):
+        """
+        Actualiza extremos y trailing stops y evalúa las salidas de todas las posiciones abiertas
+
+        Args:
+            prices: Precio actual de cada símbolo (NaN = sin precio en esta vela)
+
+        Returns:
+            tuple: (filas que deben cerrarse, códigos de motivo de EXIT_REASONS)
+        """
+        slots = np.flatnonzero(self.side != 0)
+        price = np.asarray(prices, dtype=np.float64)[self.symbol[slots]]
+        valid = ~np.isnan(price)
+        slots, price = slots[valid], price[valid]
+        side = self.side[slots]
+        is_long = side > 0
+
+        # Nuevos extremos y trailing stop (PositionManager.check_exit_signals)
+        new_high = is_long & (price > self.highest_price[slots])
+        new_low = ~is_long & (price < self.lowest_price[slots])
+        self.highest_price[slots[new_high]] = price[new_high]
+        self.lowest_price[slots[new_low]] = price[new_low]
+        moved = new_high | new_low
+        self.trailing_stop[slots[moved]] = price[moved] * (1 - side[moved] * self.trailing_stop_pct)
+
+        # Condiciones con la prioridad stop loss > take profit > trailing stop
+        stop_loss = np.where(is_long, price <= self.stop_loss_price[slots], price >= self.stop_loss_price[slots])
+        take_profit = np.where(is_long, price >= self.take_profit_price[slots], price <= self.take_profit_price[slots])
+        trailing = np.where(is_long, price <= self.trailing_stop[slots], price >= self.trailing_stop[slots])
+
+        reasons = np.select(
+            [stop_loss, take_profit, trailing],
+            [EXIT_REASONS['stop_loss'], EXIT_REASONS['take_profit'], EXIT_REASONS['trailing_stop']],
+            default=-1
+        ).astype(np.int8)
+        hit = reasons >= 0
+        return slots[hit], reasons[hit]
+
+    def unrealized_pnl(self, prices):
+        """P&L latente de cada fila (0 en filas libres o sin precio)"""
+        price = np.asarray(prices, dtype=np.float64)[self.symbol]
+        pnl = self.side * self.size * (price - self.entry_price)
+        return np.nan_to_num(pnl)
+
+    def unrealized_by_symbol(self, prices):
+        """P&L latente agregado por símbolo"""
+        return np.bincount(self.symbol, weights=self.unrealized_pnl(prices), minlength=len(self.symbols))
+
+    def committed_capital(self):
+        """Capital comprometido en las posiciones abiertas (tamaño x precio de entrada)"""
+        return np.sum(np.abs(self.side) * self.size * self.entry_price)
+
+    def close(self, slots, exit_prices, exit_time, reasons):
+        """
+        Cierra posiciones y libera sus filas
+
+        Args:
+            slots: Filas a cerrar
+            exit_prices: Precio de salida de cada fila
+            exit_time: Timestamp de salida
+            reasons: Códigos de motivo de salida
+
+        Returns:
+            list: Operaciones cerradas en el formato de PositionManager.close_position (con 'symbol')
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        exit_prices = np.asarray(exit_prices, dtype=np.float64)
+        pnl = self.side[slots] * self.size[slots] * (exit_prices - self.entry_price[slots])
+
+        trades = [
+            {
+                'type': 'long' if self.side[slot] > 0 else 'short',
+                'entry_time': pd.Timestamp(self.entry_time[slot]),
+                'exit_time': exit_time,
+                'entry_price': self.entry_price[slot],
+                'exit_price': exit_price,
+                'size': self.size[slot],
+                'pnl': trade_pnl,
+                'exit_reason': EXIT_REASON_NAMES[int(reason)],
+                'entry_signals': [],
+                'exit_signals': [],
+                'stop_loss_price': self.stop_loss_price[slot],
+                'take_profit_price': self.take_profit_price[slot],
+                'symbol': self.symbols[self.symbol[slot]]
+            }
+            for slot, exit_price, trade_pnl, reason in zip(slots, exit_prices, pnl, reasons)
+        ]
+
+        self.side[slots] = 0
+        self.size[slots] = 0.0
+        return trades
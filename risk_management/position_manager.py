@@ -2,6 +2,21 @@
 Módulo para gestión de riesgo y manejo de posiciones
 """
 
+import numpy as np
+import pandas as pd
+
+# Configuración de riesgo por defecto
+DEFAULT_RISK_CONFIG = {
+    'stop_loss_pct': 0.02,      # 2% stop loss
+    'take_profit_pct': 0.04,    # 4% take profit
+    'trailing_stop_pct': 0.015,  # 1.5% trailing stop
+    'max_position_size': 0.05    # 5% del capital (cambiado de 0.95)
+}
+
+# Códigos de motivo de salida (para almacenar salidas en arrays)
+EXIT_REASONS = {'signal': 0, 'stop_loss': 1, 'take_profit': 2, 'trailing_stop': 3}
+EXIT_REASON_NAMES = {code: name for name, code in EXIT_REASONS.items()}
+
 class PositionManager:
     def __init__(self, config=None):
         """
@@ -10,12 +25,7 @@ class PositionManager:
         Args:
             config: Diccionario con configuración de gestión de riesgo
         """
-        default_config = {
-            'stop_loss_pct': 0.02,      # 2% stop loss
-            'take_profit_pct': 0.04,    # 4% take profit
-            'trailing_stop_pct': 0.015,  # 1.5% trailing stop
-            'max_position_size': 0.05    # 5% del capital (cambiado de 0.95)
-        }
+        default_config = DEFAULT_RISK_CONFIG
         
         config = config or {}
         self.stop_loss_pct = config.get('stop_loss_pct', default_config['stop_loss_pct'])
@@ -101,6 +111,95 @@ class PositionManager:
             
         return False, None, None
     
+    def find_first_exit(self, closes, highs=None, lows=None, opens=None):
+        """
+        Busca la primera salida de la posición actual sobre una trayectoria de precios
+        
+        Equivale a llamar a check_exit_signals vela a vela, pero en una sola
+        pasada vectorizada: el trailing stop sale del máximo/mínimo acumulado.
+        Con highs/lows los niveles se comprueban contra el rango de la vela y el
+        precio de salida es el nivel alcanzado (o la apertura, si con opens la
+        vela abre ya más allá del nivel); sin ellos, contra el cierre. Como no se
+        sabe si dentro de la vela llegó antes el máximo o el mínimo, el trailing
+        stop que se comprueba es el que venía de la vela anterior y solo se sube
+        (o baja) con el extremo de la vela después de comprobarla.
+        Los extremos y el trailing stop de la posición quedan actualizados hasta
+        la vela de salida (o hasta el final de la trayectoria si no hay salida).
+        
+        Args:
+            closes: Precios de cierre de las velas siguientes
+            highs: Máximos de las velas (opcional)
+            lows: Mínimos de las velas (opcional)
+            opens: Aperturas de las velas, para los huecos de precio (opcional)
+            
+        Returns:
+            tuple: (índice de la vela de salida, razón, precio_salida) o (None, None, None)
+        """
+        position = self.current_position
+        closes = np.asarray(closes, dtype=np.float64)
+        if not position or len(closes) == 0:
+            return None, None, None
+        
+        intrabar = highs is not None and lows is not None
+        highs = np.asarray(highs, dtype=np.float64) if intrabar else closes
+        lows = np.asarray(lows, dtype=np.float64) if intrabar else closes
+        entry_price = position['entry_price']
+        
+        if position['type'] == 'long':
+            extreme = np.maximum.accumulate(np.maximum(highs, position['highest_price']))
+            moved = extreme > position['highest_price']
+            trailing = np.where(moved, extreme * (1 - self.trailing_stop_pct), position['trailing_stop'])
+            stop_price = entry_price * (1 - self.stop_loss_pct)
+            take_profit_price = entry_price * (1 + self.take_profit_pct)
+        else:  # short
+            extreme = np.minimum.accumulate(np.minimum(lows, position['lowest_price']))
+            moved = extreme < position['lowest_price']
+            trailing = np.where(moved, extreme * (1 + self.trailing_stop_pct), position['trailing_stop'])
+            stop_price = entry_price * (1 + self.stop_loss_pct)
+            take_profit_price = entry_price * (1 - self.take_profit_pct)
+        
+        # Trailing stop vigente durante cada vela: el del cierre de la anterior
+        tested = np.concatenate(([position['trailing_stop']], trailing[:-1])) if intrabar else trailing
+        if position['type'] == 'long':
+            stop_loss_hit = lows <= stop_price
+            take_profit_hit = highs >= take_profit_price
+            trailing_hit = lows <= tested
+        else:
+            stop_loss_hit = highs >= stop_price
+            take_profit_hit = lows <= take_profit_price
+            trailing_hit = highs >= tested
+        
+        hits = np.flatnonzero(stop_loss_hit | take_profit_hit | trailing_hit)
+        index = int(hits[0]) if len(hits) else len(closes) - 1
+        
+        # Dejar la posición como la habría dejado check_exit_signals
+        if moved[index]:
+            key = 'highest_price' if position['type'] == 'long' else 'lowest_price'
+            position[key] = extreme[index]
+            position['trailing_stop'] = trailing[index]
+        
+        if not len(hits):
+            return None, None, None
+        
+        if not intrabar:
+            fills = {'stop_loss': closes[index], 'take_profit': closes[index], 'trailing_stop': closes[index]}
+        else:
+            fills = {'stop_loss': stop_price, 'take_profit': take_profit_price, 'trailing_stop': tested[index]}
+            if opens is not None:
+                # Si la vela abre más allá del nivel, la orden se ejecuta a la apertura
+                open_price = opens[index]
+                worse, better = (min, max) if position['type'] == 'long' else (max, min)
+                fills['stop_loss'] = worse(open_price, stop_price)
+                fills['take_profit'] = better(open_price, take_profit_price)
+                fills['trailing_stop'] = worse(open_price, tested[index])
+        
+        # Misma prioridad que check_exit_signals: stop loss > take profit > trailing stop
+        if stop_loss_hit[index]:
+            return index, 'stop_loss', fills['stop_loss']
+        if take_profit_hit[index]:
+            return index, 'take_profit', fills['take_profit']
+        return index, 'trailing_stop', fills['trailing_stop']
+    
     def _check_stop_loss(self, current_price):
         """Verifica si se ha alcanzado el stop loss"""
         if self.current_position['type'] == 'long':
@@ -161,6 +260,38 @@ class PositionManager:
         else:  # short
             return self.current_position['size'] * (self.current_position['entry_price'] - exit_price)
     
+    def position_to_dict(self):
+        """
+        Posición actual serializable en JSON (para snapshots)
+        
+        Returns:
+            dict: Posición con fechas en ISO 8601, o None si no hay posición abierta
+        """
+        if not self.current_position:
+            return None
+        position = {
+            key: float(value) if isinstance(value, (float, np.floating)) else value
+            for key, value in self.current_position.items()
+        }
+        position['entry_time'] = pd.Timestamp(position['entry_time']).isoformat()
+        position['signals'] = [
+            dict(signal, timestamp=pd.Timestamp(signal['timestamp']).isoformat(), strength=float(signal['strength']))
+            for signal in position['signals']
+        ]
+        return position
+    
+    def restore_position(self, state):
+        """Restaura la posición guardada con position_to_dict (None = sin posición)"""
+        if state is None:
+            self.current_position = None
+            return
+        position = dict(state)
+        position['entry_time'] = pd.Timestamp(position['entry_time'])
+        position['signals'] = [
+            dict(signal, timestamp=pd.Timestamp(signal['timestamp'])) for signal in position['signals']
+        ]
+        self.current_position = position
+    
     def get_current_position(self):
         """Retorna la posición actual"""
         return self.current_position 
\ No newline at end of file
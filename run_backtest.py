@@ -4,14 +4,31 @@ Script para ejecutar backtesting de la estrategia MACD
 """
 
 import os
-import json
+import sys
 from datetime import datetime, timedelta
-import tempfile
-from backtesting.engine import BacktestEngine
+import config
+import strategy
+import risk_management
+import backtesting
+import utils
+from backtesting.engine import BacktestEngine, candle_fingerprint
+from backtesting.storage import results_to_frames, save_results, load_results, load_stream
+from backtesting.cache import ResultCache, make_cache_key, source_fingerprint
 import numpy as np
-import pandas as pd
 
-def run_backtest(symbol='BTC/USDT', start_date=None, end_date=None, initial_capital=1000.0, timeframes=None, risk_config=None):
+# Versión del código que produce los resultados: cualquier cambio en los paquetes
+# que usa el motor (o en la configuración) invalida la caché
+STRATEGY_VERSION = source_fingerprint(
+    strategy,
+    risk_management,
+    backtesting,
+    utils,
+    config,
+    sys.modules[__name__]
+)
+
+def run_backtest(symbol='BTC/USDT', start_date=None, end_date=None, initial_capital=1000.0, timeframes=None, risk_config=None, use_cache=True,
+                 intrabar_timeframe=None, resume_dir=None):
     """
     Ejecuta el backtesting para un período específico
     
@@ -22,6 +39,10 @@ def run_backtest(symbol='BTC/USDT', start_date=None, end_date=None, initial_capi
         initial_capital: Capital inicial para la simulación (por defecto 1000.0)
         timeframes: Lista de temporalidades a analizar (por defecto ['4h'])
         risk_config: Diccionario con configuración de gestión de riesgo (por defecto None)
+        use_cache: Reutilizar resultados previos con mismos parámetros, código y datos (por defecto True)
+        intrabar_timeframe: Temporalidad inferior para resolver stops dentro de la vela (por defecto None)
+        resume_dir: Directorio de un backtest por bloques que se extiende: se retoma su estado guardado
+            y solo se procesan las velas nuevas (por defecto None, se ejecuta completo)
     """
     # Valores por defecto
     if start_date is None:
@@ -53,11 +74,35 @@ def run_backtest(symbol='BTC/USDT', start_date=None, end_date=None, initial_capi
     print(f"✅ Take Profit: {risk_config['take_profit_pct']*100:.1f}%")
     print(f"📈 Trailing Stop: {risk_config['trailing_stop_pct']*100:.1f}%")
     print(f"💵 Tamaño máximo posición: {risk_config['max_position_size']*100:.1f}%")
+    if intrabar_timeframe:
+        print(f"🔍 Salidas resueltas con velas de {intrabar_timeframe}")
     
     # Crear directorio para resultados si no existe
     results_dir = os.path.join(os.environ.get('TEMP', '/tmp'), "trading_bot_results")
     os.makedirs(results_dir, exist_ok=True)
     
+    # Nombre de los archivos de resultados
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    symbol_clean = symbol.replace('/', '_')
+    timeframe_str = '_'.join(timeframes)  # Incluir temporalidad en el nombre del archivo
+    results_base = os.path.join(results_dir, f"backtest_{symbol_clean}_{timeframe_str}_{timestamp}")
+    
+    # Buscar en caché: parámetros + versión del código + huella de las velas
+    # La huella se toma del almacén de velas, antes de crear el motor (que calcula
+    # los indicadores), así que un acierto no carga DataFrames ni calcula el MACD.
+    # Al extender un backtest guardado no se usa la caché: las velas se leen por bloques al ejecutar
+    cache = ResultCache() if use_cache and resume_dir is None else None
+    if cache is not None:
+        cache_key = make_cache_key(
+            symbol, start_date.isoformat(), end_date.isoformat(), timeframes, initial_capital,
+            risk_config, intrabar_timeframe, STRATEGY_VERSION,
+            candle_fingerprint(symbol, start_date, end_date, timeframes, intrabar_timeframe)
+        )
+        cached_file = cache.get(cache_key, results_base)
+        if cached_file:
+            print(f"\n⚡ Resultados recuperados de caché: {cached_file}")
+            return load_results(cached_file)
+    
     # Ejecutar backtesting
     engine = BacktestEngine(
         symbol=symbol,
@@ -65,96 +110,69 @@ def run_backtest(symbol='BTC/USDT', start_date=None, end_date=None, initial_capi
         end_date=end_date,
         initial_capital=initial_capital,
         timeframes=timeframes,
-        risk_config=risk_config
+        risk_config=risk_config,
+        intrabar_timeframe=intrabar_timeframe,
+        streaming=resume_dir is not None,
+        output_dir=resume_dir,
+        resume=resume_dir is not None
     )
     
     results = engine.run()
+    if resume_dir is not None:
+        # Resultados acumulados de todas las ejecuciones (bloques anteriores + nuevos)
+        results = load_stream(resume_dir)
     
     # Asegurarse de que el símbolo esté en los resultados
     if 'symbol' not in results:
         results['symbol'] = symbol
     
-    # Convertir todos los valores no serializables a strings
-    def convert_to_serializable(obj):
-        if isinstance(obj, (datetime, np.datetime64, pd.Timestamp)):
-            return obj.isoformat()
-        if isinstance(obj, (np.int64, np.int32)):
-            return int(obj)
-        if isinstance(obj, (np.float64, np.float32)):
-            return float(obj)
-        if isinstance(obj, pd.Index):
-            return list(obj)
-        if isinstance(obj, pd.DataFrame):
-            return obj.to_dict(orient='records')
-        if isinstance(obj, pd.Series):
-            return obj.to_dict()
-        if isinstance(obj, dict):
-            return {str(k): convert_to_serializable(v) for k, v in obj.items()}
-        if isinstance(obj, (list, tuple)):
-            return [convert_to_serializable(item) for item in obj]
-        if pd.isna(obj):
-            return None
-        return obj
-
-    # Procesar resultados para asegurar que son serializables
-    serializable_results = convert_to_serializable(results)
-    
-    # Asegurarse de que las fechas estén en formato ISO
-    if 'start_date' in serializable_results:
-        serializable_results['start_date'] = start_date.isoformat()
-    if 'end_date' in serializable_results:
-        serializable_results['end_date'] = end_date.isoformat()
+    # Convertir a tablas columnares (capital, precio/MACD y operaciones)
+    results = results_to_frames(results)
+    results['start_date'] = start_date.isoformat()
+    results['end_date'] = end_date.isoformat()
     
     # Añadir configuración de riesgo a los resultados
-    serializable_results['risk_config'] = risk_config
+    results['risk_config'] = risk_config
     
     # Añadir información adicional a los trades
-    if 'trades' in serializable_results:
-        for trade in serializable_results['trades']:
-            # Calcular stop loss y take profit
-            entry_price = trade['entry_price']
-            if trade['type'] == 'long':
-                trade['stop_loss_price'] = entry_price * (1 - risk_config['stop_loss_pct'])
-                trade['take_profit_price'] = entry_price * (1 + risk_config['take_profit_pct'])
-                trade['price_change_pct'] = ((trade['exit_price'] - trade['entry_price']) / trade['entry_price']) * 100
-            else:  # short
-                trade['stop_loss_price'] = entry_price * (1 + risk_config['stop_loss_pct'])
-                trade['take_profit_price'] = entry_price * (1 - risk_config['take_profit_pct'])
-                trade['price_change_pct'] = ((trade['entry_price'] - trade['exit_price']) / trade['entry_price']) * 100
-            
-            # Añadir timeframe
-            trade['timeframe'] = timeframes[0]
-            
-            # Añadir información de MACD si está disponible en price_data
-            if 'price_data' in results:
-                entry_time = pd.to_datetime(trade['entry_time'])
-                exit_time = pd.to_datetime(trade['exit_time'])
-                
-                if entry_time in results['price_data']:
-                    entry_data = results['price_data'][entry_time]
-                    trade['entry_macd'] = entry_data.get('MACD_12_26_9')
-                    trade['entry_macd_signal'] = entry_data.get('MACDs_12_26_9')
-                    trade['entry_macd_hist'] = entry_data.get('MACDh_12_26_9')
-                
-                if exit_time in results['price_data']:
-                    exit_data = results['price_data'][exit_time]
-                    trade['exit_macd'] = exit_data.get('MACD_12_26_9')
-                    trade['exit_macd_signal'] = exit_data.get('MACDs_12_26_9')
-                    trade['exit_macd_hist'] = exit_data.get('MACDh_12_26_9')
+    trades_df = results['trades']
+    if not trades_df.empty:
+        entry_price = trades_df['entry_price']
+        exit_price = trades_df['exit_price']
+        is_long = trades_df['type'] == 'long'
+        
+        # Calcular stop loss y take profit
+        trades_df['stop_loss_price'] = np.where(
+            is_long, entry_price * (1 - risk_config['stop_loss_pct']), entry_price * (1 + risk_config['stop_loss_pct'])
+        )
+        trades_df['take_profit_price'] = np.where(
+            is_long, entry_price * (1 + risk_config['take_profit_pct']), entry_price * (1 - risk_config['take_profit_pct'])
+        )
+        trades_df['price_change_pct'] = np.where(
+            is_long, (exit_price - entry_price) / entry_price, (entry_price - exit_price) / entry_price
+        ) * 100
+        
+        # Añadir timeframe
+        trades_df['timeframe'] = timeframes[0]
+        
+        # Añadir información de MACD si está disponible en price_data
+        price_df = results['price_data']
+        macd_columns = {'MACD_12_26_9': 'macd', 'MACDs_12_26_9': 'macd_signal', 'MACDh_12_26_9': 'macd_hist'}
+        if not price_df.empty:
+            for side in ('entry', 'exit'):
+                macd_values = price_df.reindex(trades_df[f'{side}_time'])
+                for column, name in macd_columns.items():
+                    trades_df[f'{side}_{name}'] = macd_values[column].to_numpy()
     
     # Guardar resultados
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    symbol_clean = symbol.replace('/', '_')
-    timeframe_str = '_'.join(timeframes)  # Incluir temporalidad en el nombre del archivo
-    results_file = os.path.join(results_dir, f"backtest_{symbol_clean}_{timeframe_str}_{timestamp}.json")
-    
-    with open(results_file, 'w') as f:
-        json.dump(serializable_results, f, indent=4)
+    results_file = save_results(results, results_base)
+    if cache is not None:
+        cache.put(cache_key, results_file)
     
     print(f"\n✅ Backtesting completado")
     print(f"📁 Resultados guardados en: {results_file}")
     
-    return serializable_results
+    return results
 
 if __name__ == "__main__":
     run_backtest() 
\ No newline at end of file
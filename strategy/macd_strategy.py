@@ -10,6 +10,22 @@ Created on Thu Apr 10 22:47:08 2025
 import pandas as pd
 import pandas_ta as ta
 import numpy as np
+import math
+from utils import telemetry
+
+# Códigos enteros para almacenar señales en arrays (el signo indica la dirección)
+SIGNAL_CODES = {
+    'hold': 0,
+    'buy': 1,
+    'valley_buy': 2,
+    'sell': -1,
+    'top_sell': -2
+}
+SIGNAL_NAMES = {code: name for name, code in SIGNAL_CODES.items()}
+
+# Velas previas que necesitan los indicadores de la estrategia: MACD 12/26/9
+# (26 + 9), EMA-50 y ATR-14. Con menos, la señal siempre es 'hold'
+SIGNAL_LOOKBACK = max(26 + 9, 50, 14)
 
 def calculate_threshold(timeframe):
     """Calcula umbrales dinámicos basados en la temporalidad"""
@@ -25,6 +41,7 @@ def calculate_threshold(timeframe):
     base_threshold = 0.8  # Aumentado de 0.5 a 0.8
     return base_threshold * tf_factors.get(timeframe, 0.7)
 
+@telemetry.timed(telemetry.histogram('macd_signal_seconds', 'Cálculo de check_macd_signal'))
 def check_macd_signal(df, timeframe=''):
     """
     Calcula señales MACD para un DataFrame dado
@@ -37,7 +54,7 @@ def check_macd_signal(df, timeframe=''):
         tuple: (señal, fuerza) donde señal puede ser 'buy', 'sell', 'valley_buy', 'top_sell' o 'hold'
     """
     # Verificar que hay suficientes datos (EMA-50 es el indicador que mas pide: 50 periodos)
-    if len(df) < 50:
+    if len(df) < SIGNAL_LOOKBACK:
         print(f"\n⚠️ Insuficientes datos para calcular MACD ({len(df)} períodos)")
         return 'hold', 0.0
     
@@ -105,3 +122,216 @@ def check_macd_signal(df, timeframe=''):
         print(f"\n❌ Error al calcular señales MACD: {str(e)}")
         return 'hold', 0.0
 
+def calculate_signal_series(df, timeframe=''):
+    """
+    Calcula de una sola pasada la señal que daría check_macd_signal en cada vela
+
+    Los indicadores usados (MACD, ATR y EMAs) son causales, así que el valor en la
+    vela i coincide con el de check_macd_signal(df.iloc[:i + 1]).
+
+    Args:
+        df: DataFrame con datos OHLCV
+        timeframe: Temporalidad de los datos
+
+    Returns:
+        pd.DataFrame: Columnas 'signal' (código de SIGNAL_CODES) y 'strength', con el índice de df
+    """
+    n = len(df)
+    codes = np.zeros(n, dtype=np.int8)
+    strength = np.zeros(n, dtype=np.float64)
+
+    if n < SIGNAL_LOOKBACK:
+        return pd.DataFrame({'signal': codes, 'strength': strength}, index=df.index)
+
+    macd = df.ta.macd(close='close', fast=12, slow=26, signal=9)
+    hist = macd['MACDh_12_26_9'].to_numpy(dtype=np.float64)
+    prev_hist = np.concatenate(([np.nan], hist[:-1]))
+    close = df['close'].to_numpy(dtype=np.float64)
+
+    price_threshold = close * 0.001
+    atr = df.ta.atr(high='high', low='low', close='close', length=14).to_numpy(dtype=np.float64)
+    volatility = atr / price_threshold
+    threshold = price_threshold * calculate_threshold(timeframe) * (1 + volatility)
+
+    ema_20 = df.ta.ema(close='close', length=20).to_numpy(dtype=np.float64)
+    ema_50 = df.ta.ema(close='close', length=50).to_numpy(dtype=np.float64)
+    trend_up = ema_20 > ema_50
+    trend_down = ~trend_up
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raw_strength = np.minimum(np.abs(hist) / threshold * (1 + volatility), 1.0)
+        strong = np.abs(hist) > threshold
+        cross_up = (hist > 0) & (prev_hist <= 0)
+        cross_down = (hist < 0) & (prev_hist >= 0)
+
+    # Igual que check_macd_signal: se necesitan al menos 50 velas
+    valid = np.arange(n) >= 49
+    codes[valid & cross_up & trend_up & ~strong] = SIGNAL_CODES['buy']
+    codes[valid & cross_up & trend_up & strong] = SIGNAL_CODES['valley_buy']
+    codes[valid & cross_down & trend_down & ~strong] = SIGNAL_CODES['sell']
+    codes[valid & cross_down & trend_down & strong] = SIGNAL_CODES['top_sell']
+
+    active = codes != 0
+    strength[active] = raw_strength[active]
+
+    return pd.DataFrame({'signal': codes, 'strength': strength}, index=df.index)
+
+class _EMAState:
+    """EMA incremental con semilla SMA (misma definición que pandas_ta.ema)"""
+
+    def __init__(self, length, count=0, total=0.0, value=float('nan')):
+        self.length = length
+        self.alpha = 2 / (length + 1)
+        self.count = count
+        self.total = total
+        self.value = value
+
+    def update(self, x):
+        self.count += 1
+        if self.count <= self.length:
+            self.total += x
+            if self.count == self.length:
+                self.value = self.total / self.length
+            return self.value
+        self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+    def to_dict(self):
+        return {'length': self.length, 'count': self.count, 'total': self.total, 'value': self.value}
+
+class _RMAState:
+    """Media móvil de Wilder incremental (ewm ajustada con alpha=1/length, como pandas_ta.rma)"""
+
+    def __init__(self, length, count=0, numerator=0.0, denominator=0.0):
+        self.length = length
+        self.alpha = 1 / length
+        self.count = count
+        self.numerator = numerator
+        self.denominator = denominator
+
+    def update(self, x):
+        self.count += 1
+        self.numerator = x + (1 - self.alpha) * self.numerator
+        self.denominator = 1 + (1 - self.alpha) * self.denominator
+        return self.numerator / self.denominator if self.count >= self.length else float('nan')
+
+    def to_dict(self):
+        return {
+            'length': self.length, 'count': self.count,
+            'numerator': self.numerator, 'denominator': self.denominator
+        }
+
+class MACDSignalState:
+    """
+    Estado incremental de los indicadores de check_macd_signal
+
+    Procesa las velas una a una con memoria constante (MACD 12/26/9, ATR 14 y
+    EMAs 20/50), de modo que el cálculo puede continuar entre bloques de datos
+    o retomarse desde un estado guardado sin recalcular el histórico.
+    """
+
+    def __init__(self, timeframe=''):
+        self.timeframe = timeframe
+        self.base_threshold = calculate_threshold(timeframe)
+        self.bars = 0
+        self.ema_fast = _EMAState(12)
+        self.ema_slow = _EMAState(26)
+        self.ema_signal = _EMAState(9)
+        self.ema_20 = _EMAState(20)
+        self.ema_50 = _EMAState(50)
+        self.atr = _RMAState(14)
+        self.prev_close = None
+        self.macd = float('nan')
+        self.macd_signal = float('nan')
+        self.macd_hist = float('nan')
+
+    def update(self, high, low, close):
+        """
+        Añade una vela cerrada y retorna la señal resultante
+
+        Returns:
+            tuple: (código de SIGNAL_CODES, fuerza)
+        """
+        self.bars += 1
+        prev_hist = self.macd_hist
+
+        self.macd = self.ema_fast.update(close) - self.ema_slow.update(close)
+        if not math.isnan(self.macd):
+            self.macd_signal = self.ema_signal.update(self.macd)
+        self.macd_hist = self.macd - self.macd_signal
+
+        atr_value = float('nan')
+        if self.prev_close is not None:
+            true_range = max(high - low, abs(high - self.prev_close), abs(self.prev_close - low))
+            atr_value = self.atr.update(true_range)
+        self.prev_close = close
+
+        ema_20 = self.ema_20.update(close)
+        ema_50 = self.ema_50.update(close)
+
+        # Igual que check_macd_signal: se necesitan al menos 50 velas
+        if self.bars < SIGNAL_LOOKBACK:
+            return SIGNAL_CODES['hold'], 0.0
+
+        hist = self.macd_hist
+        price_threshold = close * 0.001
+        volatility = atr_value / price_threshold
+        threshold = price_threshold * self.base_threshold * (1 + volatility)
+        trend_up = ema_20 > ema_50
+        strong = abs(hist) > threshold
+
+        if hist > 0 and prev_hist <= 0 and trend_up:
+            code = SIGNAL_CODES['valley_buy'] if strong else SIGNAL_CODES['buy']
+        elif hist < 0 and prev_hist >= 0 and not trend_up:
+            code = SIGNAL_CODES['top_sell'] if strong else SIGNAL_CODES['sell']
+        else:
+            return SIGNAL_CODES['hold'], 0.0
+
+        return code, min(abs(hist) / threshold * (1 + volatility), 1.0)
+
+    def update_many(self, highs, lows, closes):
+        """
+        Procesa un bloque de velas
+
+        Returns:
+            tuple: (códigos, fuerzas, macd, señal macd, histograma) como arrays
+        """
+        n = len(closes)
+        codes = np.zeros(n, dtype=np.int8)
+        strengths = np.zeros(n, dtype=np.float64)
+        macd = np.empty((n, 3), dtype=np.float64)
+        for i, (high, low, close) in enumerate(zip(highs.tolist(), lows.tolist(), closes.tolist())):
+            codes[i], strengths[i] = self.update(high, low, close)
+            macd[i] = (self.macd, self.macd_signal, self.macd_hist)
+        return codes, strengths, macd[:, 0], macd[:, 1], macd[:, 2]
+
+    def to_dict(self):
+        """Estado serializable (para snapshots)"""
+        return {
+            'timeframe': self.timeframe,
+            'bars': self.bars,
+            'ema_fast': self.ema_fast.to_dict(),
+            'ema_slow': self.ema_slow.to_dict(),
+            'ema_signal': self.ema_signal.to_dict(),
+            'ema_20': self.ema_20.to_dict(),
+            'ema_50': self.ema_50.to_dict(),
+            'atr': self.atr.to_dict(),
+            'prev_close': self.prev_close,
+            'macd': self.macd,
+            'macd_signal': self.macd_signal,
+            'macd_hist': self.macd_hist
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Reconstruye el estado a partir de to_dict()"""
+        obj = cls(state['timeframe'])
+        obj.bars = state['bars']
+        for name in ('ema_fast', 'ema_slow', 'ema_signal', 'ema_20', 'ema_50'):
+            setattr(obj, name, _EMAState(**state[name]))
+        obj.atr = _RMAState(**state['atr'])
+        obj.prev_close = state['prev_close']
+        obj.macd = state['macd']
+        obj.macd_signal = state['macd_signal']
+        obj.macd_hist = state['macd_hist']
+        return obj
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para las cachés de resultados y señales de backtesting
+"""
+
+import os
+import time
+import tempfile
+import unittest
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import backtesting
+import run_backtest
+from backtesting.cache import ResultCache, SignalCache, make_cache_key, source_fingerprint
+
+class TestCacheKeys(unittest.TestCase):
+    def test_key_stability(self):
+        """La clave no depende del orden de los diccionarios y cambia con cualquier parámetro"""
+        key = make_cache_key('BTC/USDT', ['4h'], {'stop_loss_pct': 0.02, 'take_profit_pct': 0.04})
+        self.assertEqual(key, make_cache_key('BTC/USDT', ['4h'], {'take_profit_pct': 0.04, 'stop_loss_pct': 0.02}))
+        self.assertNotEqual(key, make_cache_key('BTC/USDT', ['4h'], {'stop_loss_pct': 0.03, 'take_profit_pct': 0.04}))
+        self.assertNotEqual(key, make_cache_key('ETH/USDT', ['4h'], {'stop_loss_pct': 0.02, 'take_profit_pct': 0.04}))
+
+    def test_package_fingerprint(self):
+        """La versión del código cubre todos los módulos del paquete"""
+        version = source_fingerprint(backtesting)
+        self.assertEqual(version, source_fingerprint(backtesting))
+        self.assertNotEqual(version, source_fingerprint(backtesting.engine))
+        self.assertNotEqual(version, source_fingerprint(backtesting, run_backtest))
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmp.name, 'cache'), max_bytes=2500)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _result(self, name, size=1000):
+        """Escribe un resultado ficticio (manifiesto + datos) y retorna su manifiesto"""
+        base = os.path.join(self.tmp.name, name)
+        with open(f"{base}.npz", 'wb') as f:
+            f.write(b'x' * size)
+        with open(f"{base}.json", 'w') as f:
+            f.write('{}')
+        return f"{base}.json"
+
+    def test_hit_and_miss(self):
+        """Una clave guardada se copia al destino; una desconocida no"""
+        self.cache.put('a', self._result('a'))
+        dest = os.path.join(self.tmp.name, 'copia')
+        self.assertEqual(self.cache.get('a', dest), f"{dest}.json")
+        self.assertEqual(os.path.getsize(f"{dest}.npz"), 1000)
+        self.assertIsNone(self.cache.get('b', dest))
+
+    def test_lru_eviction(self):
+        """Al superar el tamaño máximo se desaloja la entrada usada hace más tiempo"""
+        self.cache.put('a', self._result('a'))
+        self.cache.put('b', self._result('b'))
+        past = time.time() - 60
+        for key in ('a', 'b'):
+            for path in self.cache.files(key):
+                os.utime(path, (past, past))
+        # Usar 'a' la convierte en la más reciente: se desaloja 'b'
+        self.assertIsNotNone(self.cache.get('a', os.path.join(self.tmp.name, 'uso')))
+        self.cache.put('c', self._result('c'))
+
+        self.assertTrue(self.cache.contains('a', 'json'))
+        self.assertFalse(self.cache.contains('b', 'json'))
+        self.assertEqual(self.cache.files('b'), [])
+        self.assertTrue(self.cache.contains('c', 'json'))
+
+class TestSignalCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SignalCache(os.path.join(self.tmp.name, 'signals'), max_bytes=0)
+        index = pd.date_range('2024-01-01', periods=50, freq='4h', name='timestamp')
+        self.series = pd.DataFrame({'signal': np.arange(50, dtype=np.int8) % 3 - 1, 'strength': np.linspace(0, 1, 50)}, index=index)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_partial_write_is_invisible(self):
+        """Un archivo a medio escribir no cuenta como entrada ni se desaloja"""
+        seen = []
+
+        def writer(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(b'x' * 100)
+            seen.append(self.cache.files('a'))
+            self.cache.evict()
+            seen.append(os.path.exists(tmp_path))
+            np.savez(tmp_path, index=np.zeros(1, dtype=np.int64), signal=np.zeros(1), strength=np.zeros(1))
+
+        self.cache.write('a', 'npz', writer)
+
+        self.assertEqual(seen, [[], True])
+        self.assertEqual(self.cache.files('a'), [self.cache.path('a', 'npz')])
+        self.assertEqual(os.listdir(os.path.join(self.cache.directory, 'tmp')), [])
+
+    def test_put_and_get(self):
+        """put escribe la serie completa y sin temporales; un fallo no deja entrada"""
+        self.cache.max_bytes = 10**6
+        self.cache.put('a', self.series)
+        pd.testing.assert_frame_equal(self.cache.get('a'), self.series, check_freq=False)
+        self.assertEqual(sorted(os.listdir(self.cache.directory)), ['a.npz', 'tmp'])
+
+        def failing(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(b'x')
+            raise OSError('disco lleno')
+
+        with self.assertRaises(OSError):
+            self.cache.write('b', 'npz', failing)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(os.listdir(os.path.join(self.cache.directory, 'tmp')), [])
+
+class TestRunBacktestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.originals = (run_backtest.BacktestEngine, run_backtest.candle_fingerprint,
+                          run_backtest.ResultCache, run_backtest.load_results)
+        cache_dir = os.path.join(self.tmp.name, 'cache')
+        self.fingerprints = []
+
+        def fake_fingerprint(*args):
+            self.fingerprints.append(args)
+            return 'velas'
+
+        def no_engine(**kwargs):
+            raise AssertionError("Con un acierto de caché no se debe crear el motor")
+
+        run_backtest.BacktestEngine = no_engine
+        run_backtest.candle_fingerprint = fake_fingerprint
+        run_backtest.ResultCache = lambda: ResultCache(cache_dir)
+        run_backtest.load_results = lambda path: {'manifest': path}
+        self.cache = ResultCache(cache_dir)
+
+    def tearDown(self):
+        (run_backtest.BacktestEngine, run_backtest.candle_fingerprint,
+         run_backtest.ResultCache, run_backtest.load_results) = self.originals
+        self.tmp.cleanup()
+
+    def test_hit_skips_engine(self):
+        """La caché se consulta con la huella del almacén antes de crear el motor"""
+        start, end = datetime(2024, 1, 1), datetime(2024, 2, 1)
+        risk_config = {
+            'stop_loss_pct': 0.02, 'take_profit_pct': 0.04,
+            'trailing_stop_pct': 0.015, 'max_position_size': 0.95
+        }
+        key = make_cache_key(
+            'BTC/USDT', start.isoformat(), end.isoformat(), ['4h'], 1000.0,
+            risk_config, None, run_backtest.STRATEGY_VERSION, 'velas'
+        )
+        base = os.path.join(self.tmp.name, 'resultado')
+        for extension in ('npz', 'json'):
+            with open(f"{base}.{extension}", 'w') as f:
+                f.write('{}')
+        self.cache.put(key, f"{base}.json")
+
+        results = run_backtest.run_backtest('BTC/USDT', start, end, timeframes=['4h'])
+
+        self.assertTrue(results['manifest'].endswith('.json'))
+        self.assertEqual(self.fingerprints, [('BTC/USDT', start, end, ['4h'], None)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para la ventana de velas en memoria
+"""
+
+import unittest
+import numpy as np
+from utils.candle_store import CandleBuffer
+
+class TestCandleBuffer(unittest.TestCase):
+    def test_window_matches_tail(self):
+        """Tras añadir bloques de cualquier tamaño la ventana son las últimas 'capacity' velas"""
+        rng = np.random.default_rng(3)
+        buffer = CandleBuffer(50)
+        timestamps = np.arange(1000, dtype=np.int64) * 60_000
+        values = rng.normal(100, 1, (1000, 5))
+        storage = buffer._data
+
+        lo = 0
+        while lo < len(timestamps):
+            hi = min(lo + int(rng.integers(1, 70)), len(timestamps))
+            # Cada bloque repite la última vela ya guardada, como una descarga desde 'since'
+            start = max(lo - 1, 0)
+            buffer.append(timestamps[start:hi], values[start:hi])
+            records = buffer.records()
+            tail = slice(max(hi - 50, 0), hi)
+            np.testing.assert_array_equal(records['timestamp'], timestamps[tail])
+            np.testing.assert_array_equal(records['close'], values[tail, 3])
+            lo = hi
+
+        self.assertIs(buffer._data, storage)
+        self.assertEqual(buffer.last_timestamp(), int(timestamps[-1]))
+
+    def test_frame(self):
+        """El DataFrame de la ventana tiene las columnas OHLCV indexadas por fecha"""
+        buffer = CandleBuffer(3)
+        self.assertIsNone(buffer.last_timestamp())
+        buffer.append(np.array([0, 60_000]), np.ones((2, 5)))
+        df = buffer.frame()
+        self.assertEqual(list(df.columns), ['open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(len(df), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el almacén local de velas por tramos (con un exchange simulado)
+"""
+
+import os
+import time
+import tempfile
+import unittest
+import zlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import utils.candle_store as candle_store
+from utils.candle_store import CandleStore
+
+FREQUENCIES = {'15m': '15min', '1h': '1h', '4h': '4h', '1d': '1D'}
+
+class FakeMarketData:
+    """Velas sintéticas deterministas por símbolo y temporalidad que sustituyen a get_price_data"""
+
+    def __init__(self, start='2023-10-01', end='2024-06-01'):
+        self.start, self.end = start, end
+        self.frames = {}
+        self.requests = []
+
+    def frame(self, symbol, timeframe):
+        """Velas del símbolo y temporalidad (se generan la primera vez; se pueden modificar)"""
+        if (symbol, timeframe) not in self.frames:
+            index = pd.date_range(self.start, self.end, freq=FREQUENCIES[timeframe], inclusive='left', name='timestamp')
+            seed = zlib.crc32(f"{symbol} {timeframe}".encode('utf-8'))
+            close = 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1, len(index)))
+            self.frames[symbol, timeframe] = pd.DataFrame({
+                'open': np.r_[close[0], close[:-1]],
+                'high': close + 1.5,
+                'low': close - 1.5,
+                'close': close,
+                'volume': 1.0
+            }, index=index)
+        return self.frames[symbol, timeframe]
+
+    def __call__(self, symbol, timeframe, start_date=None, end_date=None, exchange=None, **kwargs):
+        # Igual que api_data.get_price_data: los límites pasan a ms con datetime.timestamp()
+        start, end = (pd.Timestamp(int(date.timestamp() * 1000), unit='ms') for date in (start_date, end_date))
+        self.requests.append((timeframe, start, end))
+        df = self.frame(symbol, timeframe)
+        return df[(df.index >= start) & (df.index <= end)]
+
+def set_local_timezone(name):
+    """Cambia la zona horaria local del proceso y retorna la anterior"""
+    previous = os.environ.get('TZ')
+    if name is None:
+        os.environ.pop('TZ', None)
+    else:
+        os.environ['TZ'] = name
+    time.tzset()
+    return previous
+
+class SyntheticStoreTestCase(unittest.TestCase):
+    """Base: un CandleStore en un directorio temporal que descarga de FakeMarketData"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.market = FakeMarketData()
+        self.original_fetch = candle_store.get_price_data
+        self.original_stores = dict(candle_store._default_stores)
+        candle_store.get_price_data = self.market
+        self.store = CandleStore(os.path.join(self.tmp.name, 'candles'))
+        candle_store._default_stores['kraken'] = self.store
+
+    def tearDown(self):
+        candle_store.get_price_data = self.original_fetch
+        candle_store._default_stores.clear()
+        candle_store._default_stores.update(self.original_stores)
+        self.tmp.cleanup()
+
+class TestCandleStore(SyntheticStoreTestCase):
+    def _expected(self, tf, start, end):
+        df = self.market.frame('BTC/USDT', tf)
+        return df[(df.index >= pd.Timestamp(start)) & (df.index <= pd.Timestamp(end))]
+
+    def test_tail_appends_without_rewriting(self):
+        """Una actualización solo descarga y escribe las velas nuevas al final del tramo"""
+        first = self.store.get_price_data('BTC/USDT', '1h', datetime(2024, 1, 1), datetime(2024, 2, 1))
+        segment_file = self.store._segment_path('BTC/USDT', '1h', self.store._read_segments('BTC/USDT', '1h')[0]['id'])
+        inode, head = os.stat(segment_file).st_ino, open(segment_file, 'rb').read()
+        self.market.requests.clear()
+
+        df = self.store.get_price_data('BTC/USDT', '1h', datetime(2024, 1, 1), datetime(2024, 2, 10))
+
+        pd.testing.assert_frame_equal(df, self._expected('1h', '2024-01-01', '2024-02-10'), check_freq=False)
+        self.assertEqual(len(self.market.requests), 1)
+        self.assertGreater(self.market.requests[0][1], first.index[-1])
+        segments = self.store._read_segments('BTC/USDT', '1h')
+        self.assertEqual(len(segments), 1)
+        self.assertEqual(os.stat(segment_file).st_ino, inode)
+        self.assertEqual(open(segment_file, 'rb').read()[:len(head)], head)
+
+        # Todo cubierto: sin descargas
+        self.market.requests.clear()
+        self.store.get_price_data('BTC/USDT', '1h', datetime(2024, 1, 5), datetime(2024, 2, 3))
+        self.assertEqual(self.market.requests, [])
+
+    def test_disjoint_ranges_are_kept(self):
+        """Un rango separado se guarda como otro tramo y el hueco se rellena al pedirlo"""
+        self.store.get_price_data('BTC/USDT', '1h', datetime(2024, 1, 1), datetime(2024, 1, 10))
+        self.store.get_price_data('BTC/USDT', '1h', datetime(2024, 3, 1), datetime(2024, 3, 10))
+        self.assertEqual(len(self.store._read_segments('BTC/USDT', '1h')), 2)
+
+        self.market.requests.clear()
+        df = self.store.get_price_data('BTC/USDT', '1h', datetime(2024, 1, 1), datetime(2024, 3, 10))
+
+        pd.testing.assert_frame_equal(df, self._expected('1h', '2024-01-01', '2024-03-10'), check_freq=False)
+        self.assertEqual(len(self.market.requests), 1)
+        self.assertGreater(self.market.requests[0][1], pd.Timestamp('2024-01-10'))
+        self.assertLess(self.market.requests[0][2], pd.Timestamp('2024-03-01'))
+
+    def test_chunks_cross_segments(self):
+        """iter_price_chunks recorre varios tramos en bloques de tamaño fijo sin huecos ni repeticiones"""
+        self.store.get_price_data('BTC/USDT', '15m', datetime(2024, 2, 1), datetime(2024, 2, 20))
+        self.store.get_price_data('BTC/USDT', '15m', datetime(2024, 1, 1), datetime(2024, 1, 15))
+
+        chunks = list(self.store.iter_price_chunks('BTC/USDT', '15m', datetime(2024, 1, 1), datetime(2024, 2, 20), chunk_size=500))
+
+        self.assertGreater(len(self.store._read_segments('BTC/USDT', '15m')), 1)
+        self.assertTrue(all(len(chunk) == 500 for chunk in chunks[:-1]))
+        pd.testing.assert_frame_equal(
+            pd.concat(chunks), self._expected('15m', '2024-01-01', '2024-02-20'), check_freq=False
+        )
+
+    def test_fetch_bounds_ignore_local_timezone(self):
+        """Con una zona horaria local al oeste de UTC se descargan y guardan todas las velas del rango"""
+        previous = set_local_timezone('America/Bogota')
+        try:
+            first = self.store.get_price_data('BTC/USDT', '1h', datetime(2024, 1, 1), datetime(2024, 1, 2))
+            extended = self.store.get_price_data('BTC/USDT', '1h', datetime(2024, 1, 1), datetime(2024, 1, 4))
+        finally:
+            set_local_timezone(previous)
+
+        pd.testing.assert_frame_equal(first, self._expected('1h', '2024-01-01', '2024-01-02'), check_freq=False)
+        pd.testing.assert_frame_equal(extended, self._expected('1h', '2024-01-01', '2024-01-04'), check_freq=False)
+        self.assertEqual(self.market.requests[0][1:], (pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-02')))
+
+    def test_fingerprint(self):
+        """La huella solo cambia si cambian las velas del rango"""
+        fingerprint = self.store.fingerprint('BTC/USDT', '4h', datetime(2024, 1, 1), datetime(2024, 2, 1))
+        self.assertEqual(fingerprint, self.store.fingerprint('BTC/USDT', '4h', datetime(2024, 1, 1), datetime(2024, 2, 1)))
+        self.assertNotEqual(fingerprint, self.store.fingerprint('BTC/USDT', '4h', datetime(2024, 1, 1), datetime(2024, 2, 2)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el motor de backtesting sobre un almacén de velas sintéticas
+"""
+
+import os
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import backtesting.engine as engine_module
+from backtesting.cache import SignalCache
+from backtesting.engine import BacktestEngine
+from backtesting.storage import load_stream
+from strategy.macd_strategy import SIGNAL_LOOKBACK
+from tests.test_candle_store import SyntheticStoreTestCase
+
+START, END = datetime(2024, 2, 1), datetime(2024, 4, 1)
+RISK = {'stop_loss_pct': 0.02, 'take_profit_pct': 0.03, 'trailing_stop_pct': 0.015, 'max_position_size': 0.9}
+METRICS = ('final_capital', 'total_trades', 'winning_trades', 'max_drawdown', 'sharpe_ratio', 'sortino_ratio')
+
+class TestStreamingEngine(SyntheticStoreTestCase):
+    def _stream(self, name, chunk_size, **kwargs):
+        output_dir = os.path.join(self.tmp.name, name)
+        engine = BacktestEngine(
+            'BTC/USDT', START, END, timeframes=['1h', '4h'], risk_config=RISK, use_signal_cache=False,
+            streaming=True, chunk_size=chunk_size, output_dir=output_dir, **kwargs
+        )
+        return engine.run(), output_dir
+
+    def test_chunk_boundaries(self):
+        """Bloques pequeños dan las mismas operaciones, capital y datos por vela que un solo bloque"""
+        small, small_dir = self._stream('small', 97)
+        whole, whole_dir = self._stream('whole', 100_000)
+
+        self.assertGreater(small['total_trades'], 0)
+        for key in ('final_capital', 'total_trades', 'winning_trades', 'max_drawdown', 'sharpe_ratio'):
+            self.assertAlmostEqual(small[key], whole[key], places=9, msg=key)
+        pd.testing.assert_frame_equal(small['trades'].to_frame(), whole['trades'].to_frame())
+
+        small_stream, whole_stream = load_stream(small_dir), load_stream(whole_dir)
+        pd.testing.assert_frame_equal(small_stream['equity'], whole_stream['equity'])
+        pd.testing.assert_frame_equal(small_stream['price_data'], whole_stream['price_data'])
+
+    def test_load_stream(self):
+        """load_stream reúne los bloques en una curva de capital continua desde start_date"""
+        results, output_dir = self._stream('stream', 250)
+        loaded = load_stream(output_dir)
+
+        self.assertGreater(len([name for name in os.listdir(output_dir) if name.startswith('part_')]), 1)
+        equity = loaded['equity']
+        self.assertTrue(equity.index.is_monotonic_increasing and equity.index.is_unique)
+        self.assertEqual(equity.index[0], pd.Timestamp(START))
+        self.assertAlmostEqual(equity['balance'].iloc[0], 1000.0)
+        self.assertAlmostEqual(equity['balance'].iloc[-1], results['final_capital'])
+        self.assertEqual(loaded['total_trades'], results['total_trades'])
+        price = loaded['price_data']
+        self.assertTrue(np.all(np.diff(price.index.asi8) > 0))
+        self.assertGreaterEqual(price.index[0], pd.Timestamp(START))
+
+    def test_resume_matches_uninterrupted(self):
+        """Un backtest cortado y retomado da lo mismo que uno ejecutado de una vez"""
+        output_dir = os.path.join(self.tmp.name, 'resume')
+        kwargs = dict(timeframes=['1h', '4h'], risk_config=RISK, use_signal_cache=False,
+                      streaming=True, chunk_size=300, output_dir=output_dir)
+        BacktestEngine('BTC/USDT', START, datetime(2024, 3, 1, 5), **kwargs).run()
+        resumed = BacktestEngine('BTC/USDT', START, END, resume=True, **kwargs).run()
+        whole, whole_dir = self._stream('whole', 300)
+
+        for key in METRICS:
+            self.assertAlmostEqual(resumed[key], whole[key], places=9, msg=key)
+        pd.testing.assert_frame_equal(resumed['trades'].to_frame(), whole['trades'].to_frame())
+        resumed_stream, whole_stream = load_stream(output_dir), load_stream(whole_dir)
+        pd.testing.assert_frame_equal(resumed_stream['equity'], whole_stream['equity'])
+        pd.testing.assert_frame_equal(resumed_stream['price_data'], whole_stream['price_data'])
+
+class TestEngineOptions(SyntheticStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.original_cache = engine_module.SignalCache
+        self.original_signals = engine_module.calculate_signal_series
+        self.computed = []
+
+        def counting_signals(df, timeframe):
+            self.computed.append(timeframe)
+            return self.original_signals(df, timeframe)
+
+        cache_dir = os.path.join(self.tmp.name, 'signals')
+        engine_module.SignalCache = lambda: SignalCache(cache_dir)
+        engine_module.calculate_signal_series = counting_signals
+
+    def tearDown(self):
+        engine_module.SignalCache = self.original_cache
+        engine_module.calculate_signal_series = self.original_signals
+        super().tearDown()
+
+    def _run(self, start=START, **kwargs):
+        kwargs.setdefault('use_signal_cache', False)
+        return BacktestEngine('BTC/USDT', start, END, timeframes=['1h', '4h'], risk_config=RISK, **kwargs).run()
+
+    def test_signal_cache_hit(self):
+        """Las señales recuperadas de caché dan exactamente las mismas operaciones"""
+        expected = self._run()
+        self.computed.clear()
+        cold = self._run(use_signal_cache=True)
+        self.assertEqual(self.computed, ['1h', '4h'])
+        self.computed.clear()
+        warm = self._run(use_signal_cache=True)
+        self.assertEqual(self.computed, [])
+
+        self.assertGreater(expected['total_trades'], 0)
+        for results in (cold, warm):
+            for key in METRICS:
+                self.assertEqual(results[key], expected[key], key)
+            pd.testing.assert_frame_equal(results['trades'].to_frame(), expected['trades'].to_frame())
+
+    def test_recording_levels(self):
+        """'summary', 'equity' y 'full' solo cambian lo registrado, no las métricas"""
+        full = self._run(recording='full')
+        self.assertEqual({'equity', 'price_data'} & set(full), {'equity', 'price_data'})
+        for level, tables in (('summary', set()), ('equity', {'equity'})):
+            results = self._run(recording=level)
+            self.assertEqual({'equity', 'price_data'} & set(results), tables, level)
+            for key in METRICS:
+                self.assertEqual(results[key], full[key], f"{level}: {key}")
+            pd.testing.assert_frame_equal(results['trades'].to_frame(), full['trades'].to_frame())
+        pd.testing.assert_frame_equal(self._run(recording='equity')['equity'], full['equity'])
+
+        # En streaming los tres niveles también dan las mismas métricas que en memoria
+        for level in ('summary', 'equity', 'full'):
+            streamed = self._run(recording=level, streaming=True, output_dir=os.path.join(self.tmp.name, level))
+            for key in METRICS:
+                self.assertAlmostEqual(streamed[key], full[key], places=9, msg=f"streaming {level}: {key}")
+
+    def test_warmup_first_signals(self):
+        """Con las velas de calentamiento las primeras señales son las de un histórico más largo"""
+        engine = BacktestEngine('BTC/USDT', START, END, timeframes=['1h', '4h'], risk_config=RISK, use_signal_cache=False)
+        longer = BacktestEngine('BTC/USDT', START - timedelta(days=60), END, timeframes=['1h', '4h'],
+                                risk_config=RISK, use_signal_cache=False)
+
+        series, longer_series = engine._signal_series(), longer._signal_series()
+        for tf in ('1h', '4h'):
+            self.assertGreaterEqual(engine.data[tf].index.searchsorted(pd.Timestamp(START)), SIGNAL_LOOKBACK)
+            first = series[tf].loc[START:].iloc[:100]
+            np.testing.assert_array_equal(first['signal'].to_numpy(), longer_series[tf].loc[first.index, 'signal'].to_numpy())
+
+        # La simulación empieza en start_date y ya puede operar en las primeras velas
+        results = engine.run()
+        self.assertEqual(results['equity'].index[0], pd.Timestamp(START))
+        self.assertEqual(results['price_data'].index[0], pd.Timestamp(START))
+        first_entry = pd.Timestamp(results['trades'].to_frame()['entry_time'].iloc[0])
+        first_signal = series['1h'].loc[START:].query('signal != 0').index[0]
+        self.assertEqual(first_entry, first_signal)
+
+if __name__ == '__main__':
+    unittest.main()
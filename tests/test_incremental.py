@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para las métricas incrementales
+"""
+
+import json
+import unittest
+import numpy as np
+from backtesting.incremental import PerformanceTracker, RollingWindow, RunningStats
+from backtesting.metrics import calculate_equity_metrics
+
+class TestIncrementalMetrics(unittest.TestCase):
+    def setUp(self):
+        """Preparar una curva de capital sintética"""
+        rng = np.random.default_rng(1)
+        self.equity = 1000 * np.cumprod(1 + rng.normal(0.0002, 0.01, 800))
+
+    def test_tracker_matches_batch_metrics(self):
+        """Vela a vela y por bloques se obtienen las mismas métricas que sobre la curva completa"""
+        expected = calculate_equity_metrics(np.concatenate([[1000.0], self.equity]), periods_per_year=2190)
+
+        per_bar = PerformanceTracker(1000.0, periods_per_year=2190)
+        for value in self.equity:
+            per_bar.update_equity(value)
+        per_block = PerformanceTracker(1000.0, periods_per_year=2190)
+        for block in np.array_split(self.equity, 9):
+            per_block.update_equity_many(block)
+
+        for tracker in (per_bar, per_block):
+            snapshot = tracker.snapshot()
+            self.assertAlmostEqual(snapshot['sharpe_ratio'], expected['sharpe_ratio'])
+            self.assertAlmostEqual(snapshot['sortino_ratio'], expected['sortino_ratio'])
+            self.assertAlmostEqual(snapshot['max_drawdown'], expected['max_drawdown'])
+            self.assertAlmostEqual(snapshot['total_return'], expected['total_return'])
+
+    def test_tracker_state_roundtrip(self):
+        """Un tracker restaurado desde to_dict continúa igual que el original"""
+        tracker = PerformanceTracker(1000.0, periods_per_year=2190, window=50)
+        tracker.update_equity_many(self.equity[:400])
+        tracker.record_trade(12.5)
+        restored = PerformanceTracker.from_dict(json.loads(json.dumps(tracker.to_dict())))
+        for t in (tracker, restored):
+            t.update_equity_many(self.equity[400:])
+        self.assertEqual(restored.snapshot(), tracker.snapshot())
+
+    def test_rolling_window(self):
+        """La ventana circular conserva los últimos valores y sus estadísticos"""
+        window = RollingWindow(50)
+        for value in self.equity[:120]:
+            window.update(value)
+        np.testing.assert_allclose(window.values(), self.equity[70:120])
+        self.assertAlmostEqual(window.mean, self.equity[70:120].mean())
+        self.assertAlmostEqual(window.std, self.equity[70:120].std(), places=6)
+
+    def test_running_stats_and_trades(self):
+        """Welford coincide con numpy y las operaciones se acumulan"""
+        stats = RunningStats()
+        stats.update_many(self.equity[:300])
+        for value in self.equity[300:]:
+            stats.update(value)
+        self.assertAlmostEqual(stats.mean, self.equity.mean())
+        self.assertAlmostEqual(stats.std, self.equity.std())
+
+        tracker = PerformanceTracker(1000.0)
+        for pnl in (10.0, -5.0, 20.0, 0.0):
+            tracker.record_trade(pnl)
+        snapshot = tracker.snapshot()
+        self.assertEqual(snapshot['total_trades'], 4)
+        self.assertAlmostEqual(snapshot['win_rate'], 50.0)
+        self.assertAlmostEqual(snapshot['profit_factor'], 6.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el canal de control local del demonio de trading
+"""
+
+import os
+import tempfile
+import unittest
+import requests
+from trading.ipc import ControlServer, TraderClient, DaemonError, load_token
+from utils import telemetry
+
+class FakeController:
+    def __init__(self):
+        self.traders = {}
+
+    def status(self):
+        return {'traders': {symbol: {'running': running} for symbol, running in self.traders.items()}}
+
+    def start(self, symbol):
+        self.traders[symbol] = True
+
+    def stop(self, symbol):
+        if symbol not in self.traders:
+            raise ValueError(f"No hay trader para {symbol}")
+        self.traders[symbol] = False
+
+    def set_trading(self, symbol, enabled):
+        raise RuntimeError("fallo interno")
+
+class TestControlChannel(unittest.TestCase):
+    def setUp(self):
+        self.server = ControlServer(FakeController(), port=0, token='secreto')
+        self.server.start()
+        self.client = TraderClient(port=self.server.port, token='secreto')
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def test_commands_and_status(self):
+        """Las órdenes del cliente llegan al controlador y devuelven el estado"""
+        self.assertTrue(self.client.is_alive())
+        self.assertEqual(self.client.start('BTC/USDT')['traders'], {'BTC/USDT': {'running': True}})
+        self.client.stop('BTC/USDT')
+        self.assertEqual(self.client.status()['traders'], {'BTC/USDT': {'running': False}})
+        self.assertIn('histograms', self.client.telemetry())
+
+    def test_metrics_endpoint(self):
+        """GET /metrics sirve el texto de Prometheus con el token"""
+        telemetry.counter('test_ipc_total', 'test').inc(2, result='ok')
+        response = requests.get(f"{self.client.url}/metrics", headers={'Authorization': 'Bearer secreto'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('trading_bot_test_ipc_total{result="ok"} 2', response.text)
+        self.assertEqual(requests.get(f"{self.client.url}/metrics").status_code, 401)
+
+    def test_errors(self):
+        """Los errores del controlador llegan al cliente como DaemonError"""
+        with self.assertRaisesRegex(DaemonError, 'No hay trader'):
+            self.client.stop('ETH/USDT')
+        with self.assertRaisesRegex(DaemonError, 'fallo interno'):
+            self.client.set_trading('BTC/USDT', True)
+
+    def test_token_required(self):
+        """Sin el token correcto el demonio rechaza lecturas y órdenes"""
+        with self.assertRaisesRegex(DaemonError, 'Token'):
+            TraderClient(port=self.server.port, token='otro').status()
+        with self.assertRaisesRegex(DaemonError, 'Token'):
+            TraderClient(port=self.server.port, token='otro').start('BTC/USDT')
+        self.assertEqual(self.client.status()['traders'], {})
+
+    def test_json_content_type_required(self):
+        """Un POST de formulario o texto (sin preflight de CORS) se rechaza"""
+        response = requests.post(
+            f"{self.client.url}/start", data='{"symbol": "BTC/USDT"}',
+            headers={'Authorization': 'Bearer secreto', 'Content-Type': 'text/plain'}
+        )
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.client.status()['traders'], {})
+
+    def test_generated_token(self):
+        """En una dirección local sin token se genera uno en el fichero, que lee el cliente"""
+        with tempfile.TemporaryDirectory() as tmp:
+            token_file = os.path.join(tmp, 'token')
+            server = ControlServer(FakeController(), port=0, token_file=token_file)
+            server.start()
+            try:
+                self.assertIsNotNone(load_token(token_file))
+                self.assertTrue(TraderClient(port=server.port, token_file=token_file).is_alive())
+                self.assertFalse(TraderClient(port=server.port, token_file=os.path.join(tmp, 'no')).is_alive())
+            finally:
+                server.shutdown()
+
+            with self.assertRaisesRegex(ValueError, 'token'):
+                ControlServer(FakeController(), host='0.0.0.0', port=0, token_file=os.path.join(tmp, 'no'))
+
+    def test_unreachable(self):
+        """Sin demonio is_alive() es False"""
+        self.server.shutdown()
+        self.assertFalse(TraderClient(port=self.server.port).is_alive())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el trader en vivo (con exchange, datos y notificador simulados)
+"""
+
+import asyncio
+import tempfile
+import time
+import unittest
+import numpy as np
+import pandas as pd
+import trading.live_trader as live_trader
+from trading.live_trader import LiveTrader
+from utils.telegram_notifications import SignalDigest
+from tests.test_candle_store import set_local_timezone
+
+FETCH_DELAY = 0.2
+
+def since_timestamp(start_date):
+    """Inicio pedido a get_price_data, convertido a ms igual que api_data (con datetime.timestamp())"""
+    return pd.Timestamp(int(start_date.timestamp() * 1000), unit='ms')
+
+def fake_price_data(symbol, timeframe, **kwargs):
+    """Velas sintéticas con una latencia de red simulada"""
+    time.sleep(FETCH_DELAY)
+    index = pd.date_range('2024-01-01', periods=120, freq='1h')
+    close = 100 + np.cumsum(np.random.default_rng(len(timeframe)).normal(0, 1, len(index)))
+    return pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 1.0}, index=index)
+
+class FakeNotifier:
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, message):
+        self.messages.append(message)
+
+    def send_error(self, error, context=''):
+        self.messages.append(f"{context}: {error}")
+
+    def digest(self, symbol):
+        return SignalDigest(symbol)
+
+    def send_digest(self, digest):
+        self.messages.append(digest)
+
+    def flush(self, timeout=None):
+        return True
+
+    def close(self, timeout=None):
+        pass
+
+class FakeExchange:
+    def fetch_ticker(self, symbol):
+        return {'last': 100.0}
+
+class SparseOrderExchange(FakeExchange):
+    """Exchange real simulado cuyas órdenes de mercado vuelven sin 'average' ni 'fee' (como hace ccxt a menudo)"""
+
+    def __init__(self, with_cost=True):
+        self.with_cost = with_cost
+        self.orders = {}
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        order_id = str(len(self.orders) + 1)
+        self.orders[order_id] = {
+            'id': order_id, 'status': 'closed', 'amount': amount, 'filled': amount,
+            'cost': amount * 100.0, 'average': None, 'fee': None, 'trades': []
+        }
+        return dict(self.orders[order_id], cost=amount * 100.0 if self.with_cost else None)
+
+    def fetch_order(self, id, symbol=None, params=None):
+        return dict(self.orders[id])
+
+class TestLiveTrader(unittest.TestCase):
+    def setUp(self):
+        self.original = live_trader.get_price_data
+        live_trader.get_price_data = fake_price_data
+        self.trader = LiveTrader(FakeExchange(), 'BTC/USDT')
+        self.trader.notifier = FakeNotifier()
+
+    def tearDown(self):
+        self.trader.stop()
+        live_trader.get_price_data = self.original
+
+    def test_concurrent_cycle_and_prompt_stop(self):
+        """Las temporalidades se descargan a la vez y stop() no espera al siguiente ciclo"""
+        started = time.time()
+        self.trader.start()
+        while not any(isinstance(m, SignalDigest) for m in self.trader.notifier.messages):
+            time.sleep(0.01)
+        time.sleep(FETCH_DELAY * 2)
+        self.trader.stop()
+
+        self.assertLess(time.time() - started, FETCH_DELAY * len(live_trader.TIMEFRAMES))
+        self.assertFalse(self.trader.trading_thread.is_alive())
+        messages = self.trader.notifier.messages
+        self.assertEqual((messages[0], messages[-1]), ("🟢 Trading Bot iniciado", "🔴 Trading Bot detenido"))
+        digest = next(m for m in messages if isinstance(m, SignalDigest))
+        self.assertEqual(len(digest.signals) + len(digest.errors), len(live_trader.TIMEFRAMES))
+        self.assertIsNotNone(digest.summary)
+
+    def test_tail_fetch(self):
+        """Tras llenar la ventana solo se piden las velas posteriores a la última guardada"""
+        self._check_tail_fetch()
+
+    def test_tail_fetch_west_of_utc(self):
+        """La ventana avanza igual con una zona horaria local al oeste de UTC"""
+        previous = set_local_timezone('America/Bogota')
+        try:
+            self._check_tail_fetch()
+        finally:
+            set_local_timezone(previous)
+
+    def _check_tail_fetch(self):
+        calls = []
+        index = pd.date_range('2024-01-01', periods=600, freq='1h')
+        candles = pd.DataFrame({column: np.arange(600.0) for column in ['open', 'high', 'low', 'close', 'volume']}, index=index)
+
+        def recorded(symbol, timeframe, start_date=None, **kwargs):
+            calls.append(since_timestamp(start_date))
+            return candles[candles.index >= calls[-1]]
+
+        live_trader.get_price_data = recorded
+        now_ms = int(index[-1].value // 1_000_000) + 30 * 60_000
+        buffer = self.trader._fetch_candles('1h', now_ms)
+        self.assertEqual(calls[0], index[-2] - (live_trader.CANDLE_WINDOW - 1) * pd.Timedelta('1h'))
+        self.assertEqual(len(buffer), live_trader.CANDLE_WINDOW)
+        self.assertEqual(buffer.frame().index[-1], index[-2])
+
+        buffer = self.trader._fetch_candles('1h', now_ms + 60 * 60_000)
+        self.assertEqual(calls[-1], index[-1])
+        self.assertEqual(buffer.frame().index[-1], index[-1])
+        self.assertEqual(len(buffer), live_trader.CANDLE_WINDOW)
+
+        # Sin vela nueva cerrada no hay descarga
+        self.trader._fetch_candles('1h', now_ms + 60 * 60_000)
+        self.assertEqual(len(calls), 2)
+
+    def test_orders_fill_on_paper_exchange(self):
+        """Las decisiones se ejecutan como órdenes en el exchange simulado y se mide la latencia"""
+        self.trader.trading_enabled = True
+
+        async def trade():
+            await self.trader._execute_trade('buy', time.perf_counter())
+            await self.trader._execute_trade('buy', time.perf_counter())
+            await self.trader._execute_trade('sell', time.perf_counter())
+
+        asyncio.run(trade())
+        trades = self.trader.exchange.fetch_my_trades('BTC/USDT')
+        self.assertEqual([trade['side'] for trade in trades], ['buy', 'sell'])
+        self.assertIsNone(self.trader.current_position)
+        self.assertEqual(len(self.trader.fill_latencies), 2)
+        self.assertEqual(self.trader.performance.total_trades, 1)
+        # Precio constante: el P&L son el spread y las comisiones
+        self.assertLess(self.trader.capital, 1000.0)
+        self.assertAlmostEqual(self.trader.exchange.fetch_balance()['total']['USDT'], self.trader.capital)
+
+    def test_orders_without_fee_or_average(self):
+        """Sin 'fee' ni 'average' el precio sale de cost / filled (o de fetch_order) y la comisión es 0"""
+        for with_cost in (True, False):
+            trader = LiveTrader(SparseOrderExchange(with_cost), 'BTC/USDT', paper=False)
+            trader.notifier = FakeNotifier()
+            trader.trading_enabled = True
+
+            async def trade():
+                await trader._execute_trade('buy', time.perf_counter())
+                position = trader.current_position
+                await trader._execute_trade('sell', time.perf_counter())
+                return position
+
+            position = asyncio.run(trade())
+            self.assertEqual((position['entry_price'], position['entry_fee']), (100.0, 0.0))
+            self.assertAlmostEqual(position['size'], 1000.0 * live_trader.DEFAULT_RISK_CONFIG['max_position_size'] / 100.0)
+            self.assertIsNone(trader.current_position)
+            self.assertEqual(trader.capital, 1000.0)
+            self.assertEqual(trader.performance.total_trades, 1)
+            self.assertFalse(any('Error' in str(message) for message in trader.notifier.messages))
+
+    def test_warm_restart(self):
+        """Un trader nuevo en el mismo directorio retoma posición, saldos y velas sin descargar"""
+        calls = []
+        index = pd.date_range('2024-01-01', periods=600, freq='1h')
+        candles = pd.DataFrame({column: 100 + np.arange(600.0) for column in ['open', 'high', 'low', 'close', 'volume']}, index=index)
+
+        def recorded(symbol, timeframe, start_date=None, **kwargs):
+            calls.append(timeframe)
+            return candles[candles.index >= since_timestamp(start_date)]
+
+        live_trader.get_price_data = recorded
+        now_ms = int(index[-1].value // 1_000_000) + 30 * 60_000
+        with tempfile.TemporaryDirectory() as state_dir:
+            trader = LiveTrader(FakeExchange(), 'BTC/USDT', state_dir=state_dir)
+            trader.notifier = FakeNotifier()
+            trader._fetch_candles('1h', now_ms - 60 * 60_000)
+            trader.save_state()
+            # Eventos posteriores a la instantánea: solo en el diario
+            trader._fetch_candles('1h', now_ms)
+            trader.enable_trading()
+            asyncio.run(trader._execute_trade('buy', time.perf_counter()))
+            trader.store.close()
+
+            started = time.perf_counter()
+            restored = LiveTrader(FakeExchange(), 'BTC/USDT', state_dir=state_dir)
+            self.assertLess(time.perf_counter() - started, 1.0)
+
+            np.testing.assert_array_equal(restored.candles['1h'].records(), trader.candles['1h'].records())
+            self.assertEqual(restored.current_position, trader.current_position)
+            self.assertTrue(restored.trading_enabled)
+            self.assertEqual(restored.exchange.fetch_balance()['total'], trader.exchange.fetch_balance()['total'])
+            self.assertEqual(restored.exchange.fetch_my_trades(), trader.exchange.fetch_my_trades())
+
+            # El diario de la operación solo lleva la orden nueva, no el estado completo del exchange
+            _, _, events = restored.store.load()
+            fill = [event for event in events if event['type'] == 'trade'][0]['fill']
+            self.assertEqual(set(fill), {'free', 'used', 'order', 'trades', 'reserved', 'next_id'})
+            self.assertEqual(fill['order']['side'], 'buy')
+
+            restored._fetch_candles('1h', now_ms)
+            self.assertEqual(len(calls), 2)
+            restored.store.close()
+
+if __name__ == '__main__':
+    unittest.main()
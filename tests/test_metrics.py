@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para las métricas de rendimiento
+"""
+
+import unittest
+import numpy as np
+from backtesting.metrics import (
+    calculate_equity_metrics, calculate_max_drawdown, calculate_profit_factor,
+    calculate_sharpe_ratio, calculate_sortino_ratio, calculate_equity_sharpe_ratio
+)
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        """Preparar curvas de capital sintéticas (ejecuciones x velas)"""
+        rng = np.random.default_rng(0)
+        self.equity = 1000 * np.cumprod(1 + rng.normal(0.0005, 0.02, (20, 300)), axis=1)
+
+    def test_batch_matches_single_run(self):
+        """Evaluar una matriz da lo mismo que evaluar cada curva por separado"""
+        batch = calculate_equity_metrics(self.equity, periods_per_year=2190)
+        for i in (0, 7, 19):
+            single = calculate_equity_metrics(self.equity[i], periods_per_year=2190)
+            for name, value in single.items():
+                self.assertAlmostEqual(batch[name][i], value)
+
+    def test_max_drawdown_matches_loop(self):
+        """El drawdown vectorizado coincide con el cálculo vela a vela"""
+        curve = self.equity[3]
+        peak, expected = curve[0], 0.0
+        for value in curve:
+            peak = max(peak, value)
+            expected = max(expected, (peak - value) / peak)
+        self.assertAlmostEqual(calculate_max_drawdown(curve), expected)
+
+    def test_profit_factor(self):
+        """Factor de beneficio con lista de operaciones y por ejecución"""
+        self.assertAlmostEqual(calculate_profit_factor([{'pnl': 6.0}, {'pnl': -2.0}]), 3.0)
+        np.testing.assert_array_equal(calculate_profit_factor(np.array([[1.0, -1.0], [2.0, 0.0]])), [1.0, np.inf])
+
+    def test_trade_ratios(self):
+        """Sharpe y Sortino conservan la llamada con operaciones (trades, risk_free_rate)"""
+        trades = [{'pnl': 6.0}, {'pnl': -2.0}, {'pnl': 1.0}, {'pnl': -1.0}]
+        returns = np.array([6.0, -2.0, 1.0, -1.0])
+        daily_rf = 1.02 ** (1 / 365) - 1
+        self.assertAlmostEqual(calculate_sharpe_ratio(trades), (returns.mean() - daily_rf) / returns.std() * np.sqrt(365))
+        self.assertAlmostEqual(
+            calculate_sortino_ratio(trades, 0.0), returns.mean() / returns[returns < 0].std() * np.sqrt(365)
+        )
+        self.assertEqual(calculate_sharpe_ratio([]), 0.0)
+        self.assertEqual(calculate_sortino_ratio([{'pnl': 1.0}, {'pnl': 2.0}]), float('inf'))
+
+        # La versión sobre la curva de capital por vela tiene su propio nombre
+        self.assertAlmostEqual(
+            calculate_equity_sharpe_ratio(self.equity[0], periods_per_year=2190),
+            calculate_equity_metrics(self.equity[0], periods_per_year=2190)['sharpe_ratio']
+        )
+
+if __name__ == '__main__':
+    unittest.main()
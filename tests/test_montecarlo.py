@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el análisis Monte Carlo
+"""
+
+import unittest
+import time
+import numpy as np
+from backtesting.montecarlo import run_monte_carlo, simulate_trade_sequences
+
+class TestMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        """Preparar operaciones sintéticas"""
+        rng = np.random.default_rng(42)
+        self.pnl = rng.normal(5, 50, 200)
+        self.trades = [{'pnl': p} for p in self.pnl]
+
+    def test_shuffle_preserves_final_equity(self):
+        """Permutar el orden no cambia el capital final"""
+        results = run_monte_carlo(self.trades, 1000.0, n_simulations=500, method='shuffle', seed=1)
+        expected = 1000.0 + self.pnl.sum()
+        np.testing.assert_allclose(results['final_equity'], expected)
+
+    def test_bootstrap_matrix_shape(self):
+        """El bootstrap genera una matriz (simulaciones x operaciones) con valores originales"""
+        sequences = simulate_trade_sequences(self.pnl, n_simulations=300, method='bootstrap', seed=1)
+        self.assertEqual(sequences.shape, (300, len(self.pnl)))
+        self.assertTrue(np.isin(sequences, self.pnl).all())
+
+    def test_max_drawdown_matches_single_path(self):
+        """El drawdown de cada trayectoria coincide con el cálculo directo"""
+        results = run_monte_carlo(self.pnl, 1000.0, n_simulations=3, method='shuffle', seed=7)
+        sequences = simulate_trade_sequences(self.pnl, n_simulations=3, method='shuffle', seed=7)
+        for row, dd in zip(sequences, results['max_drawdown']):
+            equity = np.concatenate([[1000.0], 1000.0 + np.cumsum(row)])
+            peak = np.maximum.accumulate(equity)
+            self.assertAlmostEqual(dd, ((peak - equity) / peak).max() * 100)
+
+    def test_risk_of_ruin_bounds(self):
+        """Una secuencia solo de pérdidas termina siempre en ruina"""
+        results = run_monte_carlo(-np.abs(self.pnl), 1000.0, n_simulations=200, ruin_threshold=0.5, seed=3)
+        self.assertEqual(results['risk_of_ruin'], 100.0)
+
+    def test_performance(self):
+        """10k trayectorias deben calcularse en menos de un segundo"""
+        start = time.perf_counter()
+        run_monte_carlo(self.pnl, 1000.0, n_simulations=10000, seed=0)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_empty_trades(self):
+        """Sin operaciones no hay simulaciones"""
+        results = run_monte_carlo([], 1000.0)
+        self.assertEqual(results['n_trades'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el trader multi-par, el demonio y el limitador de peticiones
+"""
+
+import asyncio
+import tempfile
+import time
+import unittest
+import numpy as np
+import pandas as pd
+import trading.live_trader as live_trader
+from trading.multi_symbol_trader import MultiSymbolTrader
+from trading.rate_limiter import AsyncRateLimiter
+from trader_daemon import TraderDaemon
+from tests.test_live_trader import FakeExchange, FakeNotifier
+
+SYMBOLS = [f"C{i}/USDT" for i in range(20)]
+
+class TestMultiSymbolTrader(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.original = live_trader.get_price_data
+
+        def fake_price_data(symbol, timeframe, client=None, **kwargs):
+            self.calls.append((symbol, timeframe, client))
+            index = pd.date_range('2024-01-01', periods=120, freq='1h')
+            close = 100 + np.cumsum(np.random.default_rng(len(symbol)).normal(0, 1, len(index)))
+            return pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 1.0}, index=index)
+
+        live_trader.get_price_data = fake_price_data
+        self.trader = MultiSymbolTrader(FakeExchange(), SYMBOLS, rate=1000, max_concurrent=4)
+        self.trader.notifier = FakeNotifier()
+        for trader in self.trader.traders.values():
+            trader.notifier = self.trader.notifier
+
+    def tearDown(self):
+        live_trader.get_price_data = self.original
+
+    def test_shared_components_and_batched_cycle(self):
+        """Un cierre evalúa todos los pares con el mismo cliente, limitador y planificador"""
+        traders = list(self.trader.traders.values())
+        self.assertEqual({id(t.exchange) for t in traders}, {id(self.trader.exchange)})
+        self.assertEqual({id(t.scheduler) for t in traders}, {id(self.trader.scheduler)})
+        self.assertEqual({id(t.rate_limiter) for t in traders}, {id(self.trader.rate_limiter)})
+        self.assertAlmostEqual(self.trader.exchange.fetch_balance()['free']['USDT'], 1000.0)
+
+        now_ms = int(pd.Timestamp('2024-01-06').value // 1_000_000)
+        asyncio.run(self.trader._analyze_market(['1h', '4h'], now_ms))
+
+        self.assertEqual(len(self.calls), len(SYMBOLS) * 2)
+        self.assertEqual({call[2] for call in self.calls}, {self.trader.data_client})
+        self.assertEqual(self.trader.rate_limiter.requests, len(SYMBOLS) * 2)
+        self.assertTrue(all(len(t.candles['1h']) > 0 and len(t.candles['1d']) == 0 for t in traders))
+
+    def test_restart_replays_fills(self):
+        """El exchange común se retoma de la instantánea más los cambios de las órdenes del diario"""
+        with tempfile.TemporaryDirectory() as state_dir:
+            trader = MultiSymbolTrader(FakeExchange(), SYMBOLS[:2], rate=1000, state_dir=state_dir)
+            for pair in trader.traders.values():
+                pair.notifier = FakeNotifier()
+                pair.trading_enabled = True
+
+            async def trade():
+                await trader._execute_order(SYMBOLS[0], 'buy', time.perf_counter())
+                trader._finish_run()
+                await trader._execute_order(SYMBOLS[1], 'buy', time.perf_counter())
+                # Sin orden (ya hay posición abierta) no se añade nada al diario
+                await trader._execute_order(SYMBOLS[1], 'buy', time.perf_counter())
+                await trader._execute_order(SYMBOLS[0], 'sell', time.perf_counter())
+                await trader._execute_order(SYMBOLS[1], 'sell', time.perf_counter())
+
+            asyncio.run(trade())
+            trader.store.close()
+            _, _, events = trader.store.load()
+            self.assertEqual([event['type'] for event in events], ['fill', 'fill', 'fill'])
+
+            restored = MultiSymbolTrader(FakeExchange(), SYMBOLS[:2], rate=1000, state_dir=state_dir)
+            expected, actual = trader.exchange.to_dict(), restored.exchange.to_dict()
+            for key in ('free', 'used', 'orders', 'trades', 'reserved', 'next_id'):
+                self.assertEqual(actual[key], expected[key], key)
+            for pair in list(trader.traders.values()) + list(restored.traders.values()):
+                pair.store.close()
+            restored.store.close()
+
+    def test_daemon_shares_loop_and_components(self):
+        """Los pares del demonio corren en un solo bucle con limitador, planificador y notificador comunes"""
+        with tempfile.TemporaryDirectory() as state_dir:
+            daemon = TraderDaemon(FakeExchange(), state_dir=state_dir, notifier=FakeNotifier())
+            try:
+                for symbol in SYMBOLS[:3]:
+                    daemon.start(symbol)
+                traders = list(daemon.traders.values())
+                deadline = time.time() + 5
+                while len({call[0] for call in self.calls}) < 3 and time.time() < deadline:
+                    time.sleep(0.01)
+
+                self.assertTrue(all(t.is_running and t.trading_thread is None for t in traders))
+                self.assertEqual({id(t.rate_limiter) for t in traders}, {id(daemon.rate_limiter)})
+                self.assertEqual({id(t.scheduler) for t in traders}, {id(daemon.scheduler)})
+                self.assertEqual({id(t.notifier) for t in traders}, {id(daemon.notifier)})
+                self.assertEqual({call[2] for call in self.calls}, {daemon.data_client})
+                self.assertIs(daemon.rate_limiter._loop, daemon.loop)
+
+                daemon.stop(SYMBOLS[0])
+                self.assertFalse(daemon.traders[SYMBOLS[0]].is_running)
+                self.assertTrue(daemon.traders[SYMBOLS[1]].is_running)
+            finally:
+                daemon.shutdown()
+            self.assertFalse(any(t.is_running for t in traders))
+
+    def test_daemon_paper_without_credentials(self):
+        """En paper el demonio usa un cliente público de Binance; en real sigue exigiendo credenciales"""
+        with tempfile.TemporaryDirectory() as state_dir:
+            for paper in (True, False):
+                daemon = TraderDaemon(paper=paper, state_dir=state_dir, notifier=FakeNotifier())
+                daemon.api_key = daemon.api_secret = ''
+                try:
+                    if paper:
+                        client = daemon._client()
+                        self.assertEqual(client.id, 'binance')
+                        self.assertFalse(client.apiKey)
+                    else:
+                        with self.assertRaises(ValueError):
+                            daemon._client()
+                finally:
+                    daemon.shutdown()
+
+    def test_rate_limiter_spacing(self):
+        """El limitador separa las peticiones 1/rate segundos y limita la concurrencia"""
+        limiter = AsyncRateLimiter(rate=50, max_concurrent=2)
+        active, peak = [0], [0]
+
+        def request():
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            active[0] -= 1
+
+        async def main():
+            started = time.monotonic()
+            await asyncio.gather(*(limiter.call(request) for _ in range(10)))
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(main()), 9 / 50 - 0.01)
+        self.assertLessEqual(peak[0], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el exchange simulado de paper trading
+"""
+
+import unittest
+import ccxt
+import pandas as pd
+from trading.paper_exchange import PaperExchange
+
+class TestPaperExchange(unittest.TestCase):
+    def setUp(self):
+        self.exchange = PaperExchange({'USDT': 1000.0}, fee_rate=0.001, spread_bps=0.0, clock=lambda: 0)
+        self.exchange.process_candle('BTC/USDT', 0, 100.0, 101.0, 99.0, 100.0)
+
+    def test_market_order_fills_at_last_price(self):
+        """Una compra de mercado se ejecuta al momento y liquida importe y comisión"""
+        order = self.exchange.create_order('BTC/USDT', 'market', 'buy', 2.0)
+        self.assertEqual((order['status'], order['average'], order['filled']), ('closed', 100.0, 2.0))
+        balance = self.exchange.fetch_balance()
+        self.assertAlmostEqual(balance['USDT']['free'], 1000.0 - 200.0 - 0.2)
+        self.assertEqual(balance['total']['BTC'], 2.0)
+        self.assertEqual(len(self.exchange.fetch_my_trades('BTC/USDT')), 1)
+
+    def test_limit_order_rests_and_fills_on_replay(self):
+        """Una orden límite reserva saldo y se ejecuta cuando una vela alcanza el precio"""
+        order = self.exchange.create_order('BTC/USDT', 'limit', 'buy', 1.0, 95.0)
+        self.assertEqual(order['status'], 'open')
+        self.assertEqual(len(self.exchange.fetch_open_orders('BTC/USDT')), 1)
+        self.assertAlmostEqual(self.exchange.fetch_balance()['used']['USDT'], 95.0 * 1.001)
+
+        candles = pd.DataFrame(
+            {'open': [99.0, 94.0], 'high': [100.0, 96.0], 'low': [96.0, 93.0], 'close': [97.0, 95.5]},
+            index=pd.to_datetime([60_000, 120_000], unit='ms')
+        )
+        filled = self.exchange.replay('BTC/USDT', candles)
+        # La segunda vela abre por debajo del límite: se ejecuta a la apertura
+        self.assertEqual([(o['id'], o['average'], o['lastTradeTimestamp']) for o in filled], [(order['id'], 94.0, 120_000)])
+        self.assertEqual(self.exchange.fetch_open_orders(), [])
+        self.assertAlmostEqual(self.exchange.fetch_balance()['used']['USDT'], 0.0)
+
+    def test_cancel_and_insufficient_funds(self):
+        """Cancelar libera el saldo reservado; sin saldo la orden se rechaza"""
+        order = self.exchange.create_order('BTC/USDT', 'limit', 'buy', 5.0, 90.0)
+        with self.assertRaises(ccxt.InsufficientFunds):
+            self.exchange.create_order('BTC/USDT', 'market', 'buy', 6.0)
+        self.assertEqual(self.exchange.cancel_order(order['id'])['status'], 'canceled')
+        self.assertEqual(self.exchange.fetch_balance()['free']['USDT'], 1000.0)
+        with self.assertRaises(ccxt.OrderNotFound):
+            self.exchange.cancel_order(order['id'])
+        with self.assertRaises(ccxt.InsufficientFunds):
+            self.exchange.create_order('BTC/USDT', 'market', 'sell', 1.0)
+
+    def test_fill_deltas_rebuild_state(self):
+        """Aplicar los cambios de cada orden sobre el estado inicial reproduce el estado final"""
+        initial = self.exchange.to_dict()
+        orders = [
+            self.exchange.create_order('BTC/USDT', 'market', 'buy', 2.0),
+            self.exchange.create_order('BTC/USDT', 'limit', 'buy', 1.0, 95.0),
+            self.exchange.create_order('BTC/USDT', 'market', 'sell', 1.5)
+        ]
+        deltas = [self.exchange.fill_delta(order['id']) for order in orders]
+
+        restored = PaperExchange(fee_rate=0.001, spread_bps=0.0, clock=lambda: 0)
+        restored.restore(initial)
+        for delta in deltas:
+            restored.apply_fill(delta)
+        # Aplicar dos veces el mismo cambio no duplica ejecuciones
+        restored.apply_fill(deltas[-1])
+
+        self.assertEqual(restored.to_dict(), self.exchange.to_dict())
+        self.assertEqual(deltas[1]['reserved'], ['USDT', 95.0 * 1.001])
+        self.assertEqual(len(deltas[1]['trades']), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el backtesting de cartera con capital compartido
+"""
+
+import unittest
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from backtesting.engine import BacktestEngine
+from backtesting.portfolio import PortfolioBacktestEngine
+from tests.test_candle_store import SyntheticStoreTestCase
+
+START, END = datetime(2024, 2, 1), datetime(2024, 4, 1)
+RISK = {'stop_loss_pct': 0.02, 'take_profit_pct': 0.03, 'trailing_stop_pct': 0.015, 'max_position_size': 0.9}
+
+class TestPortfolioBacktest(SyntheticStoreTestCase):
+    def test_aligned_matrices(self):
+        """Precios y señales se alinean en el índice común; un hueco de un símbolo no opera"""
+        eth = self.market.frame('ETH/USDT', '1h')
+        missing = eth.index[(eth.index >= '2024-02-10') & (eth.index < '2024-02-11')]
+        self.market.frames['ETH/USDT', '1h'] = eth.drop(missing)
+
+        engine = PortfolioBacktestEngine(['BTC/USDT', 'ETH/USDT'], START, END, timeframes=['1h', '4h'], risk_config=RISK)
+
+        self.assertEqual(engine.close.shape, (len(engine.index), 2))
+        self.assertEqual(engine.index[0], pd.Timestamp(START))
+        btc = self.market.frame('BTC/USDT', '1h')
+        np.testing.assert_array_equal(engine.close[:, 0], btc['close'].reindex(engine.index).to_numpy())
+        gap = engine.index.isin(missing)
+        self.assertEqual(gap.sum(), len(missing))
+        self.assertTrue(np.isnan(engine.close[gap, 1]).all() and not engine.has_bar[gap, 1].any())
+        self.assertTrue((engine.entry_signal[gap, 1] == 0).all())
+        self.assertTrue(engine.has_bar[:, 0].all())
+
+    def test_capital_allocation(self):
+        """Las entradas simultáneas se reparten el capital libre y una salida lo libera"""
+        engine = PortfolioBacktestEngine(
+            ['BTC/USDT', 'ETH/USDT', 'SOL/USDT'], START, END, timeframes=['1h'],
+            risk_config={'stop_loss_pct': 0.5, 'take_profit_pct': 0.1, 'trailing_stop_pct': 0.5, 'max_position_size': 0.5}
+        )
+        engine.index = pd.date_range(START, periods=4, freq='1h')
+        engine.close = np.array([
+            [100.0, 50.0, 20.0],
+            [100.0, 51.0, 21.0],
+            [112.0, 51.0, 20.0],
+            [112.0, 51.0, 21.0]
+        ])
+        engine.has_bar = np.ones_like(engine.close, dtype=bool)
+        engine.entry_signal = np.zeros(engine.close.shape, dtype=np.int8)
+        engine.entry_signal[0] = 1
+        engine.entry_signal[2:, 2] = 1
+
+        results = engine.run()
+
+        # Barra 0: BTC 500 (5 uds) y ETH los 500 restantes (10 uds); SOL no tiene capital
+        # Barra 2: BTC sale por take profit (+60) y SOL entra con min(1060 * 0.5, 560) = 530 (26.5 uds)
+        trades = results['trades']
+        self.assertEqual(len(trades), 1)
+        self.assertEqual((trades[0]['symbol'], trades[0]['exit_reason']), ('BTC/USDT', 'take_profit'))
+        self.assertAlmostEqual(trades[0]['size'], 5.0)
+        self.assertAlmostEqual(trades[0]['pnl'], 60.0)
+        self.assertEqual(results['per_symbol']['SOL/USDT']['total_trades'], 0)
+        np.testing.assert_allclose(results['equity']['equity'].to_numpy(), [1000.0, 1010.0, 1070.0, 1096.5])
+        np.testing.assert_allclose(results['symbol_pnl'].iloc[-1].to_numpy(), [60.0, 10.0, 26.5])
+
+    def test_single_symbol_parity(self):
+        """Con un solo símbolo las operaciones coinciden con BacktestEngine"""
+        portfolio = PortfolioBacktestEngine(['BTC/USDT'], START, END, timeframes=['1h', '4h'], risk_config=RISK).run()
+        single = BacktestEngine(
+            'BTC/USDT', START, END, timeframes=['1h', '4h'], risk_config=RISK, use_signal_cache=False
+        ).run()
+
+        expected = single['trades'].to_frame()
+        actual = pd.DataFrame(portfolio['trades'])
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(len(actual), len(expected))
+        for column in ('type', 'exit_reason'):
+            self.assertEqual(list(actual[column]), list(expected[column]), column)
+        for column in ('entry_time', 'exit_time'):
+            self.assertEqual(list(pd.to_datetime(actual[column])), list(pd.to_datetime(expected[column])), column)
+        for column in ('entry_price', 'exit_price', 'size', 'pnl'):
+            np.testing.assert_allclose(actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float), err_msg=column)
+        realized = portfolio['initial_capital'] + actual['pnl'].sum()
+        self.assertAlmostEqual(realized, single['final_capital'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el libro de posiciones
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from risk_management.position_book import PositionBook
+from risk_management.position_manager import PositionManager, EXIT_REASON_NAMES
+
+class TestPositionBook(unittest.TestCase):
+    def setUp(self):
+        """Preparar trayectorias de precios por símbolo"""
+        rng = np.random.default_rng(3)
+        self.symbols = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+        self.prices = 100 * np.cumprod(1 + rng.normal(0, 0.006, (300, len(self.symbols))), axis=0)
+        self.config = {'stop_loss_pct': 0.02, 'take_profit_pct': 0.03, 'trailing_stop_pct': 0.01}
+
+    def test_exits_match_position_manager(self):
+        """Cada posición del libro sale en la misma vela y por el mismo motivo que con PositionManager"""
+        book = PositionBook(self.symbols, self.config, capacity=2)
+        managers, expected = [], []
+        for k in range(12):
+            j, side = k % len(self.symbols), 'long' if k % 2 == 0 else 'short'
+            book.open(j, side, self.prices[0, j], pd.Timestamp('2024-01-01'), size=1.0)
+            manager = PositionManager(self.config)
+            manager.open_position(side, self.prices[0, j], pd.Timestamp('2024-01-01'), capital=1000.0)
+            managers.append((j, manager))
+            expected.append(None)
+
+        results = [None] * len(managers)
+        for i in range(1, len(self.prices)):
+            for k, (j, manager) in enumerate(managers):
+                if expected[k] is None:
+                    should_exit, reason, _ = manager.check_exit_signals(self.prices[i, j])
+                    if should_exit:
+                        expected[k] = (i, reason)
+            slots, reasons = book.check_exits(self.prices[i])
+            for slot, reason in zip(slots, reasons):
+                results[slot] = (i, EXIT_REASON_NAMES[int(reason)])
+            book.close(slots, self.prices[i, book.symbol[slots]], pd.Timestamp('2024-01-01'), reasons)
+
+        self.assertEqual(results, expected)
+        self.assertEqual(len(book.open_slots()), 0)
+
+    def test_unrealized_and_close(self):
+        """El P&L latente por símbolo y el de cierre siguen el lado de cada posición"""
+        book = PositionBook(self.symbols, self.config)
+        book.open(0, 'long', 100.0, pd.Timestamp('2024-01-01'), size=2.0)
+        book.open(0, 'long', 110.0, pd.Timestamp('2024-01-02'), size=1.0)
+        book.open(1, 'short', 50.0, pd.Timestamp('2024-01-01'), size=4.0)
+
+        prices = np.array([105.0, 45.0, np.nan])
+        np.testing.assert_allclose(book.unrealized_by_symbol(prices), [10.0 - 5.0, 20.0, 0.0])
+        np.testing.assert_array_equal(book.count_by_symbol(), [2, 1, 0])
+
+        trades = book.close(book.open_slots(0), [105.0, 105.0], pd.Timestamp('2024-01-03'), [0, 0])
+        self.assertEqual([t['pnl'] for t in trades], [10.0, -5.0])
+        self.assertEqual(trades[0]['symbol'], 'BTC/USDT')
+        np.testing.assert_array_equal(book.count_by_symbol(), [0, 1, 0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el gestor de posiciones
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from risk_management.position_manager import PositionManager
+
+class TestPositionManager(unittest.TestCase):
+    def setUp(self):
+        """Preparar trayectorias de precios sintéticas"""
+        rng = np.random.default_rng(5)
+        self.paths = 100 * np.cumprod(1 + rng.normal(0, 0.004, (40, 200)), axis=1)
+        self.config = {'stop_loss_pct': 0.02, 'take_profit_pct': 0.03, 'trailing_stop_pct': 0.01}
+
+    def _open(self, position_type, entry_price):
+        manager = PositionManager(self.config)
+        manager.open_position(position_type, entry_price, pd.Timestamp('2024-01-01'), capital=1000.0)
+        return manager
+
+    def test_first_exit_matches_bar_loop(self):
+        """La búsqueda vectorizada da la misma vela, razón y estado que check_exit_signals"""
+        for k, path in enumerate(self.paths):
+            position_type = 'long' if k % 2 == 0 else 'short'
+            loop = self._open(position_type, path[0])
+            expected = (None, None, None)
+            for i, price in enumerate(path[1:]):
+                should_exit, reason, exit_price = loop.check_exit_signals(price)
+                if should_exit:
+                    expected = (i, reason, exit_price)
+                    break
+
+            scan = self._open(position_type, path[0])
+            self.assertEqual(scan.find_first_exit(path[1:]), expected)
+            self.assertEqual(scan.current_position['trailing_stop'], loop.current_position['trailing_stop'])
+
+    def test_first_exit_in_pieces(self):
+        """Buscar por tramos conserva el trailing stop entre llamadas"""
+        path = self.paths[1]
+        whole = self._open('long', path[0]).find_first_exit(path[1:])
+        pieces = self._open('long', path[0])
+        first = pieces.find_first_exit(path[1:whole[0]])
+        self.assertEqual(first, (None, None, None))
+        offset, reason, _ = pieces.find_first_exit(path[whole[0]:])
+        self.assertEqual((offset + whole[0] - 1, reason), whole[:2])
+
+    def test_first_exit_with_high_low(self):
+        """Con máximos y mínimos el nivel se alcanza dentro de la vela"""
+        manager = self._open('long', 100.0)
+        closes = np.array([100.5, 101.0, 100.0])
+        highs = closes + 0.2
+        lows = np.array([100.3, 97.5, 99.8])
+        index, reason, price = manager.find_first_exit(closes, highs, lows)
+        self.assertEqual((index, reason), (1, 'stop_loss'))
+        self.assertAlmostEqual(price, 98.0)
+
+    def test_gap_fills_at_open(self):
+        """Si la vela abre más allá del stop, la salida se ejecuta a la apertura"""
+        manager = self._open('short', 100.0)
+        opens = np.array([100.1, 103.0])
+        closes = np.array([100.4, 103.5])
+        index, reason, price = manager.find_first_exit(closes, closes + 0.1, opens - 0.1, opens)
+        self.assertEqual((index, reason, price), (1, 'stop_loss', 103.0))
+
+    def test_trailing_uses_previous_level(self):
+        """Dentro de la vela se comprueba el trailing stop de la vela anterior, no el subido por su máximo"""
+        manager = self._open('long', 100.0)
+        # La vela sube a 102.8 y baja a 101.5: con el máximo de la propia vela el
+        # trailing (101.772) saltaría, pero el vigente es el de la entrada (99)
+        index, reason, price = manager.find_first_exit([102.0], [102.8], [101.5], [100.5])
+        self.assertEqual((index, reason, price), (None, None, None))
+        self.assertAlmostEqual(manager.current_position['trailing_stop'], 102.8 * 0.99)
+
+        # La siguiente vela toca el nivel arrastrado
+        index, reason, price = manager.find_first_exit([102.0], [102.4], [101.7], [102.1])
+        self.assertEqual((index, reason), (0, 'trailing_stop'))
+        self.assertAlmostEqual(price, 102.8 * 0.99)
+
+    def test_trailing_gap_fills_at_open(self):
+        """Si la vela abre por debajo del trailing stop, la salida se ejecuta a la apertura"""
+        manager = self._open('long', 100.0)
+        closes = np.array([101.5, 100.0])
+        opens = np.array([100.2, 100.3])
+        highs = np.array([102.0, 100.4])
+        lows = np.array([100.1, 99.7])
+        index, reason, price = manager.find_first_exit(closes, highs, lows, opens)
+        self.assertEqual((index, reason, price), (1, 'trailing_stop', 100.3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el planificador alineado con el cierre de las velas
+"""
+
+import asyncio
+import unittest
+import pandas as pd
+from trading.scheduler import CandleCloseScheduler, next_close
+
+def _ms(value):
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+class TestCandleCloseScheduler(unittest.TestCase):
+    def test_next_close_alignment(self):
+        """Los cierres caen en múltiplos de la temporalidad (las semanas, en lunes)"""
+        now = _ms('2024-01-03 13:07:30')
+        self.assertEqual(next_close('15m', now), _ms('2024-01-03 13:15'))
+        self.assertEqual(next_close('4h', now), _ms('2024-01-03 16:00'))
+        self.assertEqual(next_close('1d', now), _ms('2024-01-04'))
+        self.assertEqual(next_close('1w', now), _ms('2024-01-08'))
+        # Justo en el cierre se espera al siguiente
+        self.assertEqual(next_close('1h', _ms('2024-01-03 13:00')), _ms('2024-01-03 14:00'))
+
+    def test_batch_groups_simultaneous_closes(self):
+        """A medianoche cierran a la vez todas las temporalidades intradía y la diaria"""
+        scheduler = CandleCloseScheduler(['15m', '1h', '4h', '1d'])
+        self.assertEqual(scheduler.next_batch(_ms('2024-01-03 23:50')), (_ms('2024-01-04'), ['15m', '1h', '4h', '1d']))
+        self.assertEqual(scheduler.next_batch(_ms('2024-01-03 22:50')), (_ms('2024-01-03 23:00'), ['15m', '1h']))
+
+    def test_wait_uses_server_clock(self):
+        """La espera se calcula con la hora del servidor, no con el reloj local"""
+        local = {'now': _ms('2024-01-03 13:59:59')}
+        scheduler = CandleCloseScheduler(
+            ['1h', '4h'],
+            server_time=lambda: local['now'] + 500,
+            settle_delay=0.05,
+            clock=lambda: local['now']
+        )
+
+        async def advance():
+            while True:
+                await asyncio.sleep(0.005)
+                local['now'] += 5
+
+        async def main():
+            ticker = asyncio.create_task(advance())
+            try:
+                return await scheduler.wait()
+            finally:
+                ticker.cancel()
+
+        self.assertEqual(asyncio.run(main()), (_ms('2024-01-03 14:00'), ['1h']))
+        self.assertEqual(scheduler.offset_ms, 500)
+        self.assertGreaterEqual(scheduler.now(), _ms('2024-01-03 14:00:00.050'))
+
+if __name__ == '__main__':
+    unittest.main()
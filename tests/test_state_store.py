@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el diario e instantáneas del estado del trader en vivo
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+from trading.state_store import TraderStateStore
+
+class TestTraderStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TraderStateStore(self.tmp.name)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_snapshot_and_replay(self):
+        """Tras una instantánea solo se reproducen los eventos posteriores"""
+        self.store.append('trading', enabled=True)
+        self.store.save_snapshot(lambda: ({'capital': 1000.0}, {'1h': np.arange(3)}))
+        self.store.append('trading', enabled=False)
+        self.store.close()
+
+        state, arrays, events = TraderStateStore(self.tmp.name).load()
+        self.assertEqual((state['capital'], state['journal_seq']), (1000.0, 1))
+        np.testing.assert_array_equal(arrays['1h'], np.arange(3))
+        self.assertEqual([(event['seq'], event['enabled']) for event in events], [(2, False)])
+
+    def test_event_during_capture_is_kept(self):
+        """Un evento añadido desde otro hilo mientras se toma el estado no queda cubierto por la instantánea"""
+        appender = threading.Thread(target=self.store.append, args=('trade',), kwargs={'pnl': 5.0})
+
+        def capture():
+            appender.start()
+            # El otro hilo espera al diario: el estado tomado aquí no incluye su evento
+            time.sleep(0.1)
+            return {'trades': 0}, {}
+
+        self.store.save_snapshot(capture)
+        appender.join()
+        self.store.close()
+
+        state, _, events = TraderStateStore(self.tmp.name).load()
+        self.assertEqual(state['journal_seq'], 0)
+        self.assertEqual([(event['type'], event['pnl']) for event in events], [('trade', 5.0)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el formato columnar de resultados de backtesting
+"""
+
+import os
+import json
+import time
+import tempfile
+import unittest
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import backtesting.storage as storage
+from backtesting.storage import save_results, load_results, list_results
+
+def sample_results(final_capital=1012.5):
+    """Resultados con las tres tablas, escalares numpy y señales como listas"""
+    index = pd.date_range('2024-01-01', periods=4, freq='4h', name='timestamp')
+    return {
+        'symbol': 'BTC/USDT',
+        'start_date': datetime(2024, 1, 1),
+        'end_date': datetime(2024, 1, 2),
+        'initial_capital': 1000.0,
+        'final_capital': np.float64(final_capital),
+        'total_trades': np.int64(1),
+        'equity': pd.DataFrame({'balance': [1000.0, 1000.0, 1012.5, 1012.5], 'drawdown': 0.0}, index=index),
+        'price_data': pd.DataFrame({'close': [100.0, 101.0, 102.5, 102.0]}, index=index),
+        'trades': [{
+            'type': 'long',
+            'entry_time': index[0],
+            'exit_time': index[2],
+            'entry_price': 100.0,
+            'exit_price': 102.5,
+            'pnl': 12.5,
+            'exit_reason': 'take_profit',
+            'entry_signals': [{'timeframe': '4h', 'signal': 'buy', 'strength': 0.5}]
+        }]
+    }
+
+class TestResultStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmp.name, 'backtest_BTC_USDT_1')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        """Lo guardado se carga igual y sin objetos Python en el .npz"""
+        results = sample_results()
+        manifest_path = save_results(results, self.base)
+
+        loaded = load_results(manifest_path)
+
+        self.assertEqual(loaded['start_date'], pd.Timestamp('2024-01-01'))
+        self.assertEqual((loaded['final_capital'], loaded['total_trades']), (1012.5, 1))
+        pd.testing.assert_frame_equal(loaded['equity'], results['equity'], check_freq=False)
+        pd.testing.assert_frame_equal(loaded['price_data'], results['price_data'], check_freq=False)
+        trades = loaded['trades']
+        self.assertEqual(list(trades['exit_time']), [pd.Timestamp('2024-01-01 08:00')])
+        self.assertEqual(trades['entry_signals'].iloc[0], '4h:buy(0.50)')
+        self.assertEqual(trades['pnl'].iloc[0], 12.5)
+
+        # Todas las columnas se leen con allow_pickle=False
+        with np.load(f"{self.base}.npz", allow_pickle=False) as data:
+            self.assertTrue(all(data[name].dtype != object for name in data.files))
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['backtest_BTC_USDT_1.json', 'backtest_BTC_USDT_1.npz'])
+
+    def test_failed_write_keeps_previous_manifest(self):
+        """Si falla la escritura del manifiesto, el anterior sigue intacto y legible"""
+        manifest_path = save_results(sample_results(), self.base)
+
+        class FailingJson:
+            @staticmethod
+            def dump(obj, f, **kwargs):
+                f.write('{"final_capital": ')
+                raise OSError('disco lleno')
+
+        storage.json = FailingJson
+        try:
+            with self.assertRaises(OSError):
+                save_results(sample_results(final_capital=990.0), self.base)
+        finally:
+            storage.json = json
+
+        with open(manifest_path, 'r') as f:
+            self.assertEqual(json.load(f)['final_capital'], 1012.5)
+        self.assertEqual(list_results(self.tmp.name), [manifest_path])
+
+    def test_list_results(self):
+        """Lista los manifiestos con datos, del más reciente al más antiguo"""
+        older = save_results(sample_results(), os.path.join(self.tmp.name, 'backtest_a'))
+        newer = save_results(sample_results(), os.path.join(self.tmp.name, 'backtest_b'))
+        past = time.time() - 60
+        os.utime(older, (past, past))
+        orphan = os.path.join(self.tmp.name, 'backtest_c.json')
+        with open(orphan, 'w') as f:
+            f.write('{}')
+
+        self.assertEqual(list_results(self.tmp.name), [newer, older])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,7 @@ Tests para la estrategia MACD
 import unittest
 import pandas as pd
 import numpy as np
-from strategy.macd_strategy import check_macd_signal, calculate_threshold
+from strategy.macd_strategy import check_macd_signal, calculate_threshold, calculate_signal_series, MACDSignalState
 
 class TestMACDStrategy(unittest.TestCase):
     def setUp(self):
@@ -54,5 +54,18 @@ class TestMACDStrategy(unittest.TestCase):
         self.assertEqual(signal1, signal2)
         self.assertEqual(strength1, strength2)
 
+    def test_incremental_state_matches_series(self):
+        """El estado incremental, procesado en dos bloques, reproduce la serie vectorizada"""
+        series = calculate_signal_series(self.test_data, '1h')
+        highs, lows, closes = (self.test_data[c].to_numpy() for c in ('high', 'low', 'close'))
+
+        state = MACDSignalState('1h')
+        codes_a, strengths_a, *_ = state.update_many(highs[:60], lows[:60], closes[:60])
+        state = MACDSignalState.from_dict(state.to_dict())
+        codes_b, strengths_b, *_ = state.update_many(highs[60:], lows[60:], closes[60:])
+
+        np.testing.assert_array_equal(np.concatenate([codes_a, codes_b]), series['signal'].to_numpy())
+        np.testing.assert_allclose(np.concatenate([strengths_a, strengths_b]), series['strength'].to_numpy())
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
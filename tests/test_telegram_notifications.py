@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el notificador de Telegram (con una sesión HTTP simulada)
+"""
+
+import re
+import threading
+import time
+import unittest
+import requests
+import utils.telegram_notifications as telegram
+from utils.telegram_notifications import TelegramNotifier, SignalDigest, COALESCE, DROP_NEWEST
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.ok = status_code == 200
+        self.payload = payload or {}
+        self.text = str(self.payload)
+
+    def json(self):
+        return self.payload
+
+class FakeSession:
+    """Responde con la lista de respuestas indicada y después con 200"""
+
+    def __init__(self, responses=(), delay=0.0, gate=None):
+        self.responses = list(responses)
+        self.delay = delay
+        self.gate = gate
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.delay)
+        self.posts.append((json['text'], timeout, time.monotonic()))
+        response = self.responses.pop(0) if self.responses else FakeResponse(200)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+class TestTelegramNotifier(unittest.TestCase):
+    def setUp(self):
+        self.limits = telegram.BACKOFF_BASE, telegram.MIN_SEND_INTERVAL, telegram.MAX_MESSAGES_PER_MINUTE
+        telegram.BACKOFF_BASE = 0.01
+        telegram.MIN_SEND_INTERVAL = 0.0
+        telegram._chat_sends.clear()
+
+    def tearDown(self):
+        telegram.BACKOFF_BASE, telegram.MIN_SEND_INTERVAL, telegram.MAX_MESSAGES_PER_MINUTE = self.limits
+        telegram._chat_sends.clear()
+
+    def _notifier(self, session, **kwargs):
+        notifier = TelegramNotifier(**kwargs)
+        notifier.enabled = True
+        notifier.bot_token, notifier.chat_id = 'token', 'chat'
+        notifier._start()
+        notifier.session = session
+        return notifier
+
+    def test_send_does_not_block(self):
+        """Con Telegram lento, send_message retorna al momento y flush espera al envío"""
+        session = FakeSession(delay=0.3)
+        notifier = self._notifier(session)
+        started = time.monotonic()
+        notifier.send_message("hola")
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertTrue(notifier.flush(2))
+        self.assertEqual(session.posts[0][0], "hola")
+        self.assertEqual(session.posts[0][1], telegram.REQUEST_TIMEOUT)
+        notifier.close()
+
+    def test_retries_honor_retry_after(self):
+        """Los 429 esperan retry_after, los errores de red se reintentan y los 4xx no"""
+        session = FakeSession([
+            FakeResponse(429, {'parameters': {'retry_after': 0.2}}),
+            requests.ConnectionError("caída"),
+        ])
+        notifier = self._notifier(session)
+        notifier.send_message("a")
+        notifier.flush(2)
+        self.assertEqual(len(session.posts), 3)
+        self.assertGreaterEqual(session.posts[1][2] - session.posts[0][2], 0.2)
+        self.assertEqual((notifier.sent, notifier.failed), (1, 0))
+
+        session.responses = [FakeResponse(400, {'description': 'Bad Request'})]
+        notifier.send_message("b")
+        notifier.flush(2)
+        self.assertEqual(len(session.posts), 4)
+        self.assertEqual((notifier.sent, notifier.failed), (1, 1))
+        notifier.close()
+
+    def test_overflow_policies(self):
+        """Con la cola llena los mensajes se agrupan con el último o se descartan"""
+        for overflow, expected, dropped in (
+            (COALESCE, ["0", "1", "2\n\n3\n\n4"], 0),
+            (DROP_NEWEST, ["0", "1", "2"], 2)
+        ):
+            gate = threading.Event()
+            session = FakeSession(gate=gate)
+            notifier = self._notifier(session, queue_size=2, overflow=overflow)
+            notifier.send_message("0")
+            # Esperar a que el primero esté en vuelo para que la cola tenga dos huecos
+            while not notifier._in_flight:
+                time.sleep(0.001)
+            for i in range(1, 5):
+                notifier.send_message(str(i))
+            gate.set()
+            notifier.flush(2)
+            self.assertEqual([post[0] for post in session.posts], expected)
+            self.assertEqual(notifier.dropped, dropped)
+            notifier.close()
+
+    def test_digest_dedupes_across_cycles(self):
+        """Un ciclo es un solo mensaje; las señales repetidas y los ciclos sin cambios no se envían"""
+        session = FakeSession()
+        notifier = self._notifier(session)
+
+        def cycle(signals, decision):
+            digest = notifier.digest('BTC/USDT')
+            for tf, signal in signals.items():
+                digest.add_signal(tf, signal, 0.5, 100.0)
+            digest.set_summary(1.0, 0.0, decision, {'bid_price': 99.0, 'ask_price': 101.0, 'mid_price': 100.0})
+            return notifier.send_digest(digest)
+
+        self.assertTrue(cycle({'15m': 'buy', '1h': 'buy', '4h': 'hold'}, "⏳ WAIT"))
+        self.assertFalse(cycle({'15m': 'buy', '1h': 'buy', '4h': 'hold'}, "⏳ WAIT"))
+        self.assertTrue(cycle({'15m': 'buy', '1h': 'hold', '4h': 'buy'}, "📈 LONG"))
+        self.assertTrue(cycle({'15m': 'buy', '1h': 'buy', '4h': 'buy'}, "📈 LONG"))
+        notifier.flush(2)
+
+        texts = [post[0] for post in session.posts]
+        self.assertEqual(len(texts), 3)
+        self.assertIn("<b>15m</b> BUY", texts[0])
+        self.assertIn("Bid $99.00", texts[0])
+        self.assertNotIn("<b>15m</b>", texts[1])
+        self.assertIn("<b>4h</b> BUY", texts[1])
+        self.assertIn("<b>1h</b> BUY", texts[2])
+        notifier.close()
+
+    def test_long_digest_cuts_whole_lines(self):
+        """Un resumen demasiado largo se corta por líneas completas, sin partir etiquetas ni entidades"""
+        digest = SignalDigest('BTC/USDT')
+        for i in range(60):
+            digest.add_signal(f"{i}m", 'buy', 0.5, 100.0)
+        for i in range(200):
+            digest.add_error(f"<respuesta {i}> A & B", "fetch")
+
+        text = digest.render()
+        lines = text.split("\n")
+
+        self.assertLessEqual(len(text), telegram.MAX_MESSAGE_LENGTH)
+        self.assertRegex(lines[-1], r"^… \d+ líneas omitidas$")
+        self.assertEqual(text.count("<b>"), text.count("</b>"))
+        self.assertEqual(re.findall(r"&(?!amp;|lt;|gt;)", text), [])
+        self.assertTrue(all(line.endswith("A &amp; B") for line in lines if line.startswith("⚠️")))
+        # Cabecera (3) + señales + línea en blanco + errores: todas enviadas u omitidas
+        omitted = int(lines[-1].split()[1])
+        self.assertEqual(len(lines) - 1 + omitted, 3 + 60 + 1 + 200)
+
+    def test_rate_cap_per_chat(self):
+        """Los envíos a un chat se espacian aunque vengan de notificadores distintos"""
+        telegram.MIN_SEND_INTERVAL = 0.1
+        session = FakeSession()
+        notifiers = [self._notifier(session), self._notifier(session)]
+        for notifier in notifiers:
+            notifier.send_message("x")
+            notifier.send_message("y")
+        for notifier in notifiers:
+            notifier.flush(2)
+        times = sorted(post[2] for post in session.posts)
+        self.assertEqual(len(times), 4)
+        self.assertGreaterEqual(min(b - a for a, b in zip(times, times[1:])), 0.09)
+        for notifier in notifiers:
+            notifier.close()
+
+if __name__ == '__main__':
+    unittest.main()
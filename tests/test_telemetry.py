@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para los histogramas, contadores y su formato de Prometheus
+"""
+
+import unittest
+from utils import telemetry
+
+class TestTelemetry(unittest.TestCase):
+    def test_quantiles_within_bucket(self):
+        """Los percentiles caen en la cubeta de la observación correspondiente"""
+        hist = telemetry.Histogram('test_seconds', 'test', buckets=(0.01, 0.1, 1.0))
+        for _ in range(90):
+            hist.observe(0.005)
+        for _ in range(10):
+            hist.observe(0.5)
+
+        self.assertLessEqual(hist.quantile(0.5), 0.01)
+        self.assertGreater(hist.quantile(0.95), 0.1)
+        self.assertLessEqual(hist.quantile(0.99), 1.0)
+        summary = hist.summary()[()]
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['mean'], 0.0545)
+
+    def test_prometheus_text(self):
+        """El texto de Prometheus incluye histogramas acumulados y contadores con etiquetas"""
+        hist = telemetry.histogram('test_endpoint_seconds', 'test')
+        with telemetry.timer(hist, stage='x'):
+            pass
+        telemetry.counter('test_endpoint_total', 'test').inc(3, result='hit')
+
+        body = telemetry.render_prometheus()
+
+        self.assertIn('trading_bot_test_endpoint_seconds_bucket{stage="x",le="+Inf"} 1', body)
+        self.assertIn('trading_bot_test_endpoint_seconds_count{stage="x"} 1', body)
+        self.assertIn('trading_bot_test_endpoint_total{result="hit"} 3', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Tests para el registro columnar de operaciones
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from backtesting.trade_log import TradeLog
+
+class TestTradeLog(unittest.TestCase):
+    def setUp(self):
+        """Preparar operaciones con el formato de PositionManager.close_position"""
+        self.trades = []
+        for i in range(100):
+            entry_time = pd.Timestamp('2024-01-01') + pd.Timedelta(hours=4 * i)
+            self.trades.append({
+                'type': 'long' if i % 2 == 0 else 'short',
+                'entry_time': entry_time,
+                'exit_time': entry_time + pd.Timedelta(hours=2),
+                'entry_price': 100.0 + i,
+                'exit_price': 101.0 + i,
+                'size': 0.5,
+                'pnl': float(i - 50),
+                'exit_reason': 'take_profit' if i % 3 else 'stop_loss',
+                'entry_signals': [
+                    {'timestamp': entry_time, 'timeframe': '4h', 'signal': 'buy', 'strength': 0.25},
+                    {'timestamp': entry_time, 'timeframe': '1d', 'signal': 'top_sell', 'strength': 1.0}
+                ],
+                'exit_signals': [],
+                'stop_loss_price': 98.0 + i,
+                'take_profit_price': 104.0 + i
+            })
+        self.log = TradeLog(['4h', '1h', '1d'], capacity=8)
+        for trade in self.trades:
+            self.log.append(trade)
+
+    def test_dict_view_roundtrip(self):
+        """La vista dict reproduce las operaciones añadidas (solo con las señales disponibles)"""
+        self.assertEqual(len(self.log), 100)
+        for original, stored in zip(self.trades, self.log.to_dicts()):
+            self.assertEqual(original, stored)
+
+    def test_columns(self):
+        """Las columnas son arrays con una fila por operación"""
+        np.testing.assert_array_equal(self.log.pnl, [t['pnl'] for t in self.trades])
+        frame = self.log.to_frame()
+        self.assertEqual(len(frame), 100)
+        self.assertEqual(frame['signal_1d'].dtype, np.int8)
+        self.assertTrue(frame['strength_1h'].isna().all())
+        self.assertEqual(list(frame['exit_reason'][:2]), ['stop_loss', 'take_profit'])
+
+    def test_arrays_roundtrip(self):
+        """Reconstruir desde to_arrays conserva las operaciones y permite seguir añadiendo"""
+        restored = TradeLog.from_arrays(self.log.timeframes, self.log.to_arrays())
+        restored.append(self.trades[0])
+        self.assertEqual(restored.to_dicts(), self.trades + self.trades[:1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Demonio de trading en vivo
+
+Ejecuta los LiveTrader en un proceso propio, fuera del servidor de
+Streamlit, y los expone en un canal de control local (trading/ipc.py) con el
+que la app los arranca, detiene, activa y consulta. El estado de cada par se
+guarda en LIVE_STATE_DIR, así que al reiniciar el demonio los traders retoman
+posiciones, ventanas de velas y trading activado.
+
+Como en MultiSymbolTrader, todos los pares corren como tareas de un único
+bucle de eventos (un hilo para todo el demonio) y comparten el cliente del
+exchange, el cliente de datos, el limitador de peticiones, el planificador de
+cierres de vela y el notificador, así que el límite de la API se respeta
+entre todos los pares. A diferencia de MultiSymbolTrader, cada par se arranca
+y se detiene por separado desde el canal de control.
+
+Las peticiones al canal llevan un token compartido (ver trading/ipc.py): si
+no se define TRADER_DAEMON_TOKEN, el demonio genera uno en
+TRADER_DAEMON_TOKEN_FILE, y para escuchar fuera de 127.0.0.1 es obligatorio.
+
+Uso:
+    python trader_daemon.py [--port 8765] [--symbols BTC/USDT ETH/USDT] [--live]
+"""
+
+import os
+import argparse
+import asyncio
+import signal
+import threading
+import ccxt
+from dotenv import load_dotenv
+from trading.live_trader import LiveTrader, LIVE_STATE_DIR
+from trading.ipc import ControlServer, DAEMON_HOST, DAEMON_PORT
+from trading.rate_limiter import AsyncRateLimiter, DEFAULT_RATE, DEFAULT_CONCURRENCY
+from trading.scheduler import CandleCloseScheduler
+from utils.telegram_notifications import TelegramNotifier
+from config import TIMEFRAMES
+
+class TraderDaemon:
+    """
+    Traders en vivo del proceso, uno por par, en un bucle de eventos y con componentes compartidos
+    """
+
+    def __init__(self, exchange_client=None, paper=True, state_dir=LIVE_STATE_DIR,
+                 data_exchange='kraken', rate=DEFAULT_RATE, max_concurrent=DEFAULT_CONCURRENCY, notifier=None):
+        """
+        Args:
+            exchange_client: Cliente del exchange (None para crear uno de Binance con
+                BINANCE_API_KEY y BINANCE_API_SECRET, o sin credenciales en paper)
+            paper: Enviar las órdenes a un PaperExchange (por defecto True)
+            state_dir: Directorio base del estado de los traders (uno por par)
+            data_exchange: Exchange de ccxt del que se descargan las velas (por defecto 'kraken')
+            rate: Peticiones por segundo como máximo entre todos los pares
+            max_concurrent: Peticiones simultáneas como máximo entre todos los pares
+            notifier: Notificador compartido (None para crear un TelegramNotifier)
+        """
+        self.api_key = os.getenv('BINANCE_API_KEY', '')
+        self.api_secret = os.getenv('BINANCE_API_SECRET', '')
+        self.exchange_client = exchange_client
+        self.paper = paper
+        self.state_dir = state_dir
+        self.data_exchange = data_exchange
+        self.traders = {}
+        self._lock = threading.Lock()
+
+        # Componentes comunes a todos los pares (el planificador y el cliente de
+        # datos se crean con el primer trader, junto con el cliente del exchange)
+        self.notifier = notifier or TelegramNotifier()
+        self.rate_limiter = AsyncRateLimiter(rate, max_concurrent)
+        self.scheduler = None
+        self.data_client = None
+
+        # Bucle de eventos en el que corren todos los traders
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._loop_thread.start()
+
+    @property
+    def has_credentials(self):
+        return self.exchange_client is not None or bool(self.api_key and self.api_secret)
+
+    def _client(self):
+        """Cliente del exchange (se crea con el primer trader)"""
+        if self.exchange_client is None:
+            if self.has_credentials:
+                self.exchange_client = ccxt.binance({
+                    'apiKey': self.api_key,
+                    'secret': self.api_secret,
+                    'enableRateLimit': True
+                })
+            elif self.paper:
+                # En paper el cliente solo da precios y hora al PaperExchange: bastan los endpoints públicos
+                self.exchange_client = ccxt.binance({'enableRateLimit': True})
+            else:
+                raise ValueError("Faltan BINANCE_API_KEY y BINANCE_API_SECRET")
+        if self.scheduler is None:
+            self.scheduler = CandleCloseScheduler(TIMEFRAMES, server_time=getattr(self.exchange_client, 'fetch_time', None))
+            self.data_client = getattr(ccxt, self.data_exchange)()
+        return self.exchange_client
+
+    def _trader(self, symbol):
+        trader = self.traders.get(symbol)
+        if trader is None:
+            raise ValueError(f"No hay trader para {symbol}")
+        return trader
+
+    def start(self, symbol):
+        """Arranca el trader del par (lo crea, retomando su estado, si no existe)"""
+        with self._lock:
+            trader = self.traders.get(symbol)
+            if trader is None:
+                trader = LiveTrader(
+                    exchange_client=self._client(),
+                    symbol=symbol,
+                    paper=self.paper,
+                    notifier=self.notifier,
+                    scheduler=self.scheduler,
+                    rate_limiter=self.rate_limiter,
+                    data_client=self.data_client,
+                    state_dir=os.path.join(self.state_dir, symbol.replace('/', '_'))
+                )
+                self.traders[symbol] = trader
+            trader.start(self.loop)
+            print(f"🟢 Trader de {symbol} iniciado")
+
+    def stop(self, symbol):
+        """Detiene el trader del par (su estado queda guardado)"""
+        with self._lock:
+            trader = self._trader(symbol)
+            trader.stop()
+            print(f"🔴 Trader de {symbol} detenido")
+
+    def set_trading(self, symbol, enabled):
+        """Activa o desactiva la ejecución de órdenes del par"""
+        with self._lock:
+            trader = self._trader(symbol)
+            if enabled:
+                trader.enable_trading()
+            else:
+                trader.disable_trading()
+
+    def status(self):
+        """
+        Estado de los traders
+
+        Returns:
+            dict: {'pid', 'paper', 'credentials', 'traders': {par: {'running', 'trading_enabled',
+                'position', 'performance'}}}
+        """
+        with self._lock:
+            traders = dict(self.traders)
+        return {
+            'pid': os.getpid(),
+            'paper': self.paper,
+            'credentials': self.has_credentials,
+            'traders': {
+                symbol: {
+                    'running': trader.is_running,
+                    'trading_enabled': trader.trading_enabled,
+                    'position': trader.current_position,
+                    'performance': trader.get_performance()
+                }
+                for symbol, trader in traders.items()
+            }
+        }
+
+    def shutdown(self):
+        """Detiene todos los traders y el bucle de eventos"""
+        with self._lock:
+            for symbol, trader in self.traders.items():
+                if trader.is_running:
+                    trader.stop()
+                    print(f"🔴 Trader de {symbol} detenido")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._loop_thread.join()
+        self.notifier.close()
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Demonio de trading en vivo con canal de control local")
+    parser.add_argument('--host', default=DAEMON_HOST, help="Dirección de escucha (por defecto solo local)")
+    parser.add_argument('--port', type=int, default=DAEMON_PORT, help="Puerto del canal de control")
+    parser.add_argument('--symbols', nargs='*', default=[], help="Pares que se arrancan al iniciar")
+    parser.add_argument('--live', action='store_true', help="Enviar órdenes reales en vez de a un PaperExchange")
+    args = parser.parse_args()
+
+    daemon = TraderDaemon(paper=not args.live)
+    try:
+        server = ControlServer(daemon, args.host, args.port)
+    except ValueError as e:
+        parser.error(str(e))
+    for symbol in args.symbols:
+        daemon.start(symbol)
+
+    # SIGTERM (p. ej. systemd) se trata igual que Ctrl+C
+    signal.signal(signal.SIGTERM, _interrupt)
+    print(f"🤖 Demonio de trading en http://{server.host}:{server.port} ({'real' if args.live else 'paper'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Canal local de control y telemetría del trader en proceso propio
+
+El demonio (trader_daemon.py) atiende peticiones HTTP con cuerpo JSON en
+127.0.0.1; la app de Streamlit (o cualquier otro proceso local) lo maneja con
+TraderClient. Así el bucle de trading no compite con la interfaz por el GIL,
+sobrevive a las sesiones del navegador y un mismo trader sirve a varios
+paneles a la vez.
+
+Toda petición lleva un token compartido (Authorization: Bearer <token>),
+tomado de TRADER_DAEMON_TOKEN o del fichero TRADER_DAEMON_TOKEN_FILE; si no
+hay ninguno y el demonio escucha en una dirección local, lo genera y lo
+escribe en ese fichero (solo legible por el usuario) para que los clientes
+del mismo usuario lo lean. Los POST tienen que ser application/json, así que
+un navegador no puede enviarlos desde otra página sin una petición previa de
+CORS (que el demonio no acepta).
+
+Rutas:
+    GET  /status     Estado de los traders (controller.status())
+    GET  /telemetry  Histogramas y contadores (telemetry.snapshot())
+    GET  /metrics    Las mismas métricas en formato de texto de Prometheus
+    POST /start      {"symbol": ...}
+    POST /stop       {"symbol": ...}
+    POST /trading    {"symbol": ..., "enabled": true/false}
+"""
+
+import os
+import hmac
+import json
+import ipaddress
+import secrets
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils import telemetry
+
+# Dirección del demonio
+DAEMON_HOST = os.environ.get("TRADER_DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.environ.get("TRADER_DAEMON_PORT", "8765"))
+
+# Fichero del token compartido cuando no se indica en TRADER_DAEMON_TOKEN
+TOKEN_FILE = os.environ.get("TRADER_DAEMON_TOKEN_FILE", os.path.join(os.path.expanduser("~"), ".trader_daemon_token"))
+
+# Timeouts de conexión y lectura del cliente (segundos); parar un trader
+# espera a que se envíen sus notificaciones pendientes
+CLIENT_TIMEOUT = (1.0, 15)
+
+class DaemonError(Exception):
+    """El demonio ha rechazado la petición (el mensaje es el error que devuelve)"""
+
+def load_token(token_file=TOKEN_FILE):
+    """
+    Token compartido del canal de control
+
+    Returns:
+        str: TRADER_DAEMON_TOKEN, o el contenido de token_file; None si no hay ninguno
+    """
+    token = os.environ.get("TRADER_DAEMON_TOKEN")
+    if token:
+        return token
+    try:
+        with open(token_file, encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def create_token(token_file=TOKEN_FILE):
+    """Genera un token aleatorio y lo guarda en token_file, legible solo por el usuario"""
+    token = secrets.token_urlsafe(32)
+    directory = os.path.dirname(token_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    return token
+
+def is_loopback(host):
+    """True si host solo es accesible desde la propia máquina"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def _json_default(value):
+    """Convierte los escalares de numpy al serializar"""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    def _authorized(self):
+        """Comprueba el token; si no es válido responde 401"""
+        expected = f"Bearer {self.server.token}".encode('utf-8')
+        received = self.headers.get('Authorization', '').encode('utf-8')
+        if hmac.compare_digest(received, expected):
+            return True
+        self._reply(401, {'error': "Token del demonio ausente o incorrecto"})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        controller = self.server.controller
+        path = self.path.split('?')[0]
+        if path == '/status':
+            self._reply(200, controller.status())
+        elif path == '/telemetry':
+            self._reply(200, telemetry.snapshot())
+        elif path == '/metrics':
+            self._send(200, telemetry.render_prometheus().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+        else:
+            self._reply(404, {'error': f"Ruta desconocida: {path}"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._reply(415, {'error': "Se esperaba Content-Type: application/json"})
+            return
+        controller = self.server.controller
+        path = self.path.split('?')[0]
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if path == '/start':
+                controller.start(body['symbol'])
+            elif path == '/stop':
+                controller.stop(body['symbol'])
+            elif path == '/trading':
+                controller.set_trading(body['symbol'], bool(body['enabled']))
+            else:
+                self._reply(404, {'error': f"Ruta desconocida: {path}"})
+                return
+        except KeyError as e:
+            self._reply(400, {'error': f"Falta o no existe: {e}"})
+            return
+        except (ValueError, TypeError) as e:
+            self._reply(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._reply(500, {'error': str(e)})
+            return
+        self._reply(200, controller.status())
+
+    def _reply(self, status, data):
+        self._send(status, json.dumps(data, default=_json_default).encode('utf-8'), 'application/json')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class ControlServer:
+    """
+    Servidor de control del demonio
+
+    El controlador expone status(), start(symbol), stop(symbol) y
+    set_trading(symbol, enabled); los errores ValueError/KeyError se devuelven
+    como 400 con {'error': mensaje}, y las peticiones sin el token, como 401.
+    """
+
+    def __init__(self, controller, host=DAEMON_HOST, port=DAEMON_PORT, token=None, token_file=TOKEN_FILE):
+        """
+        Args:
+            controller: Objeto que gestiona los traders (ver trader_daemon.TraderDaemon)
+            host: Dirección de escucha (por defecto solo local)
+            port: Puerto (0 para elegir uno libre: self.port)
+            token: Token compartido (None para tomarlo de load_token(token_file) o,
+                en una dirección local, generar uno en token_file)
+            token_file: Fichero del token
+
+        Raises:
+            ValueError: Si host no es local y no hay token configurado
+        """
+        token = token or load_token(token_file)
+        if token is None:
+            if not is_loopback(host):
+                raise ValueError(
+                    f"Para escuchar en {host} hace falta un token (TRADER_DAEMON_TOKEN o {token_file})"
+                )
+            token = create_token(token_file)
+        self.httpd = ThreadingHTTPServer((host, port), _ControlHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.controller = controller
+        self.httpd.token = token
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = None
+
+    def serve_forever(self):
+        """Atiende peticiones en el hilo actual hasta shutdown()"""
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Atiende peticiones en un hilo en segundo plano"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        """Deja de atender peticiones y libera el puerto"""
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+        self.httpd.server_close()
+
+class TraderClient:
+    """
+    Cliente del demonio para la interfaz (una conexión reutilizable)
+    """
+
+    def __init__(self, host=DAEMON_HOST, port=DAEMON_PORT, timeout=CLIENT_TIMEOUT, token=None, token_file=TOKEN_FILE):
+        """
+        Args:
+            host, port: Dirección del demonio
+            timeout: Timeouts de conexión y lectura (segundos)
+            token: Token compartido (None para leerlo con load_token(token_file) en
+                cada petición, ya que el demonio puede generarlo después)
+            token_file: Fichero del token
+        """
+        self.url = f"http://{host}:{port}"
+        self.timeout = timeout
+        self.token = token
+        self.token_file = token_file
+        self.session = requests.Session()
+
+    def _request(self, method, path, payload=None):
+        """
+        Hace una petición al demonio
+
+        Raises:
+            requests.ConnectionError: Si el demonio no está en marcha
+            DaemonError: Si el demonio rechaza la petición
+        """
+        token = self.token or load_token(self.token_file)
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        response = self.session.request(method, self.url + path, json=payload, headers=headers, timeout=self.timeout)
+        data = response.json()
+        if not response.ok:
+            raise DaemonError(data.get('error', f"HTTP {response.status_code}"))
+        return data
+
+    def is_alive(self):
+        """True si el demonio responde"""
+        try:
+            self.status()
+            return True
+        except (requests.RequestException, DaemonError):
+            return False
+
+    def status(self):
+        """Estado del demonio y de sus traders"""
+        return self._request('GET', '/status')
+
+    def telemetry(self):
+        """Histogramas y contadores del demonio (como telemetry.snapshot())"""
+        return self._request('GET', '/telemetry')
+
+    def start(self, symbol):
+        """Arranca (o retoma) el trader del par"""
+        return self._request('POST', '/start', {'symbol': symbol})
+
+    def stop(self, symbol):
+        """Detiene el trader del par"""
+        return self._request('POST', '/stop', {'symbol': symbol})
+
+    def set_trading(self, symbol, enabled):
+        """Activa o desactiva la ejecución de órdenes del par"""
+        return self._request('POST', '/trading', {'symbol': symbol, 'enabled': enabled})
@@ -1,166 +1,605 @@
 # -*- coding: utf-8 -*-
 """
 Módulo para trading en vivo con Binance
+
+El núcleo es asíncrono: descarga y análisis de cada temporalidad, ejecución
+de órdenes y valoración de la sesión corren como tareas concurrentes de
+asyncio (las notificaciones las envía TelegramNotifier en segundo plano).
+Cada temporalidad se evalúa una vez por vela, justo después de su cierre
+(CandleCloseScheduler), sobre una ventana fija de velas en memoria
+(CandleBuffer) a la que solo se añaden las velas nuevas: cada descarga trae
+unas pocas velas y la memoria no crece con el tiempo. Las llamadas bloqueantes
+(ccxt, pandas_ta, Telegram) se ejecutan en hilos con asyncio.to_thread, a
+través de un AsyncRateLimiter, así que un ciclo tarda lo que la llamada más
+lenta y no la suma de todas, y cancelar el trader es inmediato.
+
+Con state_dir el estado (posición, capital, ventanas de velas, última señal
+por temporalidad, trading activado) se guarda en un diario con instantáneas
+periódicas (TraderStateStore) y un trader nuevo en el mismo directorio lo
+retoma al crearse, sin volver a descargar el histórico.
+
+TradingService reúne el bucle y el arranque/parada comunes a LiveTrader (un
+par) y a MultiSymbolTrader (trading/multi_symbol_trader.py, muchos pares en
+un solo bucle).
+
+Las órdenes se envían por defecto a un PaperExchange (saldos y casamiento
+locales, precios del cliente real), así que la sesión no toca la cuenta salvo
+que se pida con paper=False.
+
+Se puede usar en un proceso propio (asyncio.run(trader.run())) o con
+start()/stop(), que lo ejecutan en un hilo con su propio bucle de eventos o,
+con start(loop), como una tarea en un bucle compartido (trader_daemon.py).
 """
 
-import time
-from datetime import datetime
+import os
+import asyncio
+import concurrent.futures
+import tempfile
 import threading
-from queue import Queue
+import time
+from collections import deque
+import numpy as np
 import pandas as pd
 from strategy.macd_strategy import check_macd_signal
 from utils.api_data import get_price_data
+from utils.candle_store import CandleBuffer, OHLCV_COLUMNS, CACHE_REQUESTS
+from utils import telemetry
 from utils.telegram_notifications import TelegramNotifier
+from trading.scheduler import CandleCloseScheduler, next_close, timeframe_ms
+from trading.paper_exchange import PaperExchange
+from trading.rate_limiter import AsyncRateLimiter
+from trading.state_store import TraderStateStore
+from risk_management.position_manager import DEFAULT_RISK_CONFIG
+from backtesting.incremental import PerformanceTracker
+from backtesting.metrics import periods_per_year
 from config import TIMEFRAMES, SIGNAL_WEIGHTS, SIGNAL_THRESHOLD
 
-class LiveTrader:
-    def __init__(self, exchange_client, symbol, risk_config=None):
-        """
-        Inicializa el trader en vivo
-        
-        Args:
-            exchange_client: Cliente del exchange (Binance)
-            symbol: Par de trading (ej. 'BTC/USDT')
-            risk_config: Configuración de gestión de riesgo
-        """
-        self.exchange = exchange_client
-        self.symbol = symbol
-        self.risk_config = risk_config or {}
+# Directorio base del estado persistente de los traders en vivo
+LIVE_STATE_DIR = os.environ.get("LIVE_STATE_DIR", os.path.join(tempfile.gettempdir(), "trading_bot_live"))
+
+# Velas cerradas que se conservan por temporalidad (de sobra para SIGNAL_LOOKBACK)
+CANDLE_WINDOW = 500
+
+# Segundos entre valoraciones de la sesión
+PERFORMANCE_INTERVAL = 60
+
+# Tiempo máximo para enviar las notificaciones pendientes al detenerse (segundos)
+NOTIFY_DRAIN_TIMEOUT = 5
+
+# Latencias decisión → ejecución que se conservan
+LATENCY_HISTORY = 1000
+
+# Métricas del ciclo en vivo (utils/telemetry.py)
+CYCLE_SECONDS = telemetry.histogram('analysis_cycle_seconds', 'Duración de _analyze_market (descarga, análisis y decisión)')
+TICK_TO_DECISION_SECONDS = telemetry.histogram('tick_to_decision_seconds', 'Cierre de vela (hora del servidor) → decisión')
+DECISION_SECONDS = telemetry.histogram('decision_seconds', 'Duración de _process_signals')
+ORDER_SECONDS = telemetry.histogram('decision_to_fill_seconds', 'Decisión → orden ejecutada')
+ERRORS = telemetry.counter('errors_total', 'Errores por etapa')
+
+def order_fill(order):
+    """
+    Cantidad, precio medio y comisión de una orden ejecutada
+
+    ccxt no siempre rellena 'average' ni 'fee' en la respuesta de una orden de
+    mercado: el precio se deduce de 'cost' / 'filled' (o de sus ejecuciones) y
+    una comisión ausente cuenta como 0.
+
+    Returns:
+        tuple: (cantidad, precio o None si la orden no permite deducirlo, comisión)
+    """
+    filled = order.get('filled') or order.get('amount')
+    price = order.get('average')
+    if price is None and order.get('cost') and filled:
+        price = order['cost'] / filled
+    trades = order.get('trades') or []
+    if price is None and trades:
+        amount = sum(trade['amount'] for trade in trades)
+        if amount:
+            price = sum(trade['price'] * trade['amount'] for trade in trades) / amount
+    fee = (order.get('fee') or {}).get('cost')
+    if fee is None and trades:
+        fee = sum((trade.get('fee') or {}).get('cost') or 0.0 for trade in trades)
+    return filled, price, fee or 0.0
+
+class TradingService:
+    """
+    Base de los traders: bucle de eventos, arranque/parada y tareas comunes
+
+    Las subclases implementan _analyze_market(timeframes, now_ms),
+    _execute_order(symbol, direction, decided_at) y _update_performance(), y
+    pueden ampliar _prepare_run(), _finish_run() y _set_trading_enabled().
+    """
+
+    def __init__(self, notifier, scheduler):
+        self.notifier = notifier
+        self.scheduler = scheduler
         self.is_running = False
         self.trading_thread = None
-        self.signal_queue = Queue()
-        self.notifier = TelegramNotifier()
-        
-        # Estado del trader
-        self.current_position = None
-        self.last_signal_time = {}
+        self.trading_future = None
         self.trading_enabled = False
-    
-    def start(self):
-        """Inicia el proceso de trading"""
+
+        # Bucle de eventos, tarea principal y cola de órdenes (se crean al arrancar)
+        self.loop = None
+        self.main_task = None
+        self.order_queue = None
+        self._ready = threading.Event()
+
+    async def run(self):
+        """
+        Ejecuta el trader hasta que se cancele la tarea
+
+        Lanza las tareas de ejecución y valoración, evalúa todas las
+        temporalidades al arrancar y después cada una al cerrar su vela. Al
+        cancelarse espera a que se envíen las notificaciones pendientes (con un
+        tiempo máximo) y detiene todas las tareas.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.main_task = asyncio.current_task()
+        self.order_queue = asyncio.Queue()
+        self._prepare_run()
+        self.is_running = True
+        self._ready.set()
+        workers = [
+            asyncio.create_task(self._order_worker()),
+            asyncio.create_task(self._performance_worker())
+        ]
+        self.notifier.send_message("🟢 Trading Bot iniciado")
+
+        try:
+            try:
+                await self.scheduler.sync_clock()
+            except Exception as e:
+                print(f"⚠️ No se pudo sincronizar con la hora del servidor: {str(e)}")
+            closed, now_ms = list(self.scheduler.timeframes), self.scheduler.now()
+            while True:
+                try:
+                    await self._analyze_market(closed, now_ms)
+                except Exception as e:
+                    ERRORS.inc(stage='loop')
+                    self.notifier.send_error(str(e), "Error en bucle de trading")
+                now_ms, closed = await self.scheduler.wait()
+        finally:
+            self.is_running = False
+            self.notifier.send_message("🔴 Trading Bot detenido")
+            try:
+                await asyncio.to_thread(self.notifier.flush, NOTIFY_DRAIN_TIMEOUT)
+            except asyncio.CancelledError:
+                pass
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._finish_run()
+            self.loop = None
+
+    def start(self, loop=None):
+        """
+        Inicia el trader en un hilo con su propio bucle de eventos
+
+        Args:
+            loop: Bucle de eventos ya en marcha en otro hilo en el que ejecutar el
+                trader como una tarea más (None para crear hilo y bucle propios)
+        """
         if not self.is_running:
             self.is_running = True
-            self.trading_thread = threading.Thread(target=self._trading_loop)
+            self._ready.clear()
+            if loop is not None:
+                self.trading_future = asyncio.run_coroutine_threadsafe(self.run(), loop)
+                return
+            self.trading_thread = threading.Thread(target=self._run_in_thread, daemon=True)
             self.trading_thread.start()
-            self.notifier.send_message("🟢 Trading Bot iniciado")
-    
+
+    def _run_in_thread(self):
+        """Punto de entrada del hilo de start()"""
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.run())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Sin esperar a las llamadas bloqueantes que sigan en curso en sus hilos
+            loop.close()
+            self.is_running = False
+
     def stop(self):
-        """Detiene el proceso de trading"""
+        """Detiene el trader cancelando su tarea principal"""
         if self.is_running:
-            self.is_running = False
+            self._ready.wait(1)
+            loop, task = self.loop, self.main_task
+            if loop is not None and task is not None:
+                loop.call_soon_threadsafe(task.cancel)
             if self.trading_thread:
-                self.trading_thread.join()
-            self.notifier.send_message("🔴 Trading Bot detenido")
-    
+                self.trading_thread.join(NOTIFY_DRAIN_TIMEOUT + 1)
+            if self.trading_future:
+                concurrent.futures.wait([self.trading_future], NOTIFY_DRAIN_TIMEOUT + 1)
+                self.trading_future = None
+            self.is_running = False
+
+    def _prepare_run(self):
+        """Se llama al arrancar run(), con el bucle y la cola de órdenes ya creados"""
+
+    def _finish_run(self):
+        """Se llama al terminar run(), con las tareas ya detenidas"""
+
+    def _set_trading_enabled(self, enabled):
+        """Cambia el estado de la ejecución de operaciones"""
+        self.trading_enabled = enabled
+
     def enable_trading(self):
         """Activa la ejecución de operaciones"""
-        self.trading_enabled = True
+        self._set_trading_enabled(True)
         self.notifier.send_message("✅ Ejecución de operaciones activada")
-    
+
     def disable_trading(self):
         """Desactiva la ejecución de operaciones"""
-        self.trading_enabled = False
+        self._set_trading_enabled(False)
         self.notifier.send_message("⛔ Ejecución de operaciones desactivada")
-    
-    def _trading_loop(self):
-        """Bucle principal de trading"""
-        while self.is_running:
+
+    async def _order_worker(self):
+        """Ejecuta las operaciones decididas por el análisis"""
+        while True:
+            symbol, direction, decided_at = await self.order_queue.get()
             try:
-                # Analizar mercado cada minuto
-                self._analyze_market()
-                time.sleep(60)
-            except Exception as e:
-                self.notifier.send_error(str(e), "Error en bucle de trading")
-                time.sleep(60)  # Esperar antes de reintentar
-    
-    def _analyze_market(self):
-        """Analiza el mercado y genera señales"""
-        signals = []
-        
-        for tf in TIMEFRAMES:
+                await self._execute_order(symbol, direction, decided_at)
+            finally:
+                self.order_queue.task_done()
+
+    async def _performance_worker(self):
+        """Valora la sesión a intervalos regulares"""
+        while True:
             try:
-                # Evitar análisis muy frecuente en timeframes mayores
-                current_time = datetime.now()
-                if tf in self.last_signal_time:
-                    time_diff = (current_time - self.last_signal_time[tf]).total_seconds()
-                    min_interval = self._get_min_interval(tf)
-                    if time_diff < min_interval:
-                        continue
-                
-                # Obtener datos y analizar
-                df = get_price_data(self.symbol, tf)
-                signal, strength = check_macd_signal(df, tf)
-                
-                if signal != 'hold':
-                    signals.append({
-                        'timeframe': tf,
-                        'signal': signal,
-                        'strength': strength,
-                        'weight': TIMEFRAMES[tf]
-                    })
-                    self.last_signal_time[tf] = current_time
-                    
-                    # Notificar señal
-                    self.notifier.send_trade_signal(
-                        timeframe=tf,
-                        signal=signal,
-                        strength=strength,
-                        price=df['close'].iloc[-1]
-                    )
-            
+                await self._update_performance()
             except Exception as e:
-                self.notifier.send_error(str(e), f"Error en análisis de {tf}")
-        
-        # Procesar señales si el trading está habilitado
-        if self.trading_enabled and signals:
-            self._process_signals(signals)
-    
+                self.notifier.send_error(str(e), "Error al valorar la sesión")
+            await asyncio.sleep(PERFORMANCE_INTERVAL)
+
+class LiveTrader(TradingService):
+    def __init__(self, exchange_client, symbol, risk_config=None, initial_capital=1000.0, paper=True,
+                 notifier=None, scheduler=None, rate_limiter=None, data_client=None, state_dir=None):
+        """
+        Inicializa el trader en vivo
+
+        Args:
+            exchange_client: Cliente del exchange (Binance)
+            symbol: Par de trading (ej. 'BTC/USDT')
+            risk_config: Configuración de gestión de riesgo
+            initial_capital: Capital de referencia para las métricas de la sesión (por defecto 1000.0)
+            paper: Enviar las órdenes a un PaperExchange con initial_capital en la divisa
+                de cotización, tomando los precios de exchange_client (por defecto True)
+            notifier, scheduler, rate_limiter: Componentes compartidos (None para crear unos propios)
+            data_client: Cliente ccxt compartido para descargar velas (None para crear uno por descarga)
+            state_dir: Directorio del estado persistente (None para no guardarlo); si ya
+                contiene estado de este par, el trader lo retoma
+        """
+        # El PaperExchange propio se guarda con el estado del trader
+        self.owns_exchange = paper and not isinstance(exchange_client, PaperExchange)
+        if self.owns_exchange:
+            exchange_client = PaperExchange({symbol.split('/')[1]: initial_capital}, market_data=exchange_client)
+        super().__init__(
+            notifier or TelegramNotifier(),
+            scheduler or CandleCloseScheduler(TIMEFRAMES, server_time=getattr(exchange_client, 'fetch_time', None))
+        )
+        self.exchange = exchange_client
+        self.symbol = symbol
+        self.risk_config = risk_config or {}
+        self.rate_limiter = rate_limiter or AsyncRateLimiter()
+        self.data_client = data_client
+
+        # Estado del trader
+        self.current_position = None
+        self.last_signal_time = {}
+        self.candles = {tf: CandleBuffer(CANDLE_WINDOW) for tf in TIMEFRAMES}
+        self.fill_latencies = deque(maxlen=LATENCY_HISTORY)
+
+        # Métricas en curso (una actualización por minuto; Sharpe móvil de un día)
+        self.capital = initial_capital
+        self.performance = PerformanceTracker(initial_capital, periods_per_year('1m'), window=24 * 60)
+        self.performance_lock = threading.Lock()
+
+        self.store = None
+        if state_dir is not None:
+            self.store = TraderStateStore(state_dir)
+            self._restore_state()
+
+    def _journal(self, event_type, **data):
+        """Añade un evento al diario si el estado es persistente"""
+        if self.store is not None:
+            self.store.append(event_type, **data)
+
+    def _state(self):
+        """
+        Estado completo del trader para una instantánea
+
+        Returns:
+            tuple: (estado escalar, ventanas de velas por temporalidad)
+        """
+        with self.performance_lock:
+            performance = self.performance.to_dict()
+        state = {
+            'symbol': self.symbol,
+            'trading_enabled': self.trading_enabled,
+            'current_position': self.current_position,
+            'capital': self.capital,
+            'last_signal_time': {tf: int(ts.value // 1_000_000) for tf, ts in self.last_signal_time.items()},
+            'performance': performance,
+            'exchange': self.exchange.to_dict() if self.owns_exchange else None
+        }
+        return state, {tf: np.array(buffer.records()) for tf, buffer in self.candles.items()}
+
+    def save_state(self):
+        """Guarda una instantánea del estado y reinicia el diario"""
+        if self.store is not None:
+            self.store.save_snapshot(self._state)
+
+    def _restore_state(self):
+        """Retoma la última instantánea y reproduce los eventos del diario posteriores"""
+        state, arrays, events = self.store.load()
+        if state is not None:
+            if state['symbol'] != self.symbol:
+                raise ValueError(f"El estado guardado es de {state['symbol']}, no de {self.symbol}")
+            self.trading_enabled = state['trading_enabled']
+            self.current_position = state['current_position']
+            self.capital = state['capital']
+            self.last_signal_time = {tf: pd.Timestamp(ms, unit='ms') for tf, ms in state['last_signal_time'].items()}
+            self.performance = PerformanceTracker.from_dict(state['performance'])
+            if state['exchange'] is not None and self.owns_exchange:
+                self.exchange.restore(state['exchange'])
+            for tf, records in arrays.items():
+                if tf in self.candles:
+                    self.candles[tf].append(records['timestamp'], np.column_stack([records[c] for c in OHLCV_COLUMNS]))
+
+        for event in events:
+            kind = event['type']
+            if kind == 'candles' and event['timeframe'] in self.candles:
+                rows = np.asarray(event['rows'], dtype=np.float64).reshape(-1, 1 + len(OHLCV_COLUMNS))
+                self.candles[event['timeframe']].append(rows[:, 0].astype(np.int64), rows[:, 1:])
+            elif kind == 'signal':
+                self.last_signal_time[event['timeframe']] = pd.Timestamp(event['time'], unit='ms')
+            elif kind == 'trading':
+                self.trading_enabled = event['enabled']
+            elif kind == 'trade':
+                self.current_position = event['position']
+                self.capital = event['capital']
+                if event['pnl'] is not None:
+                    self.performance.record_trade(event['pnl'])
+                if event['fill'] is not None and self.owns_exchange:
+                    self.exchange.apply_fill(event['fill'])
+
+    def _maybe_snapshot(self):
+        """Guarda una instantánea si el diario ha crecido lo suficiente"""
+        if self.store is not None and self.store.needs_snapshot():
+            self.save_state()
+
+    def _finish_run(self):
+        """Al detenerse se guarda una instantánea"""
+        self.save_state()
+
+    def _set_trading_enabled(self, enabled):
+        """Cambia y registra el estado de la ejecución de operaciones"""
+        self.trading_enabled = enabled
+        self._journal('trading', enabled=enabled)
+
+    async def _execute_order(self, symbol, direction, decided_at):
+        """Ejecuta una orden de la cola (siempre del propio par)"""
+        await self._execute_trade(direction, decided_at)
+
+    def _fetch_candles(self, tf, now_ms):
+        """
+        Añade a la ventana de la temporalidad las velas cerradas que aún no tiene
+
+        La primera vez descarga la ventana completa; después, solo desde la vela
+        siguiente a la última guardada.
+
+        Args:
+            tf: Temporalidad
+            now_ms: Hora del servidor (ms); las velas que aún no han cerrado se descartan
+
+        Returns:
+            CandleBuffer: Ventana actualizada
+        """
+        buffer = self.candles[tf]
+        duration = timeframe_ms(tf)
+        last = buffer.last_timestamp()
+        if last is None:
+            since = next_close(tf, now_ms) - (buffer.capacity + 1) * duration
+        else:
+            since = last + duration
+        if since + duration > now_ms:
+            CACHE_REQUESTS.inc(source='buffer', result='hit')
+            return buffer
+        CACHE_REQUESTS.inc(source='buffer', result='miss' if last is None else 'partial')
+
+        # Con zona UTC: get_price_data usa .timestamp(), que leería una fecha sin zona como hora local
+        start_date = pd.Timestamp(since, unit='ms', tz='UTC').to_pydatetime()
+        df = get_price_data(self.symbol, tf, start_date=start_date, client=self.data_client)
+        if not df.empty:
+            timestamps = df.index.as_unit('ms').asi8
+            closed = timestamps + duration <= now_ms
+            added = buffer.append(timestamps[closed], df[OHLCV_COLUMNS].to_numpy(dtype=float)[closed])
+            if added:
+                rows = buffer.records()[-min(added, len(buffer)):]
+                self._journal('candles', timeframe=tf, rows=[list(row) for row in rows.tolist()])
+        return buffer
+
+    async def _analyze_timeframe(self, tf, now_ms):
+        """
+        Actualiza y analiza las velas cerradas de una temporalidad
+
+        Args:
+            tf: Temporalidad
+            now_ms: Hora del servidor (ms) del cierre
+
+        Returns:
+            tuple: (señal, fuerza, último precio)
+        """
+        buffer = await self.rate_limiter.call(self._fetch_candles, tf, now_ms)
+        if len(buffer) == 0:
+            raise ValueError(f"Sin velas cerradas para {self.symbol} en {tf}")
+        df = buffer.frame()
+        signal, strength = await asyncio.to_thread(check_macd_signal, df, tf)
+        return signal, strength, df['close'].iloc[-1]
+
+    async def _analyze_market(self, timeframes, now_ms):
+        """
+        Analiza a la vez las temporalidades indicadas y genera señales
+
+        Args:
+            timeframes: Temporalidades cuya vela acaba de cerrar
+            now_ms: Hora del servidor (ms) del cierre
+        """
+        started = time.perf_counter()
+        current_time = pd.Timestamp(now_ms, unit='ms')
+        results = await asyncio.gather(
+            *(self._analyze_timeframe(tf, now_ms) for tf in timeframes), return_exceptions=True
+        )
+
+        # Señales y decisión del ciclo se notifican en un solo mensaje
+        digest = self.notifier.digest(self.symbol)
+        signals = []
+        for tf, result in zip(timeframes, results):
+            if isinstance(result, Exception):
+                ERRORS.inc(stage='analysis')
+                digest.add_error(str(result), f"Error en análisis de {tf}")
+                continue
+            signal, strength, price = result
+            digest.add_signal(tf, signal, strength, price)
+            if signal != 'hold':
+                signals.append({
+                    'timeframe': tf,
+                    'signal': signal,
+                    'strength': strength,
+                    'weight': TIMEFRAMES[tf]
+                })
+                self.last_signal_time[tf] = current_time
+                self._journal('signal', timeframe=tf, time=now_ms)
+
+        digest.set_summary(*self._process_signals(signals))
+        TICK_TO_DECISION_SECONDS.observe(max(self.scheduler.now() - now_ms, 0) / 1000)
+        CYCLE_SECONDS.observe(time.perf_counter() - started)
+        self.notifier.send_digest(digest)
+        self._maybe_snapshot()
+
+    async def _update_performance(self):
+        """Valora el capital a mercado y actualiza las métricas en curso"""
+        equity = self.capital
+        position = self.current_position
+        if position:
+            ticker = await self.rate_limiter.call(self.exchange.fetch_ticker, self.symbol)
+            direction = 1 if position['type'] == 'long' else -1
+            equity += direction * position['size'] * (ticker['last'] - position['entry_price'])
+        with self.performance_lock:
+            self.performance.update_equity(equity)
+
+    def get_performance(self):
+        """Retorna las métricas actuales de la sesión (P&L, drawdown, Sharpe, operaciones)"""
+        with self.performance_lock:
+            return self.performance.snapshot()
+
+    @telemetry.timed(DECISION_SECONDS)
     def _process_signals(self, signals):
-        """Procesa las señales y ejecuta operaciones si es apropiado"""
+        """
+        Pondera las señales y, si el trading está habilitado, encola la operación
+
+        Returns:
+            tuple: (peso de compra, peso de venta, decisión)
+        """
         peso_buy = 0
         peso_sell = 0
-        
+
         for signal in signals:
             peso_signal = SIGNAL_WEIGHTS.get(signal['signal'], 0) * signal['strength']
-            
+
             if signal['signal'] in ['buy', 'valley_buy']:
                 peso_buy += signal['weight'] * peso_signal
             elif signal['signal'] in ['sell', 'top_sell']:
                 peso_sell += signal['weight'] * peso_signal
-        
+
         # Ejecutar operación si se supera el umbral
         if peso_buy - peso_sell >= SIGNAL_THRESHOLD:
-            self._execute_trade('buy')
+            direction, decision = 'buy', "📈 LONG"
         elif peso_sell - peso_buy >= SIGNAL_THRESHOLD:
-            self._execute_trade('sell')
-    
-    def _execute_trade(self, direction):
-        """Ejecuta una operación en el mercado"""
+            direction, decision = 'sell', "📉 SHORT"
+        else:
+            direction, decision = None, "⏳ WAIT"
+        if direction and self.trading_enabled:
+            self.order_queue.put_nowait((self.symbol, direction, time.perf_counter()))
+        return peso_buy, peso_sell, decision
+
+    async def _execute_trade(self, direction, decided_at):
+        """
+        Ejecuta una operación en el mercado con una orden de mercado
+
+        Solo largos (spot): 'buy' abre una posición si no hay ninguna y 'sell'
+        cierra la abierta. Registra la latencia desde la decisión hasta la
+        ejecución.
+
+        Args:
+            direction: 'buy' o 'sell'
+            decided_at: Instante de la decisión (time.perf_counter())
+
+        Returns:
+            dict: Orden enviada, o None si no se envió ninguna
+        """
         if not self.trading_enabled:
-            return
-        
+            return None
+
+        position = self.current_position
         try:
-            # Aquí iría la lógica de ejecución de órdenes
-            # Por ahora solo notificamos
-            self.notifier.send_message(
-                f"🔄 Señal de {direction.upper()} detectada en {self.symbol}\n"
-                "⚠️ Ejecución automática pendiente de implementar"
+            if direction == 'buy' and position is None:
+                ticker = await self.rate_limiter.call(self.exchange.fetch_ticker, self.symbol)
+                max_position_size = self.risk_config.get('max_position_size', DEFAULT_RISK_CONFIG['max_position_size'])
+                amount = self.capital * max_position_size / ticker['last']
+                order = await self.rate_limiter.call(self.exchange.create_order, self.symbol, 'market', 'buy', amount)
+            elif direction == 'sell' and position is not None:
+                order = await self.rate_limiter.call(
+                    self.exchange.create_order, self.symbol, 'market', 'sell', position['size']
+                )
+            else:
+                return None
+
+            latency = time.perf_counter() - decided_at
+            ORDER_SECONDS.observe(latency)
+            latency_ms = latency * 1000
+            self.fill_latencies.append(latency_ms)
+            if order['status'] != 'closed':
+                self.notifier.send_message(
+                    f"⏳ Orden {order['id']} de {direction.upper()} en {self.symbol}: {order['status']}"
+                )
+                return order
+
+            filled, price, fee = order_fill(order)
+            if price is None:
+                # La respuesta de create_order no trae el precio: se consulta la orden ya ejecutada
+                order = await self.rate_limiter.call(self.exchange.fetch_order, order['id'], self.symbol)
+                filled, price, fee = order_fill(order)
+            if price is None:
+                raise ValueError(f"La orden {order['id']} se ejecutó pero el exchange no informa del precio")
+
+            if direction == 'buy':
+                self.current_position = {
+                    'type': 'long',
+                    'size': filled,
+                    'entry_price': price,
+                    'entry_fee': fee
+                }
+                pnl = None
+                message = f"🟢 Compra de {filled:.6f} {self.symbol} a ${price:,.2f}"
+            else:
+                pnl = position['size'] * (price - position['entry_price']) - position['entry_fee'] - fee
+                self.capital += pnl
+                self.current_position = None
+                with self.performance_lock:
+                    self.performance.record_trade(pnl)
+                message = f"🔴 Venta de {filled:.6f} {self.symbol} a ${price:,.2f} (P&L: ${pnl:,.2f})"
+
+            # El diario solo guarda lo que cambia la orden; el estado completo del exchange va en las instantáneas
+            self._journal(
+                'trade', position=self.current_position, capital=self.capital, pnl=pnl,
+                fill=self.exchange.fill_delta(order['id']) if self.owns_exchange else None
             )
-        
+            self.notifier.send_message(f"{message}\n⚡ Decisión → ejecución: {latency_ms:.1f} ms")
+            return order
+
         except Exception as e:
+            ERRORS.inc(stage='order')
             self.notifier.send_error(str(e), "Error al ejecutar operación")
-    
-    def _get_min_interval(self, timeframe):
-        """Obtiene el intervalo mínimo entre análisis según el timeframe"""
-        # Convertir timeframe a segundos
-        tf_multipliers = {
-            '15m': 900,    # 15 * 60
-            '30m': 1800,   # 30 * 60
-            '1h': 3600,    # 60 * 60
-            '4h': 14400,   # 4 * 60 * 60
-            '1d': 86400,   # 24 * 60 * 60
-            '3d': 259200   # 3 * 24 * 60 * 60
-        }
-        
-        # Retornar 1/4 del timeframe como intervalo mínimo
-        return tf_multipliers.get(timeframe, 3600) / 4 
\ No newline at end of file
+            return None
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Trading en vivo de muchos pares desde un solo proceso
+
+Todos los pares comparten un cliente de exchange (y su PaperExchange), un
+cliente de datos, un limitador de peticiones, el planificador de cierres de
+vela y el notificador, y corren en un único bucle de eventos: no hay un hilo
+por par. En cada cierre se evalúan a la vez todos los pares para las
+temporalidades que han cerrado juntas.
+
+El estado de cada par (ventanas de velas, posición, métricas) vive en un
+LiveTrader que no arranca hilo, bucle ni tareas propias: MultiSymbolTrader le
+pasa los cierres y le ejecuta las órdenes. Con state_dir cada par guarda su
+estado en un subdirectorio y el PaperExchange común en '_exchange' (el diario
+registra los cambios de cada orden y las instantáneas el estado completo).
+"""
+
+import os
+import asyncio
+import ccxt
+from trading.live_trader import LiveTrader, TradingService
+from trading.paper_exchange import PaperExchange
+from trading.rate_limiter import AsyncRateLimiter, DEFAULT_RATE, DEFAULT_CONCURRENCY
+from trading.scheduler import CandleCloseScheduler
+from trading.state_store import TraderStateStore
+from utils.telegram_notifications import TelegramNotifier
+from config import TIMEFRAMES
+
+class MultiSymbolTrader(TradingService):
+    def __init__(self, exchange_client, symbols, risk_config=None, initial_capital=1000.0, paper=True,
+                 data_exchange='kraken', rate=DEFAULT_RATE, max_concurrent=DEFAULT_CONCURRENCY, state_dir=None):
+        """
+        Inicializa el trader multi-par
+
+        Args:
+            exchange_client: Cliente del exchange compartido por todos los pares
+            symbols: Pares a operar (ej. ['BTC/USDT', 'ETH/USDT'])
+            risk_config: Configuración de gestión de riesgo (común a todos los pares)
+            initial_capital: Capital total, repartido a partes iguales entre los pares (por defecto 1000.0)
+            paper: Enviar las órdenes a un PaperExchange común (por defecto True)
+            data_exchange: Exchange de ccxt del que se descargan las velas (por defecto 'kraken')
+            rate: Peticiones por segundo como máximo entre todos los pares
+            max_concurrent: Peticiones simultáneas como máximo entre todos los pares
+            state_dir: Directorio del estado persistente (None para no guardarlo)
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            raise ValueError("Se necesita al menos un par")
+        capital = initial_capital / len(symbols)
+        self.owns_exchange = paper and not isinstance(exchange_client, PaperExchange)
+        if self.owns_exchange:
+            balances = {}
+            for symbol in symbols:
+                quote = symbol.split('/')[1]
+                balances[quote] = balances.get(quote, 0.0) + capital
+            exchange_client = PaperExchange(balances, market_data=exchange_client)
+
+        super().__init__(
+            TelegramNotifier(),
+            CandleCloseScheduler(TIMEFRAMES, server_time=getattr(exchange_client, 'fetch_time', None))
+        )
+        self.exchange = exchange_client
+        self.rate_limiter = AsyncRateLimiter(rate, max_concurrent)
+        self.data_client = getattr(ccxt, data_exchange)()
+        self.traders = {
+            symbol: LiveTrader(
+                exchange_client, symbol, risk_config, capital, paper=False,
+                notifier=self.notifier, scheduler=self.scheduler,
+                rate_limiter=self.rate_limiter, data_client=self.data_client,
+                state_dir=os.path.join(state_dir, symbol.replace('/', '_')) if state_dir else None
+            )
+            for symbol in symbols
+        }
+
+        self.store = None
+        if state_dir is not None and self.owns_exchange:
+            self.store = TraderStateStore(os.path.join(state_dir, '_exchange'))
+            state, _, events = self.store.load()
+            if state is not None:
+                self.exchange.restore(state['exchange'])
+            for event in events:
+                self.exchange.apply_fill(event['fill'])
+        self.trading_enabled = any(trader.trading_enabled for trader in self.traders.values())
+
+    def _exchange_state(self):
+        """Estado del exchange común para una instantánea"""
+        return {'exchange': self.exchange.to_dict()}, {}
+
+    def _prepare_run(self):
+        """Los pares encolan sus órdenes en la cola común"""
+        for trader in self.traders.values():
+            trader.order_queue = self.order_queue
+
+    def _finish_run(self):
+        """Al detenerse se guarda una instantánea de cada par y del exchange común"""
+        for trader in self.traders.values():
+            trader.save_state()
+        if self.store is not None:
+            self.store.save_snapshot(self._exchange_state)
+
+    def _set_trading_enabled(self, enabled):
+        """Activa o desactiva la ejecución de operaciones en todos los pares"""
+        for trader in self.traders.values():
+            trader._set_trading_enabled(enabled)
+        self.trading_enabled = enabled
+
+    async def _analyze_market(self, timeframes, now_ms):
+        """
+        Evalúa a la vez todos los pares en las temporalidades que acaban de cerrar
+
+        Args:
+            timeframes: Temporalidades cuya vela acaba de cerrar
+            now_ms: Hora del servidor (ms) del cierre
+        """
+        results = await asyncio.gather(
+            *(trader._analyze_market(timeframes, now_ms) for trader in self.traders.values()),
+            return_exceptions=True
+        )
+        for symbol, result in zip(self.traders, results):
+            if isinstance(result, Exception):
+                self.notifier.send_error(str(result), f"Error en análisis de {symbol}")
+
+    async def _execute_order(self, symbol, direction, decided_at):
+        """Ejecuta una orden de la cola común en el par que la decidió"""
+        order = await self.traders[symbol]._execute_trade(direction, decided_at)
+        if self.store is not None and order is not None:
+            # Solo lo que cambia la orden; el estado completo del exchange va en las instantáneas
+            self.store.append('fill', fill=self.exchange.fill_delta(order['id']))
+            if self.store.needs_snapshot():
+                self.store.save_snapshot(self._exchange_state)
+
+    async def _update_performance(self):
+        """Valora todos los pares a mercado"""
+        results = await asyncio.gather(
+            *(trader._update_performance() for trader in self.traders.values()),
+            return_exceptions=True
+        )
+        for symbol, result in zip(self.traders, results):
+            if isinstance(result, Exception):
+                self.notifier.send_error(str(result), f"Error al valorar {symbol}")
+
+    def get_performance(self):
+        """Métricas actuales de la sesión por par"""
+        return {symbol: trader.get_performance() for symbol, trader in self.traders.items()}
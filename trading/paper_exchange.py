@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+Exchange simulado para paper trading
+
+Implementa el subconjunto de la API de ccxt que usa el trader (create_order,
+cancel_order, fetch_order, fetch_open_orders, fetch_balance, fetch_my_trades,
+fetch_ticker y fetch_time) con saldos y órdenes locales, de modo que
+LiveTrader envía órdenes reales sin tocar una cuenta.
+
+Los precios salen de un cliente de datos de mercado (p. ej. ccxt.binance()
+sin credenciales) o de velas reproducidas con process_candle/replay. El motor
+de casamiento ejecuta:
+    - Órdenes de mercado al momento, al último precio más/menos medio spread
+      (una venta sin precio conocido queda pendiente hasta la siguiente vela,
+      que la ejecuta a la apertura).
+    - Órdenes límite al momento si cruzan el spread; si no, cuando una vela
+      alcanza el precio (a la apertura si la vela abre ya más allá del límite).
+"""
+
+import threading
+import time
+import ccxt
+import pandas as pd
+
+# Comisión por operación (fracción del importe, cobrada en la divisa de cotización)
+DEFAULT_FEE_RATE = 0.001
+
+# Spread simulado del libro de órdenes (puntos básicos)
+DEFAULT_SPREAD_BPS = 2.0
+
+def _local_ms():
+    """Hora local en milisegundos desde epoch"""
+    return int(time.time() * 1000)
+
+class PaperExchange:
+    """
+    Exchange local con la interfaz de ccxt para paper trading
+    """
+
+    def __init__(self, balances=None, market_data=None, fee_rate=DEFAULT_FEE_RATE,
+                 spread_bps=DEFAULT_SPREAD_BPS, clock=_local_ms):
+        """
+        Args:
+            balances: Saldo inicial por divisa (ej. {'USDT': 1000.0})
+            market_data: Cliente ccxt del que se toman ticker y hora (None para usar solo velas reproducidas)
+            fee_rate: Comisión por operación (por defecto DEFAULT_FEE_RATE)
+            spread_bps: Spread simulado en puntos básicos (por defecto DEFAULT_SPREAD_BPS)
+            clock: Reloj en ms para las órdenes
+        """
+        self.market_data = market_data
+        self.fee_rate = fee_rate
+        self.half_spread = spread_bps / 20_000
+        self.clock = clock
+        self.free = {currency: float(amount) for currency, amount in (balances or {}).items()}
+        self.used = {currency: 0.0 for currency in self.free}
+        self.last_prices = {}
+        self.orders = {}
+        self.trades = []
+        self._reserved = {}
+        self._next_id = 1
+        self._lock = threading.RLock()
+
+    # --- Datos de mercado ---
+
+    def fetch_ticker(self, symbol):
+        """Ticker del cliente de datos o, sin él, el último cierre reproducido"""
+        if self.market_data is not None:
+            ticker = self.market_data.fetch_ticker(symbol)
+            self.last_prices[symbol] = ticker['last']
+            return ticker
+        if symbol not in self.last_prices:
+            raise ccxt.BadSymbol(f"Sin precio para {symbol}")
+        last = self.last_prices[symbol]
+        return {
+            'symbol': symbol,
+            'last': last,
+            'bid': last * (1 - self.half_spread),
+            'ask': last * (1 + self.half_spread)
+        }
+
+    def fetch_time(self):
+        """Hora del servidor del cliente de datos o del reloj local"""
+        if self.market_data is not None and hasattr(self.market_data, 'fetch_time'):
+            return self.market_data.fetch_time()
+        return self.clock()
+
+    # --- Órdenes ---
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        """
+        Crea una orden ('market' o 'limit', 'buy' o 'sell') y la ejecuta si es posible
+
+        Returns:
+            dict: Orden con la estructura de ccxt (status 'open', 'closed' o 'rejected')
+        """
+        if type not in ('market', 'limit'):
+            raise ccxt.InvalidOrder(f"Tipo de orden no soportado: {type}")
+        if side not in ('buy', 'sell'):
+            raise ccxt.InvalidOrder(f"Lado de orden no válido: {side}")
+        if amount is None or amount <= 0:
+            raise ccxt.InvalidOrder(f"Cantidad no válida: {amount}")
+        if type == 'limit' and (price is None or price <= 0):
+            raise ccxt.InvalidOrder("Las órdenes límite necesitan precio")
+
+        quote_price = self._quote(symbol, side)
+        reference = quote_price if type == 'market' else price
+
+        with self._lock:
+            base, quote = symbol.split('/')
+            if side == 'buy':
+                currency = quote
+                if reference is None:
+                    raise ccxt.InvalidOrder(f"Sin precio para calcular el coste de la orden en {symbol}")
+                reserve = amount * reference * (1 + self.fee_rate)
+            else:
+                currency, reserve = base, amount
+            if self.free.get(currency, 0.0) < reserve:
+                raise ccxt.InsufficientFunds(
+                    f"Saldo insuficiente de {currency}: {self.free.get(currency, 0.0):.8f} < {reserve:.8f}"
+                )
+            self._move(currency, reserve, to_used=True)
+
+            timestamp = self.clock()
+            order_id = str(self._next_id)
+            self._next_id += 1
+            order = {
+                'id': order_id,
+                'clientOrderId': (params or {}).get('clientOrderId'),
+                'timestamp': timestamp,
+                'datetime': pd.Timestamp(timestamp, unit='ms').isoformat(),
+                'lastTradeTimestamp': None,
+                'symbol': symbol,
+                'type': type,
+                'side': side,
+                'price': price,
+                'amount': amount,
+                'filled': 0.0,
+                'remaining': amount,
+                'cost': 0.0,
+                'average': None,
+                'status': 'open',
+                'fee': {'cost': 0.0, 'currency': quote},
+                'trades': []
+            }
+            self.orders[order_id] = order
+            self._reserved[order_id] = (currency, reserve)
+
+            fill_price = self._marketable_price(order, quote_price)
+            if fill_price is not None:
+                self._fill(order, fill_price, timestamp)
+            return dict(order)
+
+    def cancel_order(self, id, symbol=None, params=None):
+        """Cancela una orden abierta y libera el saldo reservado"""
+        with self._lock:
+            order = self.orders.get(id)
+            if order is None or order['status'] != 'open':
+                raise ccxt.OrderNotFound(f"Orden {id} no encontrada o ya cerrada")
+            currency, reserve = self._reserved.pop(id)
+            self._move(currency, reserve, to_used=False)
+            order['status'] = 'canceled'
+            return dict(order)
+
+    def fetch_order(self, id, symbol=None, params=None):
+        """Estado actual de una orden"""
+        with self._lock:
+            if id not in self.orders:
+                raise ccxt.OrderNotFound(f"Orden {id} no encontrada")
+            return dict(self.orders[id])
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        """Órdenes abiertas (opcionalmente de un par y desde una fecha en ms)"""
+        with self._lock:
+            orders = [
+                dict(order) for order in self.orders.values()
+                if order['status'] == 'open'
+                and (symbol is None or order['symbol'] == symbol)
+                and (since is None or order['timestamp'] >= since)
+            ]
+        return orders[-limit:] if limit else orders
+
+    def fetch_balance(self, params=None):
+        """Saldos con la estructura de ccxt (free, used y total por divisa)"""
+        with self._lock:
+            balance = {'free': {}, 'used': {}, 'total': {}}
+            for currency in self.free:
+                free, used = self.free[currency], self.used[currency]
+                entry = {'free': free, 'used': used, 'total': free + used}
+                balance[currency] = entry
+                for key in ('free', 'used', 'total'):
+                    balance[key][currency] = entry[key]
+            return balance
+
+    def fetch_my_trades(self, symbol=None, since=None, limit=None, params=None):
+        """Ejecuciones realizadas"""
+        with self._lock:
+            trades = [
+                dict(trade) for trade in self.trades
+                if (symbol is None or trade['symbol'] == symbol)
+                and (since is None or trade['timestamp'] >= since)
+            ]
+        return trades[-limit:] if limit else trades
+
+    # --- Estado ---
+
+    def to_dict(self):
+        """Estado serializable (saldos, órdenes y ejecuciones) para retomar la sesión"""
+        with self._lock:
+            return {
+                'free': dict(self.free),
+                'used': dict(self.used),
+                'last_prices': dict(self.last_prices),
+                'orders': {order_id: dict(order) for order_id, order in self.orders.items()},
+                'trades': list(self.trades),
+                'reserved': {order_id: list(reserve) for order_id, reserve in self._reserved.items()},
+                'next_id': self._next_id
+            }
+
+    def restore(self, state):
+        """Restaura el estado guardado con to_dict()"""
+        with self._lock:
+            self.free = dict(state['free'])
+            self.used = dict(state['used'])
+            self.last_prices = dict(state['last_prices'])
+            self.orders = {order_id: dict(order) for order_id, order in state['orders'].items()}
+            self.trades = list(state['trades'])
+            self._reserved = {order_id: tuple(reserve) for order_id, reserve in state['reserved'].items()}
+            self._next_id = state['next_id']
+
+    def fill_delta(self, order_id):
+        """
+        Cambios de estado de una orden para el diario: saldos, la orden y sus ejecuciones
+
+        Es mucho más pequeño que to_dict(), que crece con cada orden de la sesión
+        y se reserva para las instantáneas.
+        """
+        with self._lock:
+            order = dict(self.orders[order_id])
+            reserve = self._reserved.get(order_id)
+            return {
+                'free': dict(self.free),
+                'used': dict(self.used),
+                'order': order,
+                'trades': list(order['trades']),
+                'reserved': list(reserve) if reserve is not None else None,
+                'next_id': self._next_id
+            }
+
+    def apply_fill(self, delta):
+        """Aplica un cambio guardado con fill_delta() sobre el estado actual"""
+        with self._lock:
+            order = dict(delta['order'])
+            self.free = dict(delta['free'])
+            self.used = dict(delta['used'])
+            self.orders[order['id']] = order
+            known = {trade['id'] for trade in self.trades}
+            self.trades += [trade for trade in delta['trades'] if trade['id'] not in known]
+            if delta['reserved'] is not None:
+                self._reserved[order['id']] = tuple(delta['reserved'])
+            else:
+                self._reserved.pop(order['id'], None)
+            self._next_id = max(self._next_id, delta['next_id'])
+
+    # --- Motor de casamiento ---
+
+    def process_candle(self, symbol, timestamp, open, high, low, close):
+        """
+        Casa las órdenes abiertas del par con una vela y actualiza el último precio
+
+        Args:
+            timestamp: Apertura de la vela (ms)
+
+        Returns:
+            list: Órdenes ejecutadas en la vela
+        """
+        filled = []
+        with self._lock:
+            for order in list(self.orders.values()):
+                if order['status'] != 'open' or order['symbol'] != symbol:
+                    continue
+                price = None
+                if order['type'] == 'market':
+                    price = open * (1 + self.half_spread if order['side'] == 'buy' else 1 - self.half_spread)
+                elif order['side'] == 'buy' and low <= order['price']:
+                    price = min(open, order['price'])
+                elif order['side'] == 'sell' and high >= order['price']:
+                    price = max(open, order['price'])
+                if price is not None:
+                    self._fill(order, price, timestamp)
+                    filled.append(dict(order))
+            self.last_prices[symbol] = close
+        return filled
+
+    def replay(self, symbol, df):
+        """
+        Reproduce velas OHLCV (DataFrame indexado por fecha) casando las órdenes abiertas
+
+        Returns:
+            list: Órdenes ejecutadas
+        """
+        filled = []
+        timestamps = df.index.as_unit('ms').asi8
+        for timestamp, (open_, high, low, close) in zip(timestamps, df[['open', 'high', 'low', 'close']].to_numpy()):
+            filled += self.process_candle(symbol, int(timestamp), open_, high, low, close)
+        return filled
+
+    def _quote(self, symbol, side):
+        """Precio al que se ejecutaría ahora una orden de mercado (None sin precio conocido)"""
+        if self.market_data is not None:
+            self.fetch_ticker(symbol)
+        last = self.last_prices.get(symbol)
+        if last is None:
+            return None
+        return last * (1 + self.half_spread if side == 'buy' else 1 - self.half_spread)
+
+    def _marketable_price(self, order, quote):
+        """Precio de ejecución inmediata de una orden nueva o None si queda en el libro"""
+        if quote is None:
+            return None
+        if order['type'] == 'market':
+            return quote
+        if order['side'] == 'buy' and quote <= order['price']:
+            return quote
+        if order['side'] == 'sell' and quote >= order['price']:
+            return quote
+        return None
+
+    def _move(self, currency, amount, to_used):
+        """Mueve saldo entre libre y reservado"""
+        self.free.setdefault(currency, 0.0)
+        self.used.setdefault(currency, 0.0)
+        sign = 1 if to_used else -1
+        self.free[currency] -= sign * amount
+        self.used[currency] += sign * amount
+
+    def _fill(self, order, price, timestamp):
+        """Ejecuta la orden completa a un precio y liquida los saldos"""
+        base, quote = order['symbol'].split('/')
+        amount = order['amount']
+        cost = amount * price
+        fee = cost * self.fee_rate
+
+        currency, reserve = self._reserved.pop(order['id'])
+        self._move(currency, reserve, to_used=False)
+        if order['side'] == 'buy':
+            if self.free[quote] < cost + fee:
+                order['status'] = 'rejected'
+                return
+            self.free[quote] -= cost + fee
+            self.free[base] = self.free.get(base, 0.0) + amount
+            self.used.setdefault(base, 0.0)
+        else:
+            self.free[base] -= amount
+            self.free[quote] = self.free.get(quote, 0.0) + cost - fee
+            self.used.setdefault(quote, 0.0)
+
+        trade = {
+            'id': str(len(self.trades) + 1),
+            'order': order['id'],
+            'timestamp': timestamp,
+            'datetime': pd.Timestamp(timestamp, unit='ms').isoformat(),
+            'symbol': order['symbol'],
+            'type': order['type'],
+            'side': order['side'],
+            'price': price,
+            'amount': amount,
+            'cost': cost,
+            'fee': {'cost': fee, 'currency': quote}
+        }
+        self.trades.append(trade)
+        order.update({
+            'filled': amount,
+            'remaining': 0.0,
+            'cost': cost,
+            'average': price,
+            'status': 'closed',
+            'lastTradeTimestamp': timestamp,
+            'fee': {'cost': fee, 'currency': quote},
+            'trades': [trade]
+        })
\ No newline at end of file
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Limitador de peticiones al exchange para el núcleo asíncrono
+
+Reparte las peticiones de todas las tareas (y de todos los pares cuando se
+comparte) en huecos separados 1/rate segundos y limita cuántas están en curso
+a la vez, de modo que muchas temporalidades y pares que cierran juntos no
+superan el límite de la API.
+"""
+
+import asyncio
+import time
+
+# Peticiones por segundo y peticiones simultáneas por defecto
+DEFAULT_RATE = 10.0
+DEFAULT_CONCURRENCY = 8
+
+class AsyncRateLimiter:
+    """
+    Limitador por intervalo mínimo y concurrencia máxima (async with limiter: ...)
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, max_concurrent=DEFAULT_CONCURRENCY, clock=time.monotonic):
+        """
+        Args:
+            rate: Peticiones por segundo como máximo (por defecto DEFAULT_RATE)
+            max_concurrent: Peticiones en curso como máximo (por defecto DEFAULT_CONCURRENCY)
+            clock: Reloj monótono en segundos
+        """
+        self.interval = 1 / rate
+        self.max_concurrent = max_concurrent
+        self.clock = clock
+        self.requests = 0
+        self._next_slot = 0.0
+        self._semaphore = None
+        self._loop = None
+
+    async def __aenter__(self):
+        # El semáforo pertenece a un bucle de eventos: se crea en el bucle en uso
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.max_concurrent)
+        await self._semaphore.acquire()
+        now = self.clock()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        self.requests += 1
+        if slot > now:
+            try:
+                await asyncio.sleep(slot - now)
+            except asyncio.CancelledError:
+                self._semaphore.release()
+                raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+        return False
+
+    async def call(self, func, *args, **kwargs):
+        """Ejecuta una llamada bloqueante en un hilo respetando el límite"""
+        async with self:
+            return await asyncio.to_thread(func, *args, **kwargs)
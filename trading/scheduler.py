@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Planificador alineado con el cierre de las velas
+
+Calcula, con la hora del servidor del exchange, el próximo cierre de vela de
+cada temporalidad y despierta justo entonces (más un pequeño margen para que
+el exchange publique la vela), indicando qué temporalidades han cerrado. Así
+cada temporalidad se descarga y evalúa una sola vez por vela, en cuanto cierra.
+"""
+
+import asyncio
+import time
+from config import TIMEFRAME_MINUTES
+
+# Margen tras el cierre para que el exchange publique la vela (segundos)
+SETTLE_DELAY = 2.0
+
+# Segundos entre sincronizaciones con la hora del servidor
+CLOCK_SYNC_INTERVAL = 3600
+
+# Las velas semanales empiezan en lunes y el 1/1/1970 fue jueves
+ALIGNMENT_OFFSETS = {'1w': 4 * 24 * 60 * 60_000}
+
+def _local_ms():
+    """Hora local en milisegundos desde epoch"""
+    return int(time.time() * 1000)
+
+def timeframe_ms(timeframe):
+    """Duración de una vela en milisegundos"""
+    return TIMEFRAME_MINUTES[timeframe] * 60_000
+
+def next_close(timeframe, now_ms):
+    """Cierre (ms) de la vela de la temporalidad en curso en now_ms"""
+    duration = timeframe_ms(timeframe)
+    offset = ALIGNMENT_OFFSETS.get(timeframe, 0)
+    return ((now_ms - offset) // duration + 1) * duration + offset
+
+class CandleCloseScheduler:
+    """
+    Espera al siguiente cierre de vela de un conjunto de temporalidades
+    """
+
+    def __init__(self, timeframes, server_time=None, settle_delay=SETTLE_DELAY, clock=_local_ms):
+        """
+        Args:
+            timeframes: Temporalidades a planificar
+            server_time: Función sin argumentos que retorna la hora del servidor en ms
+                (ej. exchange.fetch_time); None para usar el reloj local
+            settle_delay: Segundos de margen tras cada cierre (por defecto SETTLE_DELAY)
+            clock: Reloj local en ms
+        """
+        self.timeframes = list(timeframes)
+        self.server_time = server_time
+        self.settle_delay = settle_delay
+        self.clock = clock
+        self.offset_ms = 0
+        self.last_sync = None
+
+    async def sync_clock(self):
+        """Estima el desfase con el reloj del servidor (compensando la mitad del tiempo de ida y vuelta)"""
+        if self.server_time is None:
+            return
+        before = self.clock()
+        server = await asyncio.to_thread(self.server_time)
+        after = self.clock()
+        self.offset_ms = int(server - (before + after) / 2)
+        self.last_sync = after
+
+    def now(self):
+        """Hora estimada del servidor en ms"""
+        return self.clock() + self.offset_ms
+
+    def next_batch(self, now_ms=None):
+        """
+        Próximo cierre y temporalidades que cierran en él
+
+        Returns:
+            tuple: (cierre en ms, lista de temporalidades)
+        """
+        now_ms = self.now() if now_ms is None else now_ms
+        closes = {tf: next_close(tf, now_ms) for tf in self.timeframes}
+        close_ms = min(closes.values())
+        return close_ms, [tf for tf in self.timeframes if closes[tf] == close_ms]
+
+    async def wait(self):
+        """
+        Duerme hasta el próximo cierre más el margen
+
+        Returns:
+            tuple: (cierre en ms, temporalidades cerradas)
+        """
+        if self.server_time is not None and (
+            self.last_sync is None or self.clock() - self.last_sync >= CLOCK_SYNC_INTERVAL * 1000
+        ):
+            try:
+                await self.sync_clock()
+            except Exception as e:
+                print(f"⚠️ No se pudo sincronizar con la hora del servidor: {str(e)}")
+
+        close_ms, closed = self.next_batch()
+        target = close_ms + self.settle_delay * 1000
+        # asyncio.sleep puede despertar unos milisegundos antes: se vuelve a comprobar
+        remaining = target - self.now()
+        while remaining > 0:
+            await asyncio.sleep(remaining / 1000)
+            remaining = target - self.now()
+        return close_ms, closed
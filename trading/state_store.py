@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Estado persistente del trader en vivo
+
+Cada cambio de estado (velas nuevas, señales, operaciones, activación del
+trading) se añade a un diario de solo escritura al final ('journal.jsonl', una
+línea JSON por evento). Cada cierto número de eventos se guarda una
+instantánea completa con save_engine_state ('state.json' + 'state.npz') y el
+diario vuelve a empezar. Al arrancar se carga la instantánea y se reproducen
+los eventos posteriores, así que un trader reiniciado retoma posiciones y
+ventanas de velas sin volver a descargar el histórico.
+"""
+
+import os
+import json
+import threading
+from backtesting.storage import save_engine_state, load_engine_state
+
+JOURNAL_FILE = 'journal.jsonl'
+
+# Eventos del diario entre instantáneas
+SNAPSHOT_EVERY = 500
+
+class TraderStateStore:
+    """
+    Diario de eventos más instantáneas periódicas en un directorio
+    """
+
+    def __init__(self, directory, snapshot_every=SNAPSHOT_EVERY):
+        """
+        Args:
+            directory: Directorio del estado (uno por trader)
+            snapshot_every: Eventos del diario tras los que conviene una instantánea
+        """
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.journal_path = os.path.join(directory, JOURNAL_FILE)
+        self.seq = 0
+        self.pending = 0
+        self._file = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self):
+        """
+        Carga la última instantánea y los eventos del diario posteriores a ella
+
+        Returns:
+            tuple: (estado o None, columnas, lista de eventos en orden)
+        """
+        saved = load_engine_state(self.directory)
+        state, arrays = saved if saved is not None else (None, {})
+        covered = state.get('journal_seq', 0) if state else 0
+
+        events = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Línea a medio escribir por una caída
+                        continue
+                    if event['seq'] > covered:
+                        events.append(event)
+
+        self.seq = max([covered] + [event['seq'] for event in events])
+        self.pending = len(events)
+        return state, arrays, events
+
+    def append(self, event_type, **data):
+        """Añade un evento al diario (se puede llamar desde cualquier hilo)"""
+        with self._lock:
+            self.seq += 1
+            if self._file is None:
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(dict(data, seq=self.seq, type=event_type)) + '\n')
+            self._file.flush()
+            self.pending += 1
+
+    def needs_snapshot(self):
+        """True si el diario ha acumulado snapshot_every eventos desde la última instantánea"""
+        return self.pending >= self.snapshot_every
+
+    def save_snapshot(self, capture):
+        """
+        Guarda una instantánea completa y reinicia el diario
+
+        El estado se toma con el diario bloqueado: un evento añadido desde otro
+        hilo queda o bien dentro de la instantánea (y de journal_seq) o bien en el
+        diario nuevo, nunca cubierto por journal_seq sin estar en el estado.
+
+        Args:
+            capture: Función sin argumentos que retorna (estado escalar serializable
+                en JSON, columnas numpy); no debe añadir eventos al diario
+        """
+        with self._lock:
+            state, arrays = capture()
+            save_engine_state(self.directory, dict(state, journal_seq=self.seq), arrays)
+            # Los eventos ya están en la instantánea (si se cae antes de vaciar el
+            # diario, journal_seq evita reproducirlos dos veces)
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.journal_path, 'w', encoding='utf-8')
+            self.pending = 0
+
+    def close(self):
+        """Cierra el diario"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -7,12 +7,36 @@ Created on Thu Apr 10 22:46:40 2025
 
 # utils/api_data.py
 
+import time
 import ccxt
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from utils import telemetry
+from config import TIMEFRAME_MINUTES
 
-def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limit=1000, exchange='kraken'):
+# Métricas de descarga (utils/telemetry.py)
+FETCH_SECONDS = telemetry.histogram('fetch_ohlcv_seconds', 'Duración de cada petición fetch_ohlcv')
+FETCHES = telemetry.counter('fetches_total', 'Peticiones fetch_ohlcv por exchange')
+ERRORS = telemetry.counter('errors_total', 'Errores por etapa')
+BUILD_SECONDS = telemetry.histogram('price_frame_seconds', 'Construcción del DataFrame de get_price_data')
+
+def timeframe_to_timedelta(timeframe):
+    """Convierte una temporalidad ('15m', '4h', '1d', ...) a timedelta"""
+    return timedelta(minutes=TIMEFRAME_MINUTES[timeframe])
+
+def warmup_start(start_date, timeframe, bars):
+    """
+    Fecha desde la que hay que pedir velas para tener 'bars' velas de calentamiento antes de start_date
+
+    Args:
+        start_date: Primera vela que se quiere evaluar
+        timeframe: Temporalidad de las velas
+        bars: Velas previas que necesitan los indicadores
+    """
+    return start_date - bars * timeframe_to_timedelta(timeframe)
+
+def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limit=1000, exchange='kraken', client=None):
     """
     Obtiene datos históricos de precios
 
@@ -22,9 +46,11 @@ def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limi
         start_date: Fecha de inicio (datetime o None)
         end_date: Fecha de fin (datetime o None)
         limit: Número máximo de velas a obtener
+        client: Cliente ccxt ya creado para reutilizar su conexión (None para crear uno de 'exchange')
     """
     try:
-        exchange_client = getattr(ccxt, exchange)()
+        exchange_client = client or getattr(ccxt, exchange)()
+        exchange = exchange_client.id
 
         # Asegurarse de que el símbolo esté en el formato correcto para Binance
         if exchange == 'binance' and '/' in symbol:
@@ -44,15 +70,8 @@ def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limi
 
         # Calcular el número de velas necesarias basado en el timeframe
         if start_ts and end_ts:
-            # Mapeo de timeframes a minutos
-            tf_map = {
-                '1m': 1, '3m': 3, '5m': 5, '15m': 15, '30m': 30,
-                '1h': 60, '2h': 120, '4h': 240, '6h': 360, '8h': 480,
-                '12h': 720, '1d': 1440, '3d': 4320, '1w': 10080
-            }
-
             # Obtener minutos de la temporalidad realmente solicitada al exchange
-            tf_minutes = tf_map.get(fetch_timeframe, 60)
+            tf_minutes = TIMEFRAME_MINUTES.get(fetch_timeframe, 60)
 
             # Calcular número de velas necesarias
             time_diff = (end_ts - start_ts) / (1000 * 60)  # diferencia en minutos
@@ -72,7 +91,9 @@ def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limi
         while True:
             try:
                 # Hacer la petición
-                ohlcv = exchange_client.fetch_ohlcv(symbol, timeframe=fetch_timeframe, since=current_ts, limit=limit)
+                FETCHES.inc(exchange=exchange)
+                with telemetry.timer(FETCH_SECONDS, exchange=exchange):
+                    ohlcv = exchange_client.fetch_ohlcv(symbol, timeframe=fetch_timeframe, since=current_ts, limit=limit)
 
                 if not ohlcv:
                     break
@@ -89,6 +110,7 @@ def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limi
                 current_ts = last_ts + 1
 
             except Exception as e:
+                ERRORS.inc(stage='fetch')
                 print(f"Error al obtener datos para {symbol} en {fetch_timeframe}: {e}")
                 break
 
@@ -97,6 +119,7 @@ def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limi
             return pd.DataFrame()
 
         # Convertir a DataFrame
+        build_started = time.perf_counter()
         df = pd.DataFrame(all_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         df = df.set_index('timestamp')
@@ -112,7 +135,9 @@ def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limi
         df = df.sort_index()
 
         if resample_to_3d and not df.empty:
-            df = df.resample('3D').agg({
+            # Bloques alineados a epoch: no dependen de la primera vela pedida, así
+            # que una descarga parcial (solo las velas nuevas) da las mismas barras
+            df = df.resample('3D', origin='epoch').agg({
                 'open': 'first',
                 'high': 'max',
                 'low': 'min',
@@ -120,9 +145,11 @@ def get_price_data(symbol, timeframe='15m', start_date=None, end_date=None, limi
                 'volume': 'sum'
             }).dropna()
 
+        BUILD_SECONDS.observe(time.perf_counter() - build_started)
         return df
 
     except Exception as e:
+        ERRORS.inc(stage='price_data')
         print(f"Error en get_price_data: {e}")
         return pd.DataFrame()
 
@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén local de velas OHLCV
+
+Guarda en disco las velas ya descargadas, por exchange, símbolo y temporalidad,
+en tramos: cada tramo es un archivo de filas de tamaño fijo que cubre un rango
+continuo, y un .json indica los tramos y su cobertura. Los rangos históricos
+solo se descargan una vez y después se piden al exchange únicamente las velas
+nuevas, que se añaden al final del tramo que continúan sin reescribir el resto;
+un rango separado de lo guardado se añade como un tramo más. Solo se almacenan
+y devuelven velas cerradas: la vela en curso cambia con cada tick y haría que
+los datos no fueran reproducibles.
+
+Los tramos se mapean en memoria, así que iter_price_chunks recorre años de
+velas de minutos por bloques sin cargarlas enteras y actualizar el almacén no
+depende de la longitud del histórico.
+
+CandleBuffer es la contrapartida en memoria para el trading en vivo: una
+ventana de tamaño fijo con las últimas velas cerradas que se completa con las
+velas nuevas de cada cierre.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import ccxt
+import numpy as np
+import pandas as pd
+from utils.api_data import get_price_data
+from config import TIMEFRAME_MINUTES
+from utils import telemetry
+
+CANDLE_STORE_DIR = os.environ.get("CANDLE_STORE_DIR", os.path.join(tempfile.gettempdir(), "trading_bot_candles"))
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+CANDLE_DTYPE = np.dtype([('timestamp', np.int64)] + [(column, np.float64) for column in OHLCV_COLUMNS])
+
+# Aciertos de caché: 'hit' sin descargar, 'partial' solo lo que falta, 'miss' todo el rango
+CACHE_REQUESTS = telemetry.counter('candle_cache_requests_total', 'Consultas a la caché de velas por origen y resultado')
+
+def _to_ms(value):
+    """Convierte una fecha (naive = UTC) a milisegundos desde epoch"""
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+def _now_ms():
+    """Milisegundos actuales desde epoch (UTC)"""
+    return int(pd.Timestamp.now(tz='UTC').value // 1_000_000)
+
+def _records(timestamps, values):
+    """Empaqueta timestamps (ms) y valores OHLCV en un array con una fila por vela"""
+    records = np.empty(len(timestamps), dtype=CANDLE_DTYPE)
+    records['timestamp'] = timestamps
+    for i, column in enumerate(OHLCV_COLUMNS):
+        records[column] = values[:, i]
+    return records
+
+def _frame(records):
+    """Construye el DataFrame OHLCV estándar a partir de filas de velas"""
+    index = pd.DatetimeIndex(pd.to_datetime(records['timestamp'], unit='ms'), name='timestamp')
+    return pd.DataFrame({column: np.array(records[column]) for column in OHLCV_COLUMNS}, index=index)
+
+class CandleStore:
+    """
+    Caché en disco de velas cerradas con descarga incremental
+    """
+
+    def __init__(self, base_dir=CANDLE_STORE_DIR, exchange='kraken'):
+        """
+        Inicializa el almacén
+
+        Args:
+            base_dir: Directorio donde se guardan las velas
+            exchange: Exchange de ccxt del que se descargan los datos (por defecto 'kraken')
+        """
+        self.base_dir = base_dir
+        self.exchange = exchange
+        self._exchange_timeframes = None
+        os.makedirs(base_dir, exist_ok=True)
+
+    def _path(self, symbol, timeframe, extension):
+        """Ruta de los archivos de velas de un símbolo y temporalidad"""
+        return os.path.join(self.base_dir, f"{self.exchange}_{symbol.replace('/', '_')}_{timeframe}.{extension}")
+
+    def _segment_path(self, symbol, timeframe, segment_id):
+        """Ruta del archivo de filas de un tramo"""
+        return self._path(symbol, timeframe, f"{segment_id}.bin")
+
+    def _storage_timeframe(self, timeframe):
+        """
+        Temporalidad que se guarda realmente en disco.
+
+        Si el exchange no ofrece '3d' se guardan velas '1d' y se agregan al leer,
+        con bloques alineados a epoch para que no dependan de la fecha pedida.
+        """
+        if timeframe != '3d':
+            return timeframe
+        if self._exchange_timeframes is None:
+            self._exchange_timeframes = getattr(ccxt, self.exchange)().timeframes or {}
+        return timeframe if timeframe in self._exchange_timeframes else '1d'
+
+    def _read_segments(self, symbol, timeframe):
+        """
+        Tramos guardados, ordenados por cobertura
+
+        Cada tramo es {'id', 'coverage': [inicio, fin], 'rows'}: un archivo de filas
+        CANDLE_DTYPE sin cabecera con todas las velas cerradas que abren en
+        [inicio, fin] (ms).
+        """
+        meta_path = self._path(symbol, timeframe, 'json')
+        if not os.path.exists(meta_path):
+            return []
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        return sorted(meta['segments'], key=lambda segment: segment['coverage'][0])
+
+    def _write_meta(self, symbol, timeframe, segments):
+        """Guarda la lista de tramos de forma atómica (escritura temporal + rename)"""
+        meta_path = self._path(symbol, timeframe, 'json')
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'segments': segments}, f)
+        os.replace(tmp_path, meta_path)
+
+    def _segment_rows(self, symbol, timeframe, segment):
+        """Filas de un tramo mapeadas en memoria (solo las confirmadas en el índice)"""
+        return np.memmap(
+            self._segment_path(symbol, timeframe, segment['id']), dtype=CANDLE_DTYPE, mode='r', shape=(segment['rows'],)
+        )
+
+    def _new_segment(self, symbol, timeframe, records, coverage):
+        """Escribe las filas de un tramo nuevo (escritura temporal + rename) y lo retorna"""
+        segment_id = str(int(records['timestamp'][0]))
+        path = self._segment_path(symbol, timeframe, segment_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(np.ascontiguousarray(records, dtype=CANDLE_DTYPE).tobytes())
+        os.replace(tmp_path, path)
+        return {'id': segment_id, 'coverage': [int(coverage[0]), int(coverage[1])], 'rows': len(records)}
+
+    def _append_segment(self, symbol, timeframe, segment, records, coverage_end):
+        """
+        Añade filas al final de un tramo sin reescribir las anteriores
+
+        Se descartan primero los bytes que sobren de una escritura interrumpida;
+        las filas nuevas solo son visibles cuando se guarda el índice de tramos.
+        """
+        with open(self._segment_path(symbol, timeframe, segment['id']), 'r+b') as f:
+            f.truncate(segment['rows'] * CANDLE_DTYPE.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(records, dtype=CANDLE_DTYPE).tobytes())
+        segment['rows'] += len(records)
+        segment['coverage'][1] = int(coverage_end)
+
+    def _fetch(self, symbol, timeframe, from_ms, to_ms, now_ms):
+        """Descarga un rango del exchange y retorna solo las velas cerradas que abren en [from_ms, to_ms]"""
+        # Fechas con zona UTC: get_price_data usa .timestamp(), que leería una
+        # fecha sin zona como hora local
+        df = get_price_data(
+            symbol=symbol,
+            timeframe=timeframe,
+            start_date=pd.Timestamp(from_ms, unit='ms', tz='UTC').to_pydatetime(),
+            end_date=pd.Timestamp(to_ms, unit='ms', tz='UTC').to_pydatetime(),
+            exchange=self.exchange
+        )
+        if df is None or df.empty:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+
+        timestamps = df.index.as_unit('ms').asi8
+        keep = (timestamps >= from_ms) & (timestamps <= to_ms)
+        keep &= timestamps + TIMEFRAME_MINUTES[timeframe] * 60_000 <= now_ms
+        return _records(timestamps[keep], df[OHLCV_COLUMNS].to_numpy(dtype=np.float64)[keep])
+
+    def _gaps(self, segments, need_start, need_end, duration):
+        """
+        Tramos de [need_start, need_end] que ninguna cobertura incluye
+
+        Los extremos se ajustan a las velas posibles junto a los tramos vecinos
+        (una vela después de la última guardada, una antes de la primera), así que
+        un hueco en el que no puede abrir ninguna vela no se descarga.
+
+        Returns:
+            list: (inicio, fin, índice del tramo anterior adyacente o None)
+        """
+        gaps = []
+        cursor, previous = need_start, None
+        for i, segment in enumerate(segments + [None]):
+            if segment is not None:
+                cov_start, cov_end = segment['coverage']
+                if cov_end < cursor:
+                    previous = i
+                    continue
+                gap_end = min(cov_start - 1, need_end)
+            else:
+                gap_end = need_end
+            if cursor <= gap_end:
+                lo, hi = cursor, gap_end
+                adjacent = None
+                if previous is not None and segments[previous]['coverage'][1] + 1 == cursor:
+                    adjacent = previous
+                    lo = max(lo, segments[previous]['last'] + duration)
+                if segment is not None and gap_end == cov_start - 1:
+                    hi = min(hi, segment['first'] - duration)
+                if lo <= hi:
+                    gaps.append((lo, hi, adjacent))
+            if segment is None or cov_start > need_end:
+                break
+            cursor, previous = max(cursor, cov_end + 1), i
+        return gaps
+
+    def _sync(self, symbol, timeframe, start_ms, end_ms):
+        """
+        Asegura que el rango pedido esté en disco descargando solo lo que falta
+
+        Los huecos que continúan un tramo se añaden al final de su archivo y el
+        resto se guardan como tramos nuevos, así que una actualización solo escribe
+        las velas nuevas y nunca se descarta la cobertura ya guardada.
+
+        Returns:
+            list: Filas de las velas de [start_ms, end_ms], un array por tramo
+                (mapeado en memoria), en orden
+        """
+        now_ms = _now_ms()
+        duration = TIMEFRAME_MINUTES[timeframe] * 60_000
+        need_start, need_end = start_ms, min(end_ms, now_ms - duration)
+
+        segments = self._read_segments(symbol, timeframe)
+        for segment in segments:
+            rows = self._segment_rows(symbol, timeframe, segment)
+            segment['first'], segment['last'] = int(rows['timestamp'][0]), int(rows['timestamp'][-1])
+        gaps = self._gaps(segments, need_start, need_end, duration) if need_start <= need_end else []
+
+        if not gaps:
+            CACHE_REQUESTS.inc(source='store', result='hit')
+        else:
+            covered = any(s['coverage'][0] <= need_end and s['coverage'][1] >= need_start for s in segments)
+            CACHE_REQUESTS.inc(source='store', result='partial' if covered else 'miss')
+            changed = False
+            for gap_start, gap_end, adjacent in gaps:
+                records = self._fetch(symbol, timeframe, gap_start, gap_end, now_ms)
+                if len(records) == 0:
+                    continue
+                last = int(records['timestamp'][-1])
+                cov_end = gap_end if last >= gap_end - duration else last
+                if adjacent is not None:
+                    self._append_segment(symbol, timeframe, segments[adjacent], records, cov_end)
+                    segments[adjacent]['last'] = last
+                else:
+                    segment = self._new_segment(symbol, timeframe, records, (gap_start, cov_end))
+                    segment['first'], segment['last'] = int(records['timestamp'][0]), last
+                    segments.append(segment)
+                changed = True
+            if changed:
+                segments.sort(key=lambda segment: segment['coverage'][0])
+                self._write_meta(symbol, timeframe, [
+                    {key: segment[key] for key in ('id', 'coverage', 'rows')} for segment in segments
+                ])
+
+        pieces = []
+        for segment in segments:
+            if segment['last'] < start_ms or segment['first'] > end_ms:
+                continue
+            rows = self._segment_rows(symbol, timeframe, segment)
+            lo, hi = np.searchsorted(rows['timestamp'], [start_ms, end_ms + 1])
+            if hi > lo:
+                pieces.append(rows[lo:hi])
+        return pieces
+
+    def _range(self, symbol, timeframe, start_ms, end_ms):
+        """Filas de [start_ms, end_ms] en un solo array (sin copia si están en un tramo)"""
+        pieces = self._sync(symbol, timeframe, start_ms, end_ms)
+        if not pieces:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+    def get_price_data(self, symbol, timeframe, start_date, end_date=None):
+        """
+        Obtiene velas cerradas de un rango, descargando solo las que no estén en disco
+
+        Args:
+            symbol: Par de trading (ej. 'BTC/USDT')
+            timeframe: Temporalidad ('15m', '30m', '1h', '4h', '1d', '3d')
+            start_date: Fecha de inicio (datetime)
+            end_date: Fecha de fin (datetime o None para hasta ahora)
+
+        Returns:
+            pd.DataFrame: Velas OHLCV indexadas por timestamp
+        """
+        storage_tf = self._storage_timeframe(timeframe)
+        start_ms = _to_ms(start_date)
+        end_ms = _to_ms(end_date) if end_date is not None else _now_ms()
+
+        resample = storage_tf != timeframe
+        if resample:
+            block = TIMEFRAME_MINUTES[timeframe] * 60_000
+            start_ms -= start_ms % block
+
+        df = _frame(self._range(symbol, storage_tf, start_ms, end_ms))
+
+        if resample and not df.empty:
+            df = df.resample('3D', origin='epoch').agg({
+                'open': 'first',
+                'high': 'max',
+                'low': 'min',
+                'close': 'last',
+                'volume': 'sum'
+            }).dropna()
+            # Descartar el bloque en curso (aún no cerrado)
+            closed = df.index + pd.Timedelta(minutes=TIMEFRAME_MINUTES[timeframe]) <= pd.to_datetime(_now_ms(), unit='ms')
+            df = df[closed]
+
+        return df
+
+    def get_records(self, symbol, timeframe, start_date, end_date=None):
+        """
+        Filas de velas cerradas de un rango (CANDLE_DTYPE), mapeadas en memoria
+
+        Pensado para búsquedas puntuales por índice (np.searchsorted sobre
+        'timestamp'): solo se leen de disco las velas a las que se accede.
+
+        Returns:
+            np.ndarray: Filas ordenadas por timestamp (ms)
+        """
+        if self._storage_timeframe(timeframe) != timeframe:
+            df = self.get_price_data(symbol, timeframe, start_date, end_date)
+            return _records(df.index.as_unit('ms').asi8, df[OHLCV_COLUMNS].to_numpy(dtype=np.float64))
+
+        start_ms = _to_ms(start_date)
+        end_ms = _to_ms(end_date) if end_date is not None else _now_ms()
+        return self._range(symbol, timeframe, start_ms, end_ms)
+
+    def fingerprint(self, symbol, timeframe, start_date, end_date=None):
+        """
+        Huella de las velas cerradas de un rango (cambia si cambia cualquier vela)
+
+        Se calcula sobre las filas mapeadas en memoria, sin construir DataFrames,
+        para decidir si un resultado en caché sigue valiendo antes de cargar nada.
+
+        Returns:
+            str: Hash hexadecimal
+        """
+        records = self.get_records(symbol, timeframe, start_date, end_date)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(records).tobytes())
+        return digest.hexdigest()
+
+    def iter_price_chunks(self, symbol, timeframe, start_date, end_date=None, chunk_size=100_000):
+        """
+        Recorre las velas cerradas de un rango en bloques de tamaño fijo
+
+        El archivo se mapea en memoria y solo se copia el bloque actual, así que la
+        memoria usada no depende de la longitud del rango.
+
+        Args:
+            chunk_size: Velas por bloque
+
+        Yields:
+            pd.DataFrame: Bloques OHLCV consecutivos indexados por timestamp
+        """
+        if self._storage_timeframe(timeframe) != timeframe:
+            # Temporalidades agregadas (pocas velas): se agregan completas y se trocean
+            df = self.get_price_data(symbol, timeframe, start_date, end_date)
+            for lo in range(0, len(df), chunk_size):
+                yield df.iloc[lo:lo + chunk_size]
+            return
+
+        start_ms = _to_ms(start_date)
+        end_ms = _to_ms(end_date) if end_date is not None else _now_ms()
+        # Los bloques cruzan los límites entre tramos: solo se copia el bloque actual
+        pending, size = [], 0
+        for rows in self._sync(symbol, timeframe, start_ms, end_ms):
+            offset = 0
+            while offset < len(rows):
+                take = min(chunk_size - size, len(rows) - offset)
+                pending.append(rows[offset:offset + take])
+                size += take
+                offset += take
+                if size == chunk_size:
+                    yield _frame(np.concatenate(pending))
+                    pending, size = [], 0
+        if size:
+            yield _frame(np.concatenate(pending))
+
+class CandleBuffer:
+    """
+    Ventana de tamaño fijo con las últimas velas cerradas de una temporalidad
+
+    Las filas viven en un único array preasignado del doble de la capacidad: las
+    velas nuevas se escriben a continuación de las anteriores y, al llegar al
+    final, las últimas 'capacity' velas se copian al principio. Así la ventana
+    siempre es un tramo contiguo (sin copias al leerla), cada vela se copia una
+    vez de media y la memoria no crece con el tiempo.
+    """
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity: Número de velas que conserva la ventana
+        """
+        self.capacity = capacity
+        self._data = np.empty(2 * capacity, dtype=CANDLE_DTYPE)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def last_timestamp(self):
+        """Timestamp (ms) de la última vela guardada o None si está vacía"""
+        return int(self._data['timestamp'][self._end - 1]) if len(self) else None
+
+    def append(self, timestamps, values):
+        """
+        Añade velas ordenadas; se ignoran las que no son posteriores a la última guardada
+
+        Args:
+            timestamps: Aperturas de las velas (ms)
+            values: Array (n, 5) con los valores OHLCV
+
+        Returns:
+            int: Número de velas añadidas
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        last = self.last_timestamp()
+        if last is not None:
+            newer = timestamps > last
+            timestamps, values = timestamps[newer], values[newer]
+        n = len(timestamps)
+        if n == 0:
+            return 0
+        if n >= self.capacity:
+            self._data[:self.capacity] = _records(timestamps[-self.capacity:], values[-self.capacity:])
+            self._start, self._end = 0, self.capacity
+            return n
+
+        if self._end + n > len(self._data):
+            keep = min(len(self), self.capacity - n)
+            self._data[:keep] = self._data[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+        self._data[self._end:self._end + n] = _records(timestamps, values)
+        self._end += n
+        self._start = max(self._start, self._end - self.capacity)
+        return n
+
+    def records(self):
+        """Filas de la ventana en orden (vista sin copia; no se debe modificar)"""
+        return self._data[self._start:self._end]
+
+    def frame(self):
+        """DataFrame OHLCV de la ventana indexado por timestamp"""
+        return _frame(self.records())
+
+_default_stores = {}
+
+def get_candle_store(exchange='kraken'):
+    """Almacén compartido de un exchange"""
+    if exchange not in _default_stores:
+        _default_stores[exchange] = CandleStore(exchange=exchange)
+    return _default_stores[exchange]
+
+def get_cached_price_data(symbol, timeframe, start_date, end_date=None, exchange='kraken'):
+    """
+    Igual que get_price_data pero pasando por el almacén local de velas cerradas
+    """
+    return get_candle_store(exchange).get_price_data(symbol, timeframe, start_date, end_date)
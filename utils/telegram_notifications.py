@@ -1,50 +1,387 @@
 # -*- coding: utf-8 -*-
 """
 Módulo para enviar notificaciones a través de Telegram
+
+Los envíos no bloquean a quien notifica: los mensajes se encolan (cola
+acotada) y un hilo en segundo plano los envía por una sesión HTTP persistente,
+con timeouts y reintentos con espera exponencial que respetan el retry_after
+de las respuestas 429 de Telegram. Si la cola se llena, los mensajes nuevos se
+agrupan con el último pendiente (o se descarta uno, según la política), y los
+envíos a un mismo chat se espacian para no superar sus límites.
+
+En modo resumen (por defecto), cada ciclo de evaluación se notifica con un
+único mensaje (SignalDigest): señales, decisión y order book juntos, sin
+repetir las señales que no han cambiado desde el ciclo anterior.
 """
 
 import os
+import atexit
+import html
+import threading
+import time
+from collections import deque
+from datetime import datetime
 import requests
 from dotenv import load_dotenv
-from datetime import datetime
+from utils import telemetry
+
+# Mensajes pendientes como máximo
+QUEUE_SIZE = 100
+
+# Políticas cuando la cola está llena
+COALESCE = 'coalesce'          # Añadir el mensaje al último pendiente
+DROP_OLDEST = 'drop_oldest'    # Descartar el pendiente más antiguo
+DROP_NEWEST = 'drop_newest'    # Descartar el mensaje nuevo
+
+# Longitud máxima de un mensaje de Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+# Timeouts de conexión y lectura (segundos)
+REQUEST_TIMEOUT = (3.05, 10)
+
+# Reintentos por mensaje y espera base entre ellos (segundos, se duplica en cada intento)
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+
+# Tiempo máximo para enviar los pendientes al cerrar el proceso (segundos)
+EXIT_FLUSH_TIMEOUT = 5
+
+# Límites de envío por chat: separación mínima (segundos) y mensajes por minuto
+MIN_SEND_INTERVAL = 1.0
+MAX_MESSAGES_PER_MINUTE = 20
+
+# Métricas de envío (utils/telemetry.py)
+SEND_SECONDS = telemetry.histogram('telegram_send_seconds', 'Envío de un mensaje a Telegram, reintentos incluidos')
+MESSAGES = telemetry.counter('telegram_messages_total', 'Mensajes de Telegram por resultado')
+RETRIES = telemetry.counter('telegram_retries_total', 'Reintentos de envío a Telegram')
+
+SIGNAL_EMOJIS = {
+    'buy': '🟢',
+    'sell': '🔴',
+    'valley_buy': '💚',
+    'top_sell': '❤️',
+    'hold': '⚪'
+}
+
+DECISION_EMOJIS = {
+    "📈 LONG": "🚀",
+    "📉 SHORT": "🔻",
+    "⏳ WAIT": "⏳"
+}
+
+# Envíos recientes por chat, compartidos por todos los notificadores del proceso
+_chat_sends = {}
+_chat_lock = threading.Lock()
+
+def _reserve_send_slot(chat_id):
+    """
+    Reserva el próximo hueco de envío del chat
+
+    Returns:
+        float: Segundos que hay que esperar antes de enviar
+    """
+    with _chat_lock:
+        sends = _chat_sends.setdefault(chat_id, deque(maxlen=MAX_MESSAGES_PER_MINUTE))
+        now = time.monotonic()
+        slot = now
+        if sends:
+            slot = max(slot, sends[-1] + MIN_SEND_INTERVAL)
+        if len(sends) == sends.maxlen:
+            slot = max(slot, sends[0] + 60)
+        sends.append(slot)
+        return slot - now
+
+def _join_lines(lines, limit=MAX_MESSAGE_LENGTH):
+    """
+    Une las líneas de un mensaje HTML sin pasar de limit caracteres
+
+    Se corta por líneas completas (cada línea cierra sus etiquetas y entidades),
+    así que el mensaje sigue siendo HTML válido para Telegram; las líneas que no
+    caben se resumen en una última línea.
+    """
+    text = "\n".join(lines)
+    if len(text) <= limit:
+        return text
+    kept, length = [], 0
+    for i, line in enumerate(lines):
+        note = f"… {len(lines) - i} líneas omitidas"
+        if length + len(line) + 1 + len(note) > limit:
+            return "\n".join(kept + [note])
+        kept.append(line)
+        length += len(line) + 1
+    return text
+
+class SignalDigest:
+    """
+    Señales, decisión y order book de un ciclo de evaluación, para enviarlos en un solo mensaje
+    """
+
+    def __init__(self, symbol):
+        """
+        Args:
+            symbol: Par evaluado (ej. 'BTC/USDT')
+        """
+        self.symbol = symbol
+        self.time = datetime.now()
+        self.signals = []
+        self.errors = []
+        self.summary = None
+
+    def add_signal(self, timeframe, signal, strength, price, additional_info=None):
+        """Añade la señal de una temporalidad (también 'hold', para detectar cambios)"""
+        self.signals.append({
+            'timeframe': timeframe,
+            'signal': signal,
+            'strength': strength,
+            'price': price,
+            'additional_info': additional_info
+        })
+
+    def add_error(self, error, context=""):
+        """Añade un error del ciclo"""
+        self.errors.append((context, str(error)))
+
+    def set_summary(self, peso_buy, peso_sell, decision, orderbook=None):
+        """Fija la decisión final del ciclo"""
+        self.summary = {'peso_buy': peso_buy, 'peso_sell': peso_sell, 'decision': decision, 'orderbook': orderbook}
+
+    def render(self, signals=None):
+        """
+        Mensaje HTML del ciclo
+
+        Args:
+            signals: Señales a incluir (por defecto todas las que no son 'hold')
+        """
+        if signals is None:
+            signals = [s for s in self.signals if s['signal'] != 'hold']
+
+        lines = [
+            f"<b>🤖 {self.symbol} · Resumen del ciclo</b>",
+            "━━━━━━━━━━━━━━━",
+            f"⏰ <b>Fecha:</b> {self.time.strftime('%Y-%m-%d %H:%M:%S')}"
+        ]
+        for s in signals:
+            line = (
+                f"{SIGNAL_EMOJIS.get(s['signal'], '⚠️')} <b>{s['timeframe']}</b> {s['signal'].upper()}"
+                f" · 💪 {s['strength']:.2f} · 💵 ${s['price']:,.2f}"
+            )
+            if s['additional_info']:
+                line += f" · {s['additional_info']}"
+            lines.append(line)
+
+        if self.summary is not None:
+            decision = self.summary['decision']
+            lines += [
+                "",
+                f"📈 <b>Peso Compra:</b> {self.summary['peso_buy']:.2f} | "
+                f"📉 <b>Peso Venta:</b> {self.summary['peso_sell']:.2f}",
+                f"{DECISION_EMOJIS.get(decision, '❓')} <b>Decisión:</b> {decision}"
+            ]
+            orderbook = self.summary['orderbook']
+            if orderbook:
+                lines.append(
+                    f"📚 Bid ${orderbook['bid_price']:,.2f} · Ask ${orderbook['ask_price']:,.2f}"
+                    f" · Medio ${orderbook['mid_price']:,.2f}"
+                )
+
+        if self.errors:
+            lines.append("")
+            lines += [f"⚠️ {html.escape(context)}: {html.escape(error)}" for context, error in self.errors]
+
+        return _join_lines(lines)
 
 class TelegramNotifier:
-    def __init__(self):
-        """Inicializa el notificador de Telegram"""
+    def __init__(self, queue_size=QUEUE_SIZE, overflow=COALESCE, digest=True):
+        """
+        Inicializa el notificador de Telegram
+
+        Args:
+            queue_size: Mensajes pendientes como máximo (por defecto QUEUE_SIZE)
+            overflow: Política con la cola llena: COALESCE, DROP_OLDEST o DROP_NEWEST
+            digest: Enviar cada ciclo en un solo mensaje (si no, un mensaje por señal más el resumen)
+        """
         load_dotenv()
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.chat_id = os.getenv('TELEGRAM_CHAT_ID')
         self.enabled = bool(self.bot_token and self.chat_id)
-    
+
+        if overflow not in (COALESCE, DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Política de cola desconocida: {overflow}")
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.digest_mode = digest
+        self.session = None
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._pending = deque()
+        self._in_flight = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+        # Última señal notificada por (par, temporalidad) y última decisión por par
+        self._last_signals = {}
+        self._last_decisions = {}
+
     def send_message(self, message):
-        """Envía un mensaje a Telegram"""
+        """Encola un mensaje para Telegram (no bloquea)"""
         if not self.enabled:
             return
-        
-        try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-            data = {
-                "chat_id": self.chat_id,
-                "text": message,
-                "parse_mode": "HTML"
-            }
-            requests.post(url, json=data)
-        except Exception as e:
-            print(f"Error al enviar mensaje a Telegram: {str(e)}")
-    
-    def send_trade_signal(self, timeframe, signal, strength, price):
-        """Envía una señal de trading"""
-        emoji = "🟢" if signal in ['buy', 'valley_buy'] else "🔴"
-        message = (
-            f"{emoji} <b>Señal de Trading</b>\n"
-            f"Par: BTC/USDT\n"
-            f"Timeframe: {timeframe}\n"
-            f"Señal: {signal.upper()}\n"
-            f"Fuerza: {strength:.2f}\n"
-            f"Precio: ${price:,.2f}"
-        )
-        self.send_message(message)
-    
+
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._pending) >= self.queue_size:
+                if self.overflow == COALESCE and len(self._pending[-1]) + len(message) + 2 <= MAX_MESSAGE_LENGTH:
+                    self._pending[-1] = f"{self._pending[-1]}\n\n{message}"
+                    return
+                self.dropped += 1
+                MESSAGES.inc(result='dropped')
+                if self.overflow == DROP_NEWEST:
+                    return
+                self._pending.popleft()
+            self._pending.append(message)
+            self._start()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Espera a que se envíen los mensajes pendientes
+
+        Returns:
+            bool: True si no queda nada pendiente
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def close(self, timeout=EXIT_FLUSH_TIMEOUT):
+        """Envía los pendientes (con un tiempo máximo) y detiene el hilo de envío"""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def _start(self):
+        """Arranca el hilo de envío con el primer mensaje (con self._cond adquirido)"""
+        if self._thread is None:
+            self.session = requests.Session()
+            self._thread = threading.Thread(target=self._sender, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _sender(self):
+        """Hilo de envío: saca los mensajes de la cola de uno en uno"""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+                message = self._pending.popleft()
+                self._in_flight = True
+            try:
+                with self._cond:
+                    if self._cond.wait_for(lambda: self._closed, _reserve_send_slot(self.chat_id)):
+                        return
+                with telemetry.timer(SEND_SECONDS):
+                    ok = self._post(message)
+                if ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                MESSAGES.inc(result='sent' if ok else 'failed')
+            finally:
+                with self._cond:
+                    self._in_flight = False
+                    self._cond.notify_all()
+
+    def _post(self, message):
+        """
+        Envía un mensaje con reintentos
+
+        Se reintentan los errores de red, los 5xx y los 429 (esperando lo que
+        indique retry_after); el resto de errores no se reintentan.
+
+        Returns:
+            bool: True si Telegram aceptó el mensaje
+        """
+        url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        data = {
+            "chat_id": self.chat_id,
+            "text": message,
+            "parse_mode": "HTML"
+        }
+        for attempt in range(MAX_RETRIES + 1):
+            delay = BACKOFF_BASE * 2 ** attempt
+            try:
+                response = self.session.post(url, json=data, timeout=REQUEST_TIMEOUT)
+                if response.ok:
+                    return True
+                if response.status_code == 429:
+                    try:
+                        delay = response.json()['parameters']['retry_after']
+                    except (ValueError, KeyError, TypeError):
+                        pass
+                elif response.status_code < 500:
+                    print(f"Error al enviar mensaje a Telegram: {response.status_code} {response.text}")
+                    return False
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+
+            if attempt < MAX_RETRIES:
+                RETRIES.inc()
+                with self._cond:
+                    if self._cond.wait_for(lambda: self._closed, delay):
+                        break
+
+        print(f"Error al enviar mensaje a Telegram: {error}")
+        return False
+
+    def digest(self, symbol):
+        """Nuevo resumen de ciclo para el par (se envía con send_digest)"""
+        return SignalDigest(symbol)
+
+    def send_digest(self, digest):
+        """
+        Envía un ciclo de evaluación
+
+        En modo resumen se omiten las señales iguales a la última notificada de
+        esa temporalidad, y el ciclo no se envía si no hay señales nuevas,
+        errores ni cambio de decisión.
+
+        Returns:
+            bool: True si se ha encolado algún mensaje
+        """
+        fresh = []
+        for s in digest.signals:
+            key = (digest.symbol, s['timeframe'])
+            if s['signal'] != 'hold' and self._last_signals.get(key) != s['signal']:
+                fresh.append(s)
+            self._last_signals[key] = s['signal']
+
+        decision = digest.summary['decision'] if digest.summary else None
+        decision_changed = decision is not None and self._last_decisions.get(digest.symbol) != decision
+        if decision is not None:
+            self._last_decisions[digest.symbol] = decision
+
+        if not self.digest_mode:
+            for s in digest.signals:
+                if s['signal'] != 'hold':
+                    self.send_trade_signal(s['timeframe'], s['signal'], s['strength'], s['price'], s['additional_info'])
+            for context, error in digest.errors:
+                self.send_error(error, context)
+            if digest.summary:
+                self.send_summary(**digest.summary)
+            return True
+
+        if not (fresh or digest.errors or decision_changed):
+            return False
+        self.send_message(digest.render(fresh))
+        return True
+
     def send_error(self, error, context=""):
         """Envía un mensaje de error"""
         message = (
@@ -56,17 +393,9 @@ class TelegramNotifier:
 
     def send_trade_signal(self, timeframe, signal, strength, price, additional_info=None):
         """Envía una señal de trading formateada"""
-        emoji_map = {
-            'buy': '🟢',
-            'sell': '🔴',
-            'valley_buy': '💚',
-            'top_sell': '❤️',
-            'hold': '⚪'
-        }
-        
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        emoji = emoji_map.get(signal, '⚠️')
-        
+        emoji = SIGNAL_EMOJIS.get(signal, '⚠️')
+
         message = f"""
 <b>🤖 Señal de Trading</b>
 ━━━━━━━━━━━━━━━
@@ -76,22 +405,18 @@ class TelegramNotifier:
 💪 <b>Fuerza:</b> {strength:.2f}
 💵 <b>Precio:</b> ${price:.2f}
 """
-        
+
         if additional_info:
             message += f"\nℹ️ <b>Info adicional:</b>\n{additional_info}"
-            
+
         self.send_message(message)
 
     def send_summary(self, peso_buy, peso_sell, decision, orderbook=None):
         """Envía un resumen de la decisión final"""
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        emoji_decision = {
-            "📈 LONG": "🚀",
-            "📉 SHORT": "🔻",
-            "⏳ WAIT": "⏳"
-        }.get(decision, "❓")
-        
+
+        emoji_decision = DECISION_EMOJIS.get(decision, "❓")
+
         message = f"""
 <b>📊 Resumen de Trading</b>
 ━━━━━━━━━━━━━━━
@@ -100,7 +425,7 @@ class TelegramNotifier:
 📉 <b>Peso Venta:</b> {peso_sell:.2f}
 {emoji_decision} <b>Decisión:</b> {decision}
 """
-        
+
         if orderbook:
             message += f"""
 📚 <b>Order Book:</b>
@@ -108,5 +433,5 @@ class TelegramNotifier:
 💰 Ask: ${orderbook['ask_price']:.2f}
 📊 Medio: ${orderbook['mid_price']:.2f}
 """
-            
-        self.send_message(message) 
\ No newline at end of file
+
+        self.send_message(message)
\ No newline at end of file
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Telemetría del ciclo en vivo: histogramas de latencia y contadores
+
+Los temporizadores (timer / timed) miden con time.perf_counter y suman la
+duración a un histograma de cubetas fijas, así que el coste por medida es una
+búsqueda binaria y unas sumas bajo un lock. Los percentiles (p50/p95/p99) se
+estiman interpolando dentro de las cubetas, como histogram_quantile de
+Prometheus.
+
+Las métricas se exponen en formato de texto de Prometheus (render_prometheus,
+servido en GET /metrics del canal de control del demonio, trading/ipc.py) y
+como diccionario (snapshot) para la página de Trading en Vivo.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Límites superiores de las cubetas de latencia (segundos)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# Prefijo de todas las métricas
+PREFIX = 'trading_bot_'
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def _label_key(labels):
+    """Clave ordenada e inmutable de un conjunto de etiquetas"""
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+def _format_labels(key, extra=()):
+    """Etiquetas en formato Prometheus ({a="1",b="2"})"""
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+class Counter:
+    """
+    Contador monótono con etiquetas
+    """
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Suma amount al contador de las etiquetas indicadas"""
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Valor actual para unas etiquetas"""
+        return self.values.get(_label_key(labels), 0)
+
+    def render(self):
+        """Líneas de texto de Prometheus"""
+        lines = [f"# HELP {PREFIX}{self.name} {self.help}", f"# TYPE {PREFIX}{self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{PREFIX}{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    """
+    Histograma de cubetas fijas con etiquetas
+    """
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Añade una observación"""
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def quantile(self, q, **labels):
+        """
+        Estima un cuantil interpolando dentro de su cubeta
+
+        Returns:
+            float: Cuantil estimado (nan sin observaciones)
+        """
+        series = self.series.get(_label_key(labels))
+        if not series or series['count'] == 0:
+            return float('nan')
+        return self._quantile(series, q)
+
+    def _quantile(self, series, q):
+        rank = q * series['count']
+        cumulative = 0
+        for i, count in enumerate(series['counts']):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    # Por encima de la última cubeta: se acota a su límite
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def summary(self):
+        """
+        Resumen por etiquetas
+
+        Returns:
+            dict: {etiquetas: {'count', 'mean', 'p50', 'p95', 'p99'}}
+        """
+        with self._lock:
+            series = {key: dict(s, counts=list(s['counts'])) for key, s in self.series.items()}
+        return {
+            key: {
+                'count': s['count'],
+                'mean': s['sum'] / s['count'] if s['count'] else float('nan'),
+                'p50': self._quantile(s, 0.5),
+                'p95': self._quantile(s, 0.95),
+                'p99': self._quantile(s, 0.99)
+            }
+            for key, s in series.items()
+        }
+
+    def render(self):
+        """Líneas de texto de Prometheus"""
+        name = f"{PREFIX}{self.name}"
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} histogram"]
+        with self._lock:
+            for key, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+def _get(cls, name, help_text, **kwargs):
+    """Métrica registrada con ese nombre (se crea la primera vez)"""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, help_text, **kwargs)
+        return metric
+
+def counter(name, help_text=''):
+    """Contador registrado con ese nombre"""
+    return _get(Counter, name, help_text)
+
+def histogram(name, help_text='', buckets=DEFAULT_BUCKETS):
+    """Histograma registrado con ese nombre"""
+    return _get(Histogram, name, help_text, buckets=buckets)
+
+@contextmanager
+def timer(hist, **labels):
+    """Mide la duración del bloque y la añade al histograma"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        hist.observe(time.perf_counter() - started, **labels)
+
+def timed(hist):
+    """Decorador: mide cada llamada a la función en el histograma"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def render_prometheus():
+    """Todas las métricas en formato de texto de Prometheus"""
+    with _registry_lock:
+        metrics = [_registry[name] for name in sorted(_registry)]
+    lines = []
+    for metric in metrics:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
+
+def snapshot():
+    """
+    Estado actual de las métricas para mostrarlo en la app
+
+    Returns:
+        dict: {'histograms': {nombre: {etiquetas: resumen}}, 'counters': {nombre: {etiquetas: valor}}}
+    """
+    with _registry_lock:
+        metrics = list(_registry.values())
+    result = {'histograms': {}, 'counters': {}}
+    for metric in metrics:
+        if isinstance(metric, Histogram):
+            result['histograms'][metric.name] = {
+                _format_labels(key): values for key, values in metric.summary().items()
+            }
+        else:
+            with metric._lock:
+                result['counters'][metric.name] = {_format_labels(key): v for key, v in metric.values.items()}
+    return result